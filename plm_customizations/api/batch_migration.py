@@ -0,0 +1,61 @@
+"""
+Batched data migrations for the PLM tables.
+
+Backfills and format conversions walk a table in name order one batch at a
+time and commit after each batch, so a large site is never held in one
+long transaction and an interrupted run resumes cheaply: every migration
+only selects the rows it still has to change. They run once per site as
+patches, see patches.txt.
+"""
+import frappe
+from frappe.utils import cint
+
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def run_in_batches(doctype, fields, process_batch, conditions=None, values=None,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Call process_batch with each batch of matching rows, committing after each.
+    
+    Args:
+        doctype: DocType whose table is walked in name order
+        fields: Columns to select besides name
+        process_batch: Function called with a list of row dicts, returning
+            the number of records it changed
+        conditions: Optional SQL condition the rows must match
+        values: Values used by conditions
+        batch_size: Rows per batch
+    
+    Returns:
+        total number of records changed
+    """
+    changed = 0
+    last_name = ""
+    
+    while True:
+        rows = frappe.db.sql(
+            """
+            SELECT `name`, {fields}
+            FROM `tab{doctype}`
+            WHERE `name` > %(last_name)s {conditions}
+            ORDER BY `name`
+            LIMIT {batch_size}
+            """.format(
+                fields=", ".join("`{0}`".format(field) for field in fields),
+                doctype=doctype,
+                conditions="AND ({0})".format(conditions) if conditions else "",
+                batch_size=cint(batch_size)
+            ),
+            dict(values or {}, last_name=last_name),
+            as_dict=True
+        )
+        if not rows:
+            break
+        
+        changed += process_batch(rows) or 0
+        frappe.db.commit()
+        last_name = rows[-1].name
+    
+    return changed
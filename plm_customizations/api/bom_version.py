@@ -1,7 +1,17 @@
 import frappe
 import json
 from frappe import _
-from frappe.utils import now_datetime
+from frappe.utils import cint, now_datetime
+
+from plm_customizations.api.plm_schema import ensure_plm_schema
+from plm_customizations.api.snapshot_store import dump_snapshot, get_content_hash, load_snapshot
+from plm_customizations.api.version_as_of import get_versions_as_of, log_version_statuses
+from plm_customizations.api.version_diff import add_changed_row_versions, dump_version_diff, get_version_patch
+
+
+# BOM fields rewritten on every save, left out of the content hash. The other
+# PLM state fields are hashed, so an unchanged save never keeps them stale
+BOM_HASH_EXCLUDED_FIELDS = ("bom_published_date", "bom_published_by")
 
 
 def get_bom_snapshot(bom_name):
@@ -19,6 +29,11 @@ def get_bom_snapshot(bom_name):
     return bom_data
 
 
+def get_bom_content_hash(bom_data):
+    """Content hash of a BOM snapshot, ignoring publish date and user"""
+    return get_content_hash(bom_data, exclude_fields=BOM_HASH_EXCLUDED_FIELDS)
+
+
 def ensure_bom_version_table():
     """
     Create BOM Version table if it doesn't exist.
@@ -100,6 +115,53 @@ def has_bom_publish_permission():
     return any(role in user_roles for role in allowed_roles)
 
 
+@frappe.whitelist()
+def get_bom_plm_state_bulk(bom_names):
+    """
+    Get PLM state of many BOMs for list views and link fields, in two queries.
+    
+    The document count is the number of documents linked to the BOM's Item.
+    
+    Args:
+        bom_names: list (or JSON list) of BOM names
+    
+    Returns:
+        dict of bom_name -> item, plm_status, current_version, current_ecn,
+        can_view, can_download, reason and document_count; unknown BOMs are left out
+    """
+    from plm_customizations.api.item_version import get_document_counts, get_download_eligibility
+    
+    if isinstance(bom_names, str):
+        bom_names = json.loads(bom_names)
+    if not bom_names:
+        return {}
+    
+    is_publisher = has_bom_publish_permission()
+    boms = frappe.get_all(
+        "BOM",
+        filters={"name": ["in", list(set(bom_names))]},
+        fields=["name", "item", "plm_status", "current_version", "current_ecn"]
+    )
+    document_counts = get_document_counts(list({bom.item for bom in boms if bom.item}))
+    
+    states = {}
+    for bom in boms:
+        plm_status = bom.plm_status or "Draft"
+        eligibility = get_download_eligibility(plm_status, is_publisher, "BOM")
+        states[bom.name] = {
+            "item": bom.item,
+            "plm_status": plm_status,
+            "current_version": cint(bom.current_version),
+            "current_ecn": bom.current_ecn,
+            "can_view": is_publisher or plm_status == "Published",
+            "can_download": eligibility["can_download"],
+            "reason": eligibility.get("reason"),
+            "document_count": document_counts.get(bom.item, 0)
+        }
+    
+    return states
+
+
 @frappe.whitelist()
 def save_bom_changes(bom_name, changes=None):
     """
@@ -192,8 +254,7 @@ def publish_bom(bom_name, notes=None, ecn=None):
         frappe.throw(_("ECN is required to publish a BOM"))
     
     # Ensure tables exist
-    ensure_bom_version_table()
-    ensure_bom_custom_fields()
+    ensure_plm_schema()
     
     bom = frappe.get_doc("BOM", bom_name)
     
@@ -214,6 +275,11 @@ def publish_bom(bom_name, notes=None, ecn=None):
     # Create version snapshot
     bom_data = get_bom_snapshot(bom_name)
     
+    content_hash = get_bom_content_hash(bom_data)
+    
+    # Store the diff against the previous version for comparisons
+    previous_version_diff = dump_version_diff("BOM Version", bom_name, new_version, bom_data)
+    
     # Check if version record already exists (for Draft -> Publish case)
     version_name = f"{bom_name}-v{new_version}"
     if frappe.db.exists("BOM Version", version_name):
@@ -222,7 +288,9 @@ def publish_bom(bom_name, notes=None, ecn=None):
             "status": "Published",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
+            "bom_data": dump_snapshot(bom_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
             "notes": notes or frappe.db.get_value("BOM Version", version_name, "notes"),
             "ecn": ecn
         })
@@ -235,12 +303,16 @@ def publish_bom(bom_name, notes=None, ecn=None):
             "status": "Published",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
+            "bom_data": dump_snapshot(bom_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
             "notes": notes,
             "ecn": ecn
         })
         version_doc.insert(ignore_permissions=True)
     
+    log_version_statuses("BOM Version", [version_name])
+    
     # DO NOT submit the BOM - keep docstatus=0 so it stays editable
     # PLM uses plm_status + is_active to control manufacturing use
     
@@ -275,8 +347,7 @@ def block_bom(bom_name, notes=None):
         frappe.throw(_("You don't have permission to block BOMs"))
     
     # Ensure tables exist
-    ensure_bom_version_table()
-    ensure_bom_custom_fields()
+    ensure_plm_schema()
     
     bom = frappe.get_doc("BOM", bom_name)
     
@@ -288,6 +359,11 @@ def block_bom(bom_name, notes=None):
     # Create version snapshot
     bom_data = get_bom_snapshot(bom_name)
     
+    content_hash = get_bom_content_hash(bom_data)
+    
+    # Store the diff against the previous version for comparisons
+    previous_version_diff = dump_version_diff("BOM Version", bom_name, new_version, bom_data)
+    
     # Check if version record already exists
     version_name = f"{bom_name}-v{new_version}"
     if frappe.db.exists("BOM Version", version_name):
@@ -296,7 +372,9 @@ def block_bom(bom_name, notes=None):
             "status": "Blocked",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
+            "bom_data": dump_snapshot(bom_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
             "notes": notes or _("BOM blocked")
         })
     else:
@@ -308,11 +386,15 @@ def block_bom(bom_name, notes=None):
             "status": "Blocked",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
+            "bom_data": dump_snapshot(bom_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
             "notes": notes or _("BOM blocked")
         })
         version_doc.insert(ignore_permissions=True)
     
+    log_version_statuses("BOM Version", [version_name])
+    
     # Update BOM - Block sets is_active=0, is_default=0 to prevent manufacturing use
     frappe.db.set_value("BOM", bom_name, {
         "current_version": new_version,
@@ -341,7 +423,7 @@ def unblock_bom(bom_name):
     if not has_bom_publish_permission():
         frappe.throw(_("You don't have permission to unblock BOMs"))
     
-    ensure_bom_custom_fields()
+    ensure_plm_schema()
     
     bom = frappe.get_doc("BOM", bom_name)
     current_version = bom.get("current_version") or 1
@@ -351,6 +433,7 @@ def unblock_bom(bom_name):
         version_name = f"{bom_name}-v{current_version}"
         if frappe.db.exists("BOM Version", version_name):
             frappe.db.set_value("BOM Version", version_name, "status", "Published")
+            log_version_statuses("BOM Version", [version_name])
     
     # Update BOM - Unblock restores is_active=1, is_default=1 for manufacturing use
     frappe.db.set_value("BOM", bom_name, {
@@ -375,7 +458,7 @@ def set_bom_as_draft(bom_name):
     if not has_bom_publish_permission():
         frappe.throw(_("You don't have permission to change BOM status"))
     
-    ensure_bom_custom_fields()
+    ensure_plm_schema()
     
     # Update BOM status to Draft
     frappe.db.set_value("BOM", bom_name, "plm_status", "Draft", update_modified=False)
@@ -403,8 +486,7 @@ def save_bom_as_draft(bom_name, notes=None, ecn=None):
         frappe.throw(_("ECN is required to save as draft"))
     
     # Ensure tables exist
-    ensure_bom_version_table()
-    ensure_bom_custom_fields()
+    ensure_plm_schema()
     
     bom = frappe.get_doc("BOM", bom_name)
     
@@ -421,33 +503,51 @@ def save_bom_as_draft(bom_name, notes=None, ecn=None):
     
     # Create version snapshot
     bom_data = get_bom_snapshot(bom_name)
+    content_hash = get_bom_content_hash(bom_data)
     
     # Check if version record already exists (for Draft -> Draft case)
     version_name = f"{bom_name}-v{new_version}"
-    if frappe.db.exists("BOM Version", version_name):
-        # Update existing version record
+    existing = frappe.db.get_value("BOM Version", version_name, ["notes", "content_hash"], as_dict=True)
+    
+    if existing and existing.content_hash == content_hash:
+        # Nothing changed since the last save: only update metadata
         frappe.db.set_value("BOM Version", version_name, {
             "status": "Draft",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
-            "notes": notes or frappe.db.get_value("BOM Version", version_name, "notes"),
+            "notes": notes or existing.notes,
             "ecn": ecn
         })
     else:
-        # Create new version record
-        version_doc = frappe.get_doc({
-            "doctype": "BOM Version",
-            "bom": bom_name,
-            "version": new_version,
+        # Store the diff against the previous version for comparisons
+        previous_version_diff = dump_version_diff("BOM Version", bom_name, new_version, bom_data)
+        
+        values = {
             "status": "Draft",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "bom_data": json.dumps(bom_data, default=str),
-            "notes": notes or _("Saved as draft"),
+            "bom_data": dump_snapshot(bom_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
             "ecn": ecn
-        })
-        version_doc.insert(ignore_permissions=True)
+        }
+        
+        if existing:
+            # Update existing version record
+            values["notes"] = notes or existing.notes
+            frappe.db.set_value("BOM Version", version_name, values)
+        else:
+            # Create new version record
+            values["notes"] = notes or _("Saved as draft")
+            version_doc = frappe.get_doc({
+                "doctype": "BOM Version",
+                "bom": bom_name,
+                "version": new_version,
+                **values
+            })
+            version_doc.insert(ignore_permissions=True)
+    
+    log_version_statuses("BOM Version", [version_name])
     
     # Update BOM - Draft sets is_default=0 (not used for manufacturing until published)
     frappe.db.set_value("BOM", bom_name, {
@@ -568,32 +668,61 @@ def bulk_delete_boms(bom_names):
 
 
 @frappe.whitelist()
-def get_bom_version_history(bom_name):
+def get_bom_version_history(bom_name, limit=None, offset=0):
     """
-    Get all version history for a BOM.
+    Get version history for a BOM, newest first.
     Includes ECN information.
+    
+    Args:
+        bom_name: BOM to get versions for
+        limit: Optional maximum number of versions to return
+        offset: Number of versions to skip, for paging with limit
     """
     if not frappe.db.exists("DocType", "BOM Version"):
         return []
     
-    versions = frappe.get_all(
-        "BOM Version",
-        filters={"bom": bom_name},
-        fields=["name", "version", "status", "published_date", "published_by", "notes", "ecn"],
-        order_by="version desc"
-    )
+    # ECN title comes from the same query (name is the ECN number in format ECNXXXXXX)
+    return frappe.db.sql("""
+        SELECT v.name, v.version, v.status, v.published_date, v.published_by, v.notes, v.ecn,
+            ecn.name AS ecn_number, ecn.title AS ecn_title
+        FROM `tabBOM Version` v
+        LEFT JOIN `tabECN` ecn ON ecn.name = v.ecn
+        WHERE v.bom = %(bom)s
+        ORDER BY v.version DESC
+        {limit}
+    """.format(
+        limit="LIMIT {0} OFFSET {1}".format(cint(limit), cint(offset)) if cint(limit) else ""
+    ), {"bom": bom_name}, as_dict=True)
+
+
+@frappe.whitelist()
+def get_bom_as_of(bom_name, timestamp, include_drafts=0):
+    """
+    Get the BOM version in effect at a point in time, with its snapshot.
     
-    # Get ECN info for display (name is the ECN number in format ECNXXXXXX)
-    for v in versions:
-        if v.ecn and frappe.db.exists("ECN", v.ecn):
-            ecn_doc = frappe.get_doc("ECN", v.ecn)
-            v["ecn_number"] = v.ecn  # name is the ECN number
-            v["ecn_title"] = ecn_doc.title
-        else:
-            v["ecn_number"] = None
-            v["ecn_title"] = None
+    Args:
+        bom_name: BOM to resolve
+        timestamp: Date or datetime
+        include_drafts: Also consider Draft versions
     
-    return versions
+    Returns:
+        dict with version_name, version, status, published_date, ecn and data,
+        or None if the BOM had no version by then
+    """
+    return get_boms_as_of([bom_name], timestamp, include_drafts).get(bom_name)
+
+
+@frappe.whitelist()
+def get_boms_as_of(bom_names, timestamp, include_drafts=0):
+    """
+    Resolve the versions of many BOMs in effect at one point in time, in one query.
+    
+    Returns:
+        dict of bom_name -> version as get_bom_as_of; BOMs without a version by then are left out
+    """
+    if isinstance(bom_names, str):
+        bom_names = json.loads(bom_names)
+    return get_versions_as_of("BOM Version", bom_names, timestamp, cint(include_drafts))
 
 
 @frappe.whitelist()
@@ -604,9 +733,9 @@ def get_bom_version_data(version_name):
     if not frappe.db.exists("BOM Version", version_name):
         return None
     
-    version_doc = frappe.get_doc("BOM Version", version_name)
-    if version_doc.bom_data:
-        return json.loads(version_doc.bom_data)
+    bom_data = frappe.db.get_value("BOM Version", version_name, "bom_data")
+    if bom_data:
+        return load_snapshot(bom_data)
     return None
 
 
@@ -628,7 +757,7 @@ def restore_bom_version(bom_name, version_name):
         if not version_doc.bom_data:
             return {"success": False, "error": _("No data found in this version")}
         
-        old_data = json.loads(version_doc.bom_data)
+        old_data = load_snapshot(version_doc.bom_data)
         
         # Get current BOM
         bom = frappe.get_doc("BOM", bom_name)
@@ -719,61 +848,53 @@ def compare_bom_versions(bom_name, version1, version2):
     version1_name = f"{bom_name}-v{version1}"
     version2_name = f"{bom_name}-v{version2}"
     
-    if not frappe.db.exists("BOM Version", version1_name):
-        return {"success": False, "error": _("Version {0} not found").format(version1)}
+    existing = frappe.get_all(
+        "BOM Version",
+        filters={"name": ["in", [version1_name, version2_name]]},
+        pluck="name"
+    )
     
-    if not frappe.db.exists("BOM Version", version2_name):
-        return {"success": False, "error": _("Version {0} not found").format(version2)}
+    for version, version_name in ((version1, version1_name), (version2, version2_name)):
+        if version_name not in existing:
+            return {"success": False, "error": _("Version {0} not found").format(version)}
     
-    data1 = get_bom_version_data(version1_name)
-    data2 = get_bom_version_data(version2_name)
+    patch = get_version_patch("BOM Version", bom_name, version1, version2)
     
-    if not data1 or not data2:
+    if patch is None:
         return {"success": False, "error": _("Could not load version data")}
     
-    differences = {
-        "fields": [],
-        "items_added": [],
-        "items_removed": [],
-        "items_changed": []
-    }
-    
-    # Compare basic fields
-    exclude_fields = ['modified', 'creation', 'modified_by', 'owner', '_user_tags', 
-                      '_comments', '_assign', '_liked_by', 'items', 'operations', 
-                      'scrap_items', 'exploded_items']
-    
-    for key in set(list(data1.keys()) + list(data2.keys())):
-        if key in exclude_fields:
-            continue
-        val1 = data1.get(key)
-        val2 = data2.get(key)
-        if val1 != val2:
-            differences["fields"].append({
-                "field": key,
-                "version1": val1,
-                "version2": val2
-            })
-    
-    # Compare items
-    items1 = {item.get("item_code"): item for item in data1.get("items", [])}
-    items2 = {item.get("item_code"): item for item in data2.get("items", [])}
-    
-    for item_code in set(list(items1.keys()) + list(items2.keys())):
-        if item_code in items1 and item_code not in items2:
-            differences["items_removed"].append(items1[item_code])
-        elif item_code not in items1 and item_code in items2:
-            differences["items_added"].append(items2[item_code])
-        elif items1[item_code] != items2[item_code]:
-            differences["items_changed"].append({
-                "item_code": item_code,
-                "version1": items1[item_code],
-                "version2": items2[item_code]
-            })
+    differences = get_bom_differences(patch)
+    add_changed_row_versions(
+        "BOM Version", bom_name, version1, version2, "items", "item_code", differences["items_changed"]
+    )
     
     return {
         "success": True,
         "differences": differences,
+        "patch": patch,
         "version1": version1,
         "version2": version2
     }
+
+
+def get_bom_differences(patch):
+    """
+    Shape a version patch for the comparison dialog: field changes, BOM
+    items split into added/removed/changed and other child tables.
+    """
+    tables = dict(patch.get("tables", {}))
+    items = tables.pop("items", {})
+    
+    return {
+        "fields": [
+            {"field": fieldname, "version1": values[0], "version2": values[1]}
+            for fieldname, values in patch.get("fields", {}).items()
+        ],
+        "items_added": [entry["row"] for entry in items.get("added", [])],
+        "items_removed": [entry["row"] for entry in items.get("removed", [])],
+        "items_changed": [
+            {"item_code": entry["key"][0], "fields": entry["fields"]}
+            for entry in items.get("changed", [])
+        ],
+        "tables": tables
+    }
@@ -0,0 +1,135 @@
+"""
+Critical path and delay propagation over the Order Dependency graph.
+
+Order Dependency rows on Work Orders and Sales Orders list the orders they
+wait for, so the Gantt tasks form a graph from predecessor to successor.
+The graph is built once per request with flat adjacency arrays, sorted
+topologically and walked forward (projected finish) and backward (latest
+finish) in linear time.
+"""
+from frappe.utils import getdate
+
+
+def apply_critical_path(tasks):
+    """
+    Add critical, total_float and propagated_delay_days to each Gantt task.
+    
+    - propagated_delay_days: days the task's end slips, either from its own
+      delay or because a predecessor finishes late and pushes it out
+    - total_float: days the projected finish can slip without delaying the
+      last order of its dependency chain
+    - critical: task is part of a dependency chain and has no float
+    
+    Tasks on or downstream of a dependency cycle cannot be scheduled; they
+    keep their own delay, get total_float None and are returned.
+    
+    Args:
+        tasks: list of task dicts as built by gantt_data
+    
+    Returns:
+        list of task ids that could not be scheduled because of a cycle
+    """
+    n = len(tasks)
+    if not n:
+        return []
+    
+    index = {}
+    for i, task in enumerate(tasks):
+        index.setdefault(task["id"], i)
+    
+    # Edges from predecessor to successor
+    edge_from = []
+    edge_to = []
+    for i, task in enumerate(tasks):
+        for dependency in task.get("dependencies") or []:
+            j = index.get(dependency)
+            if j is not None and j != i:
+                edge_from.append(j)
+                edge_to.append(i)
+    
+    # Compressed adjacency arrays: successors of i are successors[offsets[i]:offsets[i + 1]]
+    offsets = [0] * (n + 1)
+    for j in edge_from:
+        offsets[j + 1] += 1
+    for i in range(n):
+        offsets[i + 1] += offsets[i]
+    successors = [0] * len(edge_from)
+    fill = offsets[:-1]
+    for j, i in zip(edge_from, edge_to):
+        successors[fill[j]] = i
+        fill[j] += 1
+    
+    in_degree = [0] * n
+    has_edges = [False] * n
+    for j, i in zip(edge_from, edge_to):
+        in_degree[i] += 1
+        has_edges[i] = has_edges[j] = True
+    
+    # Kahn's algorithm; nodes never reached are on a cycle
+    order = [i for i in range(n) if not in_degree[i]]
+    head = 0
+    while head < len(order):
+        j = order[head]
+        head += 1
+        for k in range(offsets[j], offsets[j + 1]):
+            i = successors[k]
+            in_degree[i] -= 1
+            if not in_degree[i]:
+                order.append(i)
+    
+    end = [getdate(task["end"]).toordinal() for task in tasks]
+    duration = [max(e - getdate(task["start"]).toordinal(), 0) for task, e in zip(tasks, end)]
+    # Completed orders already end on their actual date and cannot slip any more
+    completed = [(task.get("progress") or 0) >= 100 for task in tasks]
+    own_delay = [
+        (task.get("delay_days") or 0) if task.get("is_delayed") and not done else 0
+        for task, done in zip(tasks, completed)
+    ]
+    
+    # Forward pass: projected finish, pushed out by late predecessors
+    finish = [e + d for e, d in zip(end, own_delay)]
+    for j in order:
+        for k in range(offsets[j], offsets[j + 1]):
+            i = successors[k]
+            if not completed[i]:
+                finish[i] = max(finish[i], finish[j] + duration[i])
+    
+    # Each connected chain finishes when its last order finishes
+    parent = list(range(n))
+    
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    
+    for j, i in zip(edge_from, edge_to):
+        root_j, root_i = find(j), find(i)
+        if root_j != root_i:
+            parent[root_j] = root_i
+    
+    chain_finish = {}
+    for i in order:
+        root = find(i)
+        chain_finish[root] = max(chain_finish.get(root, finish[i]), finish[i])
+    
+    # Backward pass: latest finish that does not delay the chain
+    latest_finish = [None] * n
+    for j in reversed(order):
+        latest = chain_finish[find(j)]
+        for k in range(offsets[j], offsets[j + 1]):
+            i = successors[k]
+            if latest_finish[i] is not None:
+                latest = min(latest, latest_finish[i] - duration[i])
+        latest_finish[j] = latest
+    
+    for i, task in enumerate(tasks):
+        task["propagated_delay_days"] = finish[i] - end[i]
+        if latest_finish[i] is None:
+            task["total_float"] = None
+            task["critical"] = False
+        else:
+            task["total_float"] = latest_finish[i] - finish[i]
+            task["critical"] = task["total_float"] == 0 and has_edges[i]
+    
+    return [tasks[i]["id"] for i in range(n) if latest_finish[i] is None]
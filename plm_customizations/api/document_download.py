@@ -19,7 +19,9 @@ def download_item_documents(item_code, version=None):
     Files are renamed with item_code + version prefix.
     """
     # Check if download is allowed (not blocked)
-    from plm_customizations.api.item_version import can_download_documents, get_version_documents
+    from plm_customizations.api.item_version import (
+        can_download_documents, get_document_snapshot, get_version_documents
+    )
     download_check = can_download_documents(item_code)
     if isinstance(download_check, dict) and not download_check.get("can_download"):
         frappe.throw(download_check.get("reason", "Download not allowed"))
@@ -42,23 +44,7 @@ def download_item_documents(item_code, version=None):
         version_number = f"v{current_version}"
         
         # Get all Document records linked to this Item
-        doc_links = frappe.get_all(
-            "Item Drawing Link",
-            filters={"parent": item_code, "parenttype": "Item"},
-            fields=["link", "version", "type"]
-        )
-        
-        documents = []
-        for link in doc_links:
-            if link.link and frappe.db.exists("Document", link.link):
-                doc_record = frappe.get_doc("Document", link.link)
-                documents.append({
-                    "link": link.link,
-                    "version": link.version,
-                    "type": link.type,
-                    "attachment": doc_record.get("attachment"),
-                    "filename": doc_record.get("filename") or doc_record.get("attachment")
-                })
+        documents = get_document_snapshot(item_code)
     
     if not documents:
         frappe.throw("No documents found for this version")
@@ -1,10 +1,64 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
 import frappe
 from frappe import _
-from frappe.utils import getdate, today, date_diff, flt
+from frappe.model import table_fields
+from frappe.utils import add_days, cint, getdate, get_datetime, now_datetime, today, date_diff, flt
+
+from plm_customizations.api import gantt_vectorized
+from plm_customizations.api.critical_path import apply_critical_path
+
+
+# Order type keys used by the Gantt page, mapped to their DocType
+ORDER_TYPE_DOCTYPES = {
+    "purchase": "Purchase Order",
+    "work": "Work Order",
+    "sales": "Sales Order"
+}
+
+# Order types whose orders have an Order Dependency table
+DEPENDENT_ORDER_TYPES = ("work", "sales")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Prefix of cached task lists, see get_cached_order_tasks
+GANTT_CACHE_PREFIX = "plm_gantt_tasks"
+
+# Prefix of the per order type generation that is part of every task cache
+# key; clear_gantt_cache bumps it instead of deleting keys by pattern
+GANTT_CACHE_GENERATION_PREFIX = "plm_gantt_generation"
+
+# Upper bound on the lifetime of cached task lists. Progress written without
+# doc_events (db_set, status updaters) is picked up on the next computation:
+# live, or from the schedule state table, which computes orders modified
+# after their row live, see order_schedule.make_state_tasks
+GANTT_CACHE_TTL = 600
+
+# Prefix of cached critical path fields, see get_critical_path_fields
+CRITICAL_PATH_CACHE_PREFIX = "plm_gantt_critical_path"
+
+# Prefix and lifetime of cached order details, see get_order_details
+ORDER_DETAILS_CACHE_PREFIX = "plm_gantt_order_details"
+ORDER_DETAILS_CACHE_TTL = 300
+
+# Levels the Gantt can be shown at; anything but "order" returns summary bars
+GANTT_GRANULARITIES = ("order", "project", "week", "month")
+
+# Task fields sent as day offsets and as dictionary codes in the columnar format
+COLUMNAR_DATE_FIELDS = (
+    "start", "end", "required_date", "planned_start", "planned_end", "actual_start",
+    "actual_end", "estimated_shipping", "actual_shipping", "customer_required_date",
+    "actual_delivery"
+)
+COLUMNAR_DICTIONARY_FIELDS = ("type", "status", "status_color")
 
 
 @frappe.whitelist()
-def get_gantt_data(project=None, from_date=None, to_date=None, order_types=None):
+def get_gantt_data(project=None, from_date=None, to_date=None, order_types=None, since=None,
+                   parallel=None, granularity=None, format=None):
     """
     Get Gantt chart data for Purchase Orders, Work Orders, and Sales Orders.
     
@@ -13,65 +67,799 @@ def get_gantt_data(project=None, from_date=None, to_date=None, order_types=None)
         from_date: Start date filter
         to_date: End date filter
         order_types: Comma-separated list of order types to include (purchase,work,sales)
+        since: Optional sync_time from a previous response; only changes after it are returned
+        parallel: Load the order types concurrently, each in its own thread and DB connection
+        granularity: order (default), project, week or month; anything but order
+            returns one summary bar per bucket, see get_gantt_rollups
+        format: "columnar" to send tasks as one array per field, see encode_columnar_tasks
     
     Returns:
-        dict with tasks list for Gantt chart
+        dict with tasks list for Gantt chart, ids of tasks blocked by a
+        dependency cycle and sync_time for the next incremental call.
+        Each task carries critical, total_float and propagated_delay_days.
+    """
+    if granularity and granularity != "order":
+        bars = get_gantt_rollups(project, from_date, to_date, order_types, granularity)
+        return {
+            "tasks": format_tasks(bars, format),
+            "granularity": granularity,
+            "sync_time": str(now_datetime())
+        }
+    
+    if since:
+        changes = get_gantt_changes(project, from_date, to_date, order_types, since)
+        apply_cached_critical_path(changes["tasks"], project, from_date, to_date, order_types)
+        changes["tasks"] = format_tasks(changes["tasks"], format)
+        return changes
+    
+    sync_time = str(now_datetime())
+    tasks = get_gantt_tasks(project, from_date, to_date, order_types, cint(parallel))
+    cycles = apply_critical_path(tasks)
+    
+    return {"tasks": format_tasks(tasks, format), "cycles": cycles, "sync_time": sync_time}
+
+
+def get_gantt_changes(project=None, from_date=None, to_date=None, order_types=None, since=None):
+    """
+    Get Gantt tasks changed after `since`.
+    
+    Returns tasks for orders (or their Order Dependency rows) modified after
+    `since` that are still in the window, and tombstones for modified orders
+    that were cancelled, deleted or moved out of the window. Derived delay
+    fields depend on today's date, so a sync from a previous day asks the
+    client to reload instead.
     """
+    sync_time = now_datetime()
+    since = get_datetime(since)
+    
+    if getdate(since) != getdate(today()):
+        return {"reload": True, "tasks": [], "removed": [], "sync_time": str(sync_time)}
+    
     tasks = []
+    removed = []
     
-    # Parse order types
-    if order_types:
-        types_list = [t.strip() for t in order_types.split(",")]
-    else:
-        types_list = ["purchase", "work", "sales"]
+    for order_type in parse_order_types(order_types):
+        doctype = ORDER_TYPE_DOCTYPES[order_type]
+        
+        changed_names = set(frappe.get_all(
+            doctype,
+            filters={"modified": [">", since]},
+            pluck="name"
+        ))
+        changed_names.update(frappe.get_all(
+            "Order Dependency",
+            filters={"parenttype": doctype, "modified": [">", since]},
+            pluck="parent"
+        ))
+        
+        if changed_names:
+            orders = get_orders(
+                doctype,
+                fields=ORDER_FIELDS[doctype],
+                project=project,
+                from_date=from_date,
+                to_date=to_date,
+                names=list(changed_names)
+            )
+            tasks.extend(get_task_builder(order_type)(orders))
+            
+            # Anything that changed but no longer matches is removed from the client
+            changed_names.difference_update(order.name for order in orders)
+        
+        changed_names.update(frappe.get_all(
+            "Deleted Document",
+            filters={"deleted_doctype": doctype, "creation": [">", since]},
+            pluck="deleted_name"
+        ))
+        removed.extend({"id": name, "type": order_type} for name in sorted(changed_names))
     
-    # Get Purchase Orders
-    if "purchase" in types_list:
-        tasks.extend(get_purchase_order_tasks(project, from_date, to_date))
+    apply_order_dependencies(tasks)
+    return {"tasks": tasks, "removed": removed, "sync_time": str(sync_time)}
+
+
+def get_gantt_tasks(project=None, from_date=None, to_date=None, order_types=None, parallel=False):
+    """Get the Gantt tasks of every requested order type, with their dependencies"""
+    tasks = list(iter_gantt_tasks(project, from_date, to_date, order_types, parallel))
+    apply_order_dependencies(tasks)
+    return tasks
+
+
+def iter_gantt_tasks(project=None, from_date=None, to_date=None, order_types=None, parallel=False):
+    """Yield Gantt tasks for each requested order type in turn"""
+    types_list = parse_order_types(order_types)
     
-    # Get Work Orders
-    if "work" in types_list:
-        tasks.extend(get_work_order_tasks(project, from_date, to_date))
+    if parallel and len(types_list) > 1:
+        for tasks in get_order_tasks_in_threads(types_list, project, from_date, to_date):
+            yield from tasks
+        return
     
-    # Get Sales Orders
-    if "sales" in types_list:
-        tasks.extend(get_sales_order_tasks(project, from_date, to_date))
+    for order_type in types_list:
+        yield from get_cached_order_tasks(order_type, project, from_date, to_date)
+
+
+def get_order_tasks_in_threads(order_types, project=None, from_date=None, to_date=None,
+                               loader=None):
+    """
+    Load the tasks of several order types concurrently, one thread per type.
+    
+    A database connection cannot be shared between threads, so each thread
+    initializes the site and connects on its own. Results are returned in
+    the order of order_types so the merged task list is deterministic.
+    
+    Args:
+        loader: Function called as loader(order_type, project, from_date, to_date),
+                defaults to get_cached_order_tasks
+    """
+    site = frappe.local.site
+    sites_path = frappe.local.sites_path
+    user = frappe.session.user
+    loader = loader or get_cached_order_tasks
     
-    return {"tasks": tasks}
+    with ThreadPoolExecutor(max_workers=len(order_types)) as executor:
+        futures = [
+            executor.submit(
+                run_in_site_context, site, sites_path, user,
+                loader, order_type, project, from_date, to_date
+            )
+            for order_type in order_types
+        ]
+        return [future.result() for future in futures]
 
 
-def get_purchase_order_tasks(project=None, from_date=None, to_date=None):
-    """Get Purchase Order tasks for Gantt chart"""
+def run_in_site_context(site, sites_path, user, method, *args):
+    """Run method in a new site context with its own database connection"""
+    frappe.init(site=site, sites_path=sites_path)
+    try:
+        frappe.connect()
+        frappe.set_user(user)
+        return method(*args)
+    finally:
+        frappe.destroy()
+
+
+def get_cached_order_tasks(order_type, project=None, from_date=None, to_date=None):
+    """
+    Get Gantt tasks for one order type from cache, computing them on a miss.
+    
+    Entries are invalidated by clear_gantt_cache when an order changes and
+    expire after GANTT_CACHE_TTL, or at midnight if that is sooner, since
+    delay fields are computed against today's date.
+    """
+    key = get_gantt_cache_key(order_type, project, from_date, to_date)
+    tasks = frappe.cache().get_value(key)
+    
+    if tasks is None:
+        tasks = get_order_tasks(order_type, project, from_date, to_date)
+        
+        expires_in_sec = min(GANTT_CACHE_TTL, get_seconds_until_midnight())
+        frappe.cache().set_value(key, tasks, expires_in_sec=expires_in_sec)
+    
+    return tasks
+
+
+def get_seconds_until_midnight():
+    """Seconds left until tomorrow, when delay fields have to be recomputed"""
+    expires_in_sec = (get_datetime(add_days(today(), 1)) - now_datetime()).total_seconds()
+    return max(cint(expires_in_sec), 1)
+
+
+def get_order_tasks(order_type, project=None, from_date=None, to_date=None):
+    """
+    Get Gantt tasks for one order type, bypassing the cache.
+    
+    Once the Order Schedule State table is up to date for today, tasks are
+    read from it instead of being computed from the orders, except for
+    orders modified after their row was written.
+    """
+    # order_schedule builds its rows with this module, so import it late
+    from plm_customizations.api import order_schedule
+    
+    if order_schedule.is_schedule_state_ready():
+        states = order_schedule.get_schedule_states(
+            ORDER_TYPE_DOCTYPES[order_type], project, from_date, to_date
+        )
+        return list(order_schedule.make_state_tasks(states))
+    
+    return get_live_order_tasks(order_type, project, from_date, to_date)
+
+
+def get_live_order_tasks(order_type, project=None, from_date=None, to_date=None):
+    """Compute Gantt tasks for one order type from the orders themselves"""
+    get_tasks = {
+        "purchase": get_purchase_order_tasks,
+        "work": get_work_order_tasks,
+        "sales": get_sales_order_tasks
+    }[order_type]
+    return get_tasks(project, from_date, to_date)
+
+
+def get_gantt_cache_key(order_type, project=None, from_date=None, to_date=None):
+    """Cache key for the tasks of one order type and project on today's date"""
+    return "|".join([
+        GANTT_CACHE_PREFIX, order_type, get_gantt_cache_generation(order_type),
+        project or "", today(),
+        str(getdate(from_date)) if from_date else "",
+        str(getdate(to_date)) if to_date else ""
+    ])
+
+
+def get_gantt_cache_generation(order_type):
+    """Current cache generation of an order type, see clear_gantt_cache"""
+    return frappe.cache().get_value("|".join([GANTT_CACHE_GENERATION_PREFIX, order_type])) or ""
+
+
+def clear_gantt_cache(doc=None, method=None):
+    """
+    Hook: Invalidate cached Gantt tasks when a Purchase, Work or Sales Order changes.
+    Called via hooks.py doc_events. Without a document, invalidates all order types.
+    
+    Each order type's cached task lists carry its generation in their key, so
+    invalidating is a single write of a new generation; the old entries are
+    never read again and expire on their own.
+    """
+    if doc is None:
+        order_types = list(ORDER_TYPE_DOCTYPES)
+    else:
+        order_types = [t for t, dt in ORDER_TYPE_DOCTYPES.items() if dt == doc.doctype]
+    
+    for order_type in order_types:
+        frappe.cache().set_value(
+            "|".join([GANTT_CACHE_GENERATION_PREFIX, order_type]),
+            frappe.generate_hash(length=8)
+        )
+
+
+@frappe.whitelist()
+def get_gantt_data_page(project=None, from_date=None, to_date=None, order_types=None,
+                        cursor=None, page_size=DEFAULT_PAGE_SIZE, format=None):
+    """
+    Get one page of Gantt tasks ordered by start date and order name.
+    
+    Each order type is read with a keyset condition on (start date, name)
+    and the per-type streams are merged lazily until the page is full.
+    Once the Order Schedule State table is ready for today the keyset is
+    served by its (order_doctype, start_date, order_name) index, so a page
+    costs the same no matter how deep into the result set it is. Until
+    then pages fall back to get_unindexed_order_page, see there.
+    
+    Args:
+        project: Filter by project
+        from_date: Start date filter
+        to_date: End date filter
+        order_types: Comma-separated list of order types to include (purchase,work,sales)
+        cursor: Cursor returned with the previous page, None for the first page
+        page_size: Number of tasks per page
+        format: "columnar" to send tasks as one array per field, see encode_columnar_tasks
+    
+    Returns:
+        dict with tasks list, cursor for the next page, has_more flag and
+        indexed, False when the pages came from the unindexed fallback.
+        Tasks carry critical path fields, see apply_cached_critical_path
+    """
+    from plm_customizations.api import order_schedule
+    
+    page_size = min(max(cint(page_size), 1), MAX_PAGE_SIZE)
+    cursor = frappe.parse_json(cursor) if cursor else {}
+    
+    sync_time = str(now_datetime())
+    use_schedule_state = order_schedule.is_schedule_state_ready()
+    streams = []
+    for order_type in parse_order_types(order_types):
+        doctype = ORDER_TYPE_DOCTYPES[order_type]
+        
+        if use_schedule_state:
+            states = order_schedule.get_schedule_states(
+                doctype, project, from_date, to_date,
+                after=cursor.get(order_type),
+                limit=page_size + 1
+            )
+            streams.append(iter_keyed_tasks(order_type, states, order_schedule.make_state_tasks))
+            continue
+        
+        orders = get_unindexed_order_page(
+            doctype, project, from_date, to_date,
+            after=cursor.get(order_type),
+            limit=page_size + 1
+        )
+        streams.append(iter_keyed_tasks(order_type, orders, get_task_builder(order_type)))
+    
     tasks = []
+    next_cursor = dict(cursor)
+    has_more = False
+    
+    for key, order_type, task in heapq.merge(*streams, key=lambda t: t[0]):
+        if len(tasks) >= page_size:
+            has_more = True
+            break
+        tasks.append(task)
+        next_cursor[order_type] = list(key)
+    
+    apply_order_dependencies(tasks)
+    apply_cached_critical_path(tasks, project, from_date, to_date, order_types)
+    
+    return {
+        "tasks": format_tasks(tasks, format),
+        "cursor": next_cursor,
+        "has_more": has_more,
+        "indexed": use_schedule_state,
+        "sync_time": sync_time
+    }
+
+
+def apply_cached_critical_path(tasks, project=None, from_date=None, to_date=None, order_types=None):
+    """
+    Set critical, total_float and propagated_delay_days on a subset of tasks.
+    
+    The critical path depends on every order in the window, so it is taken
+    from get_critical_path_fields rather than computed over the subset.
+    """
+    if not tasks:
+        return
+    
+    fields = get_critical_path_fields(project, from_date, to_date, order_types)
+    for task in tasks:
+        values = fields.get("{0}:{1}".format(task["type"], task["id"]))
+        if values:
+            task["critical"], task["total_float"], task["propagated_delay_days"] = values
+
+
+def get_critical_path_fields(project=None, from_date=None, to_date=None, order_types=None):
+    """
+    Get the critical path fields of every task in the window, from cache.
+    
+    The result is computed with apply_critical_path over the (cached) full
+    task list and cached under the generations of the order types involved,
+    so it is recomputed after clear_gantt_cache like the task lists are.
+    
+    Returns:
+        dict of "type:id" -> [critical, total_float, propagated_delay_days]
+    """
+    types_list = parse_order_types(order_types)
+    key = "|".join(
+        [CRITICAL_PATH_CACHE_PREFIX, project or "", today(),
+         str(getdate(from_date)) if from_date else "",
+         str(getdate(to_date)) if to_date else ""]
+        + ["{0}:{1}".format(t, get_gantt_cache_generation(t)) for t in types_list]
+    )
+    fields = frappe.cache().get_value(key)
+    
+    if fields is None:
+        tasks = get_gantt_tasks(project, from_date, to_date, ",".join(types_list))
+        apply_critical_path(tasks)
+        fields = {
+            "{0}:{1}".format(task["type"], task["id"]):
+                [task["critical"], task["total_float"], task["propagated_delay_days"]]
+            for task in tasks
+        }
+        
+        expires_in_sec = min(GANTT_CACHE_TTL, get_seconds_until_midnight())
+        frappe.cache().set_value(key, fields, expires_in_sec=expires_in_sec)
+    
+    return fields
+
+
+def get_unindexed_order_page(doctype, project=None, from_date=None, to_date=None, after=None,
+                             limit=None):
+    """
+    Fallback for get_gantt_data_page until Order Schedule State is ready.
+    
+    The sort date is the COALESCE of the order's date fields, which no index
+    on the order table can serve, so every page is a full scan and filesort
+    of the matching orders. This only happens between midnight and the next
+    hourly refresh_order_schedule_states run, or on sites where the
+    scheduler is disabled.
+    """
+    return get_orders(
+        doctype,
+        fields=ORDER_FIELDS[doctype],
+        project=project,
+        from_date=from_date,
+        to_date=to_date,
+        order_by="`gantt_sort_date`, `name`",
+        after=after,
+        limit=limit
+    )
+
+
+def get_gantt_rollups(project=None, from_date=None, to_date=None, order_types=None,
+                      granularity="project"):
+    """
+    Get summary bars for zoomed-out Gantt views.
+    
+    Orders are grouped in the database per project, or per week or month of
+    their start date, using the same date fallbacks as the order tasks.
+    The per-type groups are then merged into one bar per bucket.
+    
+    Returns:
+        list of bars with start, end, duration-weighted progress and the
+        number of orders, delayed orders and at-risk orders in the bucket
+    """
+    if granularity not in GANTT_GRANULARITIES:
+        frappe.throw(_("Invalid granularity: {0}").format(granularity))
+    
+    buckets = {}
+    for order_type in parse_order_types(order_types):
+        doctype = ORDER_TYPE_DOCTYPES[order_type]
+        for row in get_order_rollups(doctype, granularity, project, from_date, to_date):
+            key = str(row.bucket or "")
+            bucket = buckets.setdefault(key, {
+                "start": row.start,
+                "end": row.end,
+                "weighted_progress": 0,
+                "weight": 0,
+                "order_count": 0,
+                "delayed_count": 0,
+                "at_risk_count": 0,
+                "order_counts": {}
+            })
+            bucket["start"] = min(getdate(bucket["start"]), getdate(row.start))
+            bucket["end"] = max(getdate(bucket["end"]), getdate(row.end))
+            bucket["weighted_progress"] += flt(row.weighted_progress)
+            bucket["weight"] += flt(row.weight)
+            bucket["order_count"] += cint(row.order_count)
+            bucket["delayed_count"] += cint(row.delayed_count)
+            bucket["at_risk_count"] += cint(row.at_risk_count)
+            bucket["order_counts"][order_type] = cint(row.order_count)
+    
+    project_names = {}
+    if granularity == "project" and buckets:
+        project_names = dict(frappe.get_all(
+            "Project",
+            filters={"name": ["in", list(buckets)]},
+            fields=["name", "project_name"],
+            as_list=True
+        ))
+    
+    bars = []
+    for key, bucket in buckets.items():
+        progress = flt(bucket["weighted_progress"] / bucket["weight"], 2) if bucket["weight"] else 0
+        
+        if granularity == "project":
+            name = project_names.get(key) or key or _("No Project")
+        elif granularity == "week":
+            name = _("Week of {0}").format(key)
+        else:
+            name = getdate(key).strftime("%b %Y")
+        
+        if progress >= 100:
+            status_color = "completed"
+        elif bucket["delayed_count"]:
+            status_color = "delayed"
+        elif bucket["at_risk_count"]:
+            status_color = "at_risk"
+        else:
+            status_color = "normal"
+        
+        bars.append({
+            "id": key,
+            "name": name,
+            "type": granularity,
+            "start": str(bucket["start"]),
+            "end": str(bucket["end"]),
+            "progress": progress,
+            "order_count": bucket["order_count"],
+            "delayed_count": bucket["delayed_count"],
+            "at_risk_count": bucket["at_risk_count"],
+            "order_counts": bucket["order_counts"],
+            "status_color": status_color
+        })
+    
+    bars.sort(key=lambda bar: (bar["start"], bar["id"]))
+    return bars
+
+
+def format_tasks(tasks, format=None):
+    """Return tasks as a list of dicts, or column-oriented if format is "columnar" """
+    if format == "columnar":
+        return encode_columnar_tasks(tasks)
+    return tasks
+
+
+def encode_columnar_tasks(tasks):
+    """
+    Encode Gantt tasks as one array per field.
+    
+    Field names are sent once instead of once per task. Dates become whole
+    day offsets from `epoch` (the earliest date sent), and type, status and
+    status_color become indexes into `dictionaries`. Fields a task does not
+    have are null.
+    
+    Returns:
+        dict with length, epoch, columns and dictionaries
+    """
+    fields = []
+    for task in tasks:
+        for field in task:
+            if field not in fields:
+                fields.append(field)
+    
+    # Dates come as "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"; only the day is kept
+    ordinals = {}
+    for task in tasks:
+        for field in COLUMNAR_DATE_FIELDS:
+            value = task.get(field)
+            if value and value not in ordinals:
+                ordinals[value] = getdate(str(value)[:10]).toordinal()
+    epoch = min(ordinals.values()) if ordinals else getdate(today()).toordinal()
+    
+    columns = {}
+    dictionaries = {}
+    for field in fields:
+        values = [task.get(field) for task in tasks]
+        
+        if field in COLUMNAR_DATE_FIELDS:
+            values = [ordinals[v] - epoch if v else None for v in values]
+        elif field in COLUMNAR_DICTIONARY_FIELDS:
+            codes = {}
+            values = [codes.setdefault(v, len(codes)) for v in values]
+            dictionaries[field] = list(codes)
+        
+        columns[field] = values
+    
+    return {
+        "length": len(tasks),
+        "epoch": date.fromordinal(epoch).isoformat(),
+        "columns": columns,
+        "dictionaries": dictionaries
+    }
+
+
+def iter_keyed_tasks(order_type, orders, make_tasks):
+    """Yield (sort key, order type, task) for order rows fetched by get_orders"""
+    for order, task in zip(orders, make_tasks(orders)):
+        yield (str(order.gantt_sort_date), order.name), order_type, task
+
+
+def get_task_builder(order_type):
+    """Get the function that turns order rows of an order type into Gantt tasks"""
+    return {
+        "purchase": make_purchase_order_tasks,
+        "work": make_work_order_tasks,
+        "sales": make_sales_order_tasks
+    }[order_type]
+
+
+def parse_order_types(order_types=None):
+    """Parse comma-separated order types, defaulting to all types"""
+    if order_types:
+        return [t.strip() for t in order_types.split(",") if t.strip() in ORDER_TYPE_DOCTYPES]
+    return list(ORDER_TYPE_DOCTYPES)
+
+
+# Fields fetched for each order type to build Gantt tasks
+ORDER_FIELDS = {
+    "Purchase Order": [
+        "name", "supplier_name", "transaction_date", "schedule_date",
+        "eta_date", "per_received", "status", "project"
+    ],
+    "Work Order": [
+        "name", "production_item", "item_name", "planned_start_date",
+        "planned_end_date", "expected_delivery_date", "actual_start_date",
+        "actual_end_date", "qty", "produced_qty", "status", "project"
+    ],
+    "Sales Order": [
+        "name", "customer_name", "transaction_date", "delivery_date",
+        "estimated_shipping_date", "actual_shipping_date", "actual_delivery_date",
+        "per_delivered", "status", "delivery_status", "project"
+    ]
+}
+
+
+# Display start/end date of each order type as SQL expressions.
+# These mirror the fallbacks used when building tasks so that the
+# from_date/to_date window can be applied by the database.
+ORDER_DATE_EXPRESSIONS = {
+    "Purchase Order": {
+        "start": "COALESCE(`transaction_date`, %(today)s)",
+        "end": "COALESCE(`eta_date`, `schedule_date`, `transaction_date`, %(today)s)"
+    },
+    "Work Order": {
+        "start": "COALESCE(`actual_start_date`, `planned_start_date`, %(today)s)",
+        "end": "COALESCE(`actual_end_date`, `planned_end_date`, `expected_delivery_date`, "
+               "`actual_start_date`, `planned_start_date`, %(today)s)"
+    },
+    "Sales Order": {
+        "start": "COALESCE(`transaction_date`, %(today)s)",
+        "end": "COALESCE(`actual_delivery_date`, `delivery_date`, `transaction_date`, %(today)s)"
+    }
+}
+
+
+# Progress and status color of each order type as SQL expressions, used to
+# aggregate orders in the database. They follow the task builders: completed
+# first, then delayed, then at risk.
+ORDER_ROLLUP_EXPRESSIONS = {
+    "Purchase Order": {
+        "progress": "IFNULL(`per_received`, 0)",
+        "status_color": """CASE
+            WHEN IFNULL(`per_received`, 0) >= 100 THEN 'completed'
+            WHEN `schedule_date` < %(today)s THEN 'delayed'
+            WHEN `eta_date` > `schedule_date` THEN 'at_risk'
+            ELSE 'normal' END"""
+    },
+    "Work Order": {
+        "progress": "CASE WHEN `qty` > 0 THEN ROUND(IFNULL(`produced_qty`, 0) / `qty` * 100, 2) ELSE 0 END",
+        "status_color": """CASE
+            WHEN `qty` > 0 AND ROUND(IFNULL(`produced_qty`, 0) / `qty` * 100, 2) >= 100 THEN 'completed'
+            WHEN DATE(COALESCE(`planned_end_date`, `expected_delivery_date`)) < %(today)s THEN 'delayed'
+            WHEN DATE(`actual_start_date`) > DATE(`planned_start_date`) THEN 'at_risk'
+            WHEN `actual_start_date` IS NULL AND DATE(`planned_start_date`) < %(today)s THEN 'at_risk'
+            ELSE 'normal' END"""
+    },
+    "Sales Order": {
+        "progress": "IFNULL(`per_delivered`, 0)",
+        "status_color": """CASE
+            WHEN IFNULL(`per_delivered`, 0) >= 100 THEN 'completed'
+            WHEN `actual_delivery_date` > `delivery_date` THEN 'delayed'
+            WHEN `actual_delivery_date` IS NULL AND `delivery_date` < %(today)s THEN 'delayed'
+            WHEN `actual_shipping_date` > `estimated_shipping_date` THEN 'at_risk'
+            WHEN `actual_shipping_date` IS NULL AND `estimated_shipping_date` < %(today)s THEN 'at_risk'
+            ELSE 'normal' END"""
+    }
+}
+
+# Bucket of an order for each rollup granularity, given its start expression.
+# Weeks start on Monday; months on their first day.
+ROLLUP_BUCKET_EXPRESSIONS = {
+    "project": "IFNULL(`project`, '')",
+    "week": "DATE_SUB(DATE({start}), INTERVAL WEEKDAY({start}) DAY)",
+    "month": "DATE_SUB(DATE({start}), INTERVAL DAYOFMONTH({start}) - 1 DAY)"
+}
+
+
+def get_orders(doctype, fields, project=None, from_date=None, to_date=None, order_by=None,
+               after=None, limit=None, names=None):
+    """
+    Get draft and submitted orders whose display period overlaps the date window.
+    
+    An order is kept when its end date is on or after from_date and its
+    start date is on or before to_date, using ORDER_DATE_EXPRESSIONS.
+    Each row also carries its display start date as gantt_sort_date.
+    
+    Args:
+        after: Optional (sort date, name) keyset position; only rows after it are returned
+        limit: Optional maximum number of rows
+        names: Optional list of order names to restrict the query to
+    """
+    sort_date = "DATE({0})".format(ORDER_DATE_EXPRESSIONS[doctype]["start"])
+    conditions, values = get_order_conditions(doctype, project, from_date, to_date)
+    
+    if names is not None:
+        conditions.append("`name` in %(names)s")
+        values["names"] = tuple(names) or ("",)
+    
+    if after:
+        conditions.append(
+            "({0} > %(after_date)s OR ({0} = %(after_date)s AND `name` > %(after_name)s))".format(sort_date)
+        )
+        values["after_date"] = getdate(after[0])
+        values["after_name"] = after[1]
+    
+    return frappe.db.sql(
+        """
+        SELECT {fields}, {sort_date} AS `gantt_sort_date`
+        FROM `tab{doctype}`
+        WHERE {conditions}
+        ORDER BY {order_by}
+        {limit}
+        """.format(
+            fields=", ".join("`{0}`".format(f) for f in fields),
+            sort_date=sort_date,
+            doctype=doctype,
+            conditions=" AND ".join(conditions),
+            order_by=order_by or "`name`",
+            limit="LIMIT {0}".format(cint(limit)) if limit else ""
+        ),
+        values,
+        as_dict=True
+    )
+
+
+def get_order_rollups(doctype, granularity, project=None, from_date=None, to_date=None):
+    """
+    Aggregate orders of one DocType per bucket with a single GROUP BY query.
+    
+    Progress is weighted by the order's duration in days so long orders
+    count more than short ones. Delayed and at-risk counts use the same
+    rules as the task status colors.
+    """
+    dates = ORDER_DATE_EXPRESSIONS[doctype]
+    conditions, values = get_order_conditions(doctype, project, from_date, to_date)
+    
+    return frappe.db.sql(
+        """
+        SELECT `bucket`,
+            MIN(`start`) AS `start`,
+            MAX(`end`) AS `end`,
+            SUM(`progress` * (GREATEST(DATEDIFF(`end`, `start`), 0) + 1)) AS `weighted_progress`,
+            SUM(GREATEST(DATEDIFF(`end`, `start`), 0) + 1) AS `weight`,
+            COUNT(*) AS `order_count`,
+            SUM(CASE WHEN `status_color` = 'delayed' THEN 1 ELSE 0 END) AS `delayed_count`,
+            SUM(CASE WHEN `status_color` = 'at_risk' THEN 1 ELSE 0 END) AS `at_risk_count`
+        FROM (
+            SELECT {bucket} AS `bucket`,
+                DATE({start}) AS `start`,
+                DATE({end}) AS `end`,
+                {progress} AS `progress`,
+                {status_color} AS `status_color`
+            FROM `tab{doctype}`
+            WHERE {conditions}
+        ) AS `orders`
+        GROUP BY `bucket`
+        """.format(
+            bucket=ROLLUP_BUCKET_EXPRESSIONS[granularity].format(start=dates["start"]),
+            start=dates["start"],
+            end=dates["end"],
+            progress=ORDER_ROLLUP_EXPRESSIONS[doctype]["progress"],
+            status_color=ORDER_ROLLUP_EXPRESSIONS[doctype]["status_color"],
+            doctype=doctype,
+            conditions=" AND ".join(conditions)
+        ),
+        values,
+        as_dict=True
+    )
+
+
+def get_order_conditions(doctype, project=None, from_date=None, to_date=None):
+    """
+    Build the WHERE conditions shared by get_orders and get_order_rollups.
+    
+    Returns:
+        tuple of (list of SQL conditions, dict of query values)
+    """
+    dates = ORDER_DATE_EXPRESSIONS[doctype]
+    conditions = ["`docstatus` in (0, 1)"]
+    values = {"today": today()}
     
-    filters = {"docstatus": ["in", [0, 1]]}
     if project:
-        filters["project"] = project
+        conditions.append("`project` = %(project)s")
+        values["project"] = project
     
-    orders = frappe.get_all(
+    if from_date:
+        conditions.append("DATE({0}) >= %(from_date)s".format(dates["end"]))
+        values["from_date"] = getdate(from_date)
+    
+    if to_date:
+        conditions.append("DATE({0}) <= %(to_date)s".format(dates["start"]))
+        values["to_date"] = getdate(to_date)
+    
+    return conditions, values
+
+
+def get_purchase_order_tasks(project=None, from_date=None, to_date=None):
+    """Get Purchase Order tasks for Gantt chart"""
+    orders = get_orders(
         "Purchase Order",
-        filters=filters,
-        fields=[
-            "name", "supplier_name", "transaction_date", "schedule_date",
-            "eta_date", "per_received", "status", "project"
-        ],
+        fields=ORDER_FIELDS["Purchase Order"],
+        project=project,
+        from_date=from_date,
+        to_date=to_date,
         order_by="schedule_date"
     )
     
+    return list(make_purchase_order_tasks(orders))
+
+
+def make_purchase_order_tasks(orders):
+    """Yield Purchase Order tasks for Gantt chart from Purchase Order rows"""
     today_date = getdate(today())
     
+    build = (
+        gantt_vectorized.build_purchase_order_tasks
+        if gantt_vectorized.use_vectorized(orders)
+        else build_purchase_order_tasks
+    )
+    yield from build(orders, today_date)
+
+
+def build_purchase_order_tasks(orders, today_date, dependency_map=None):
+    """Yield Purchase Order tasks, computing delay fields row by row"""
     for order in orders:
         start_date = order.transaction_date or today_date
         # Use ETA if available, otherwise use schedule_date
         end_date = order.eta_date or order.schedule_date or start_date
         required_date = order.schedule_date
         
-        # Apply date filter
-        if from_date and getdate(end_date) < getdate(from_date):
-            continue
-        if to_date and getdate(start_date) > getdate(to_date):
-            continue
-        
         # Calculate delay
         is_delayed = False
         delay_days = 0
@@ -95,7 +883,7 @@ def get_purchase_order_tasks(project=None, from_date=None, to_date=None):
         else:
             status_color = "normal"
         
-        tasks.append({
+        yield {
             "id": order.name,
             "name": f"PO: {order.supplier_name or order.name}",
             "type": "purchase",
@@ -110,32 +898,42 @@ def get_purchase_order_tasks(project=None, from_date=None, to_date=None):
             "status": order.status,
             "status_color": status_color,
             "project": order.project
-        })
-    
-    return tasks
+        }
 
 
 def get_work_order_tasks(project=None, from_date=None, to_date=None):
     """Get Work Order tasks for Gantt chart"""
-    tasks = []
-    
-    filters = {"docstatus": ["in", [0, 1]]}
-    if project:
-        filters["project"] = project
-    
-    orders = frappe.get_all(
+    orders = get_orders(
         "Work Order",
-        filters=filters,
-        fields=[
-            "name", "production_item", "item_name", "planned_start_date", 
-            "planned_end_date", "expected_delivery_date", "actual_start_date",
-            "actual_end_date", "qty", "produced_qty", "status", "project"
-        ],
+        fields=ORDER_FIELDS["Work Order"],
+        project=project,
+        from_date=from_date,
+        to_date=to_date,
         order_by="planned_start_date"
     )
     
+    return list(make_work_order_tasks(orders))
+
+
+def make_work_order_tasks(orders):
+    """
+    Yield Work Order tasks for Gantt chart from Work Order rows.
+    Dependencies are left empty; see apply_order_dependencies.
+    """
     today_date = getdate(today())
     
+    build = (
+        gantt_vectorized.build_work_order_tasks
+        if gantt_vectorized.use_vectorized(orders)
+        else build_work_order_tasks
+    )
+    yield from build(orders, today_date)
+
+
+def build_work_order_tasks(orders, today_date, dependency_map=None):
+    """Yield Work Order tasks, computing delay fields row by row"""
+    dependency_map = dependency_map or {}
+    
     for order in orders:
         # Planned dates
         planned_start = order.planned_start_date
@@ -149,12 +947,6 @@ def get_work_order_tasks(project=None, from_date=None, to_date=None):
         start_date = actual_start or planned_start or today_date
         end_date = actual_end or planned_end or start_date
         
-        # Apply date filter
-        if from_date and getdate(end_date) < getdate(from_date):
-            continue
-        if to_date and getdate(start_date) > getdate(to_date):
-            continue
-        
         # Calculate progress
         progress = 0
         if order.qty and order.qty > 0:
@@ -191,7 +983,7 @@ def get_work_order_tasks(project=None, from_date=None, to_date=None):
         delay_days = max(start_delay_days, end_delay_days)
         
         # Get dependencies
-        dependencies = get_order_dependencies("Work Order", order.name)
+        dependencies = dependency_map.get(("Work Order", order.name), [])
         
         # Determine status color
         if progress >= 100:
@@ -206,7 +998,7 @@ def get_work_order_tasks(project=None, from_date=None, to_date=None):
         else:
             status_color = "normal"
         
-        tasks.append({
+        yield {
             "id": order.name,
             "name": f"WO: {order.item_name or order.production_item}",
             "type": "work",
@@ -228,32 +1020,42 @@ def get_work_order_tasks(project=None, from_date=None, to_date=None):
             "end_delay_days": end_delay_days,
             "start_delayed": start_delayed,
             "end_delayed": end_delayed
-        })
-    
-    return tasks
+        }
 
 
 def get_sales_order_tasks(project=None, from_date=None, to_date=None):
     """Get Sales Order tasks for Gantt chart"""
-    tasks = []
-    
-    filters = {"docstatus": ["in", [0, 1]]}
-    if project:
-        filters["project"] = project
-    
-    orders = frappe.get_all(
+    orders = get_orders(
         "Sales Order",
-        filters=filters,
-        fields=[
-            "name", "customer_name", "transaction_date", "delivery_date",
-            "estimated_shipping_date", "actual_shipping_date", "actual_delivery_date",
-            "per_delivered", "status", "delivery_status", "project"
-        ],
+        fields=ORDER_FIELDS["Sales Order"],
+        project=project,
+        from_date=from_date,
+        to_date=to_date,
         order_by="delivery_date"
     )
     
+    return list(make_sales_order_tasks(orders))
+
+
+def make_sales_order_tasks(orders):
+    """
+    Yield Sales Order tasks for Gantt chart from Sales Order rows.
+    Dependencies are left empty; see apply_order_dependencies.
+    """
     today_date = getdate(today())
     
+    build = (
+        gantt_vectorized.build_sales_order_tasks
+        if gantt_vectorized.use_vectorized(orders)
+        else build_sales_order_tasks
+    )
+    yield from build(orders, today_date)
+
+
+def build_sales_order_tasks(orders, today_date, dependency_map=None):
+    """Yield Sales Order tasks, computing delay fields row by row"""
+    dependency_map = dependency_map or {}
+    
     for order in orders:
         # Dates
         order_date = order.transaction_date or today_date
@@ -266,12 +1068,6 @@ def get_sales_order_tasks(project=None, from_date=None, to_date=None):
         start_date = order_date
         end_date = actual_delivery or customer_required_date or start_date
         
-        # Apply date filter
-        if from_date and getdate(end_date) < getdate(from_date):
-            continue
-        if to_date and getdate(start_date) > getdate(to_date):
-            continue
-        
         # Calculate shipping delay (actual_shipping vs estimated_shipping)
         shipping_delay_days = 0
         shipping_delayed = False
@@ -302,7 +1098,7 @@ def get_sales_order_tasks(project=None, from_date=None, to_date=None):
         delay_days = max(shipping_delay_days, delivery_delay_days)
         
         # Get dependencies
-        dependencies = get_order_dependencies("Sales Order", order.name)
+        dependencies = dependency_map.get(("Sales Order", order.name), [])
         
         # Determine status color
         if order.per_delivered >= 100:
@@ -317,7 +1113,7 @@ def get_sales_order_tasks(project=None, from_date=None, to_date=None):
         else:
             status_color = "normal"
         
-        tasks.append({
+        yield {
             "id": order.name,
             "name": f"SO: {order.customer_name or order.name}",
             "type": "sales",
@@ -339,26 +1135,67 @@ def get_sales_order_tasks(project=None, from_date=None, to_date=None):
             "delivery_delay_days": delivery_delay_days,
             "shipping_delayed": shipping_delayed,
             "delivery_delayed": delivery_delayed
-        })
+        }
+
+
+def apply_order_dependencies(tasks):
+    """
+    Set the dependencies of Work and Sales Order tasks in place.
     
-    return tasks
+    The dependencies of every task in the response are loaded together with
+    one get_order_dependencies_map query, whatever the number of order types
+    and however the tasks were obtained (cache, schedule state or computed).
+    """
+    names_by_doctype = {}
+    for task in tasks:
+        if task["type"] in DEPENDENT_ORDER_TYPES:
+            names_by_doctype.setdefault(ORDER_TYPE_DOCTYPES[task["type"]], []).append(task["id"])
+    
+    dependency_map = get_order_dependencies_map(names_by_doctype)
+    for task in tasks:
+        if task["type"] in DEPENDENT_ORDER_TYPES:
+            task["dependencies"] = dependency_map.get((ORDER_TYPE_DOCTYPES[task["type"]], task["id"]), [])
 
 
-def get_order_dependencies(parent_doctype, parent_name):
-    """Get dependencies for an order from Order Dependency child table"""
-    dependencies = []
+def get_order_dependencies_map(parent_names_by_doctype):
+    """
+    Get dependencies for many orders from Order Dependency child table.
+    
+    All rows are fetched with a single query and grouped in memory, so the
+    number of queries does not grow with the number of orders.
+    
+    Args:
+        parent_names_by_doctype: dict of parent doctype -> list of order names
+    
+    Returns:
+        dict of (parenttype, parent) -> list of dependent order names
+    """
+    dependency_map = {}
+    
+    parent_doctypes = [dt for dt, names in parent_names_by_doctype.items() if names]
+    if not parent_doctypes:
+        return dependency_map
+    
+    parent_names = list({name for dt in parent_doctypes for name in parent_names_by_doctype[dt]})
     
     try:
         deps = frappe.get_all(
             "Order Dependency",
-            filters={"parent": parent_name, "parenttype": parent_doctype},
-            fields=["order_name"]
+            filters={
+                "parenttype": ["in", parent_doctypes],
+                "parent": ["in", parent_names]
+            },
+            fields=["parenttype", "parent", "order_name"],
+            order_by="parenttype, parent, idx"
         )
-        dependencies = [d.order_name for d in deps if d.order_name]
     except Exception:
-        pass
+        return dependency_map
+    
+    for d in deps:
+        if d.order_name:
+            dependency_map.setdefault((d.parenttype, d.parent), []).append(d.order_name)
     
-    return dependencies
+    return dependency_map
 
 
 @frappe.whitelist()
@@ -374,12 +1211,70 @@ def get_projects():
 
 
 @frappe.whitelist()
-def get_order_details(order_id, order_type):
-    """Get detailed information about an order"""
-    if order_type == "purchase":
-        return frappe.get_doc("Purchase Order", order_id).as_dict()
-    elif order_type == "work":
-        return frappe.get_doc("Work Order", order_id).as_dict()
-    elif order_type == "sales":
-        return frappe.get_doc("Sales Order", order_id).as_dict()
-    return None
+def get_order_details(order_id, order_type, fields=None, child_tables=None):
+    """
+    Get detailed information about an order.
+    
+    Without fields or child_tables the whole document is returned. Results
+    are cached for a few minutes under the order's modified timestamp, so
+    an edited order is never served stale.
+    
+    Args:
+        order_id: Order name
+        order_type: purchase, work or sales
+        fields: Optional list (or comma-separated string) of header fields to return
+        child_tables: Optional list (or comma-separated string) of table fieldnames
+                      to include, e.g. "items"; only used together with fields
+    """
+    doctype = ORDER_TYPE_DOCTYPES.get(order_type)
+    if not doctype:
+        return None
+    
+    fields = parse_field_list(fields)
+    child_tables = parse_field_list(child_tables)
+    
+    modified = frappe.db.get_value(doctype, order_id, "modified")
+    if not modified:
+        frappe.throw(_("{0} {1} not found").format(_(doctype), order_id), frappe.DoesNotExistError)
+    
+    key = "|".join([
+        ORDER_DETAILS_CACHE_PREFIX, doctype, order_id, str(modified),
+        ",".join(fields), ",".join(child_tables)
+    ])
+    details = frappe.cache().get_value(key)
+    if details is not None:
+        return details
+    
+    if not fields and not child_tables:
+        details = frappe.get_doc(doctype, order_id).as_dict()
+    else:
+        meta = frappe.get_meta(doctype)
+        valid_fields = {f.fieldname for f in meta.fields if f.fieldtype not in table_fields} | {
+            "name", "owner", "creation", "modified", "modified_by", "docstatus"
+        }
+        details = frappe.db.get_value(
+            doctype, order_id, [f for f in fields if f in valid_fields] or ["name"], as_dict=True
+        )
+        
+        for fieldname in child_tables:
+            table_field = meta.get_field(fieldname)
+            if not table_field or table_field.fieldtype not in table_fields:
+                continue
+            details[fieldname] = frappe.get_all(
+                table_field.options,
+                filters={"parent": order_id, "parenttype": doctype, "parentfield": fieldname},
+                fields=["*"],
+                order_by="idx"
+            )
+    
+    frappe.cache().set_value(key, details, expires_in_sec=ORDER_DETAILS_CACHE_TTL)
+    return details
+
+
+def parse_field_list(value):
+    """Parse a list of fieldnames given as list, JSON list or comma-separated string"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = frappe.parse_json(value) if value.startswith("[") else value.split(",")
+    return [v.strip() for v in value if v and v.strip()]
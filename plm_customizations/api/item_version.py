@@ -1,7 +1,40 @@
 import frappe
 import json
 from frappe import _
-from frappe.utils import now_datetime
+from frappe.utils import cint, flt, now_datetime
+
+from plm_customizations.api.batch_migration import DEFAULT_BATCH_SIZE, run_in_batches
+from plm_customizations.api.plm_schema import ensure_plm_schema
+from plm_customizations.api.snapshot_store import (
+    dump_snapshot, dump_snapshots, get_content_hash, load_snapshot, load_snapshots
+)
+from plm_customizations.api.version_as_of import get_versions_as_of, log_version_statuses
+from plm_customizations.api.version_diff import (
+    add_changed_row_versions, dump_version_diff, dump_version_diffs, get_version_patch
+)
+from plm_customizations.api.version_document_ref import update_version_document_refs
+
+
+# System fields left out of Item snapshots
+ITEM_SNAPSHOT_EXCLUDED_FIELDS = ['modified', 'creation', 'modified_by', 'owner', '_user_tags', '_comments', '_assign', '_liked_by']
+
+# Item fields rewritten on every save, left out of the content hash. The other
+# PLM state fields are hashed, so an unchanged save never keeps them stale
+ITEM_HASH_EXCLUDED_FIELDS = ("published_date", "published_by")
+
+# Lists longer than this are published by a background job
+BULK_PUBLISH_BACKGROUND_THRESHOLD = 100
+
+# Items written and committed together by bulk_publish_items
+BULK_PUBLISH_CHUNK_SIZE = 200
+
+# Columns written for new Item Version rows by bulk_publish_items
+BULK_VERSION_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "item_code", "version", "status", "published_date", "published_by",
+    "item_data", "document_snapshot", "document_count", "document_size", "notes", "ecn",
+    "previous_version_diff", "content_hash"
+]
 
 
 def get_document_snapshot(item_code):
@@ -9,26 +42,119 @@ def get_document_snapshot(item_code):
     Get a snapshot of all documents attached to an Item.
     Returns a list of document data that can be stored in Item Version.
     """
-    documents = frappe.get_all(
-        "Item Drawing Link",
-        filters={"parent": item_code, "parenttype": "Item"},
-        fields=["name", "link", "version", "type"]
-    )
+    return get_document_snapshots([item_code])[item_code]
+
+
+def get_document_snapshots(item_codes):
+    """
+    Get document snapshots for several Items in one query.
+    
+    Item Drawing Link rows are joined with their Document, selecting only
+    the fields stored in a snapshot. Links to missing Documents are skipped.
+    
+    Args:
+        item_codes: list of Item codes
+    
+    Returns:
+        dict of item_code -> list of document data, as get_document_snapshot
+    """
+    snapshots = {item_code: [] for item_code in item_codes}
+    if not snapshots:
+        return snapshots
+    
+    documents = frappe.db.sql("""
+        SELECT link.parent, link.link, link.version, link.type, doc.attachment, doc.filename
+        FROM `tabItem Drawing Link` link
+        INNER JOIN `tabDocument` doc ON doc.name = link.link
+        WHERE link.parenttype = 'Item' AND link.parent IN %(item_codes)s
+        ORDER BY link.parent, link.modified DESC
+    """, {"item_codes": tuple(snapshots)}, as_dict=True)
     
-    snapshot = []
     for doc in documents:
-        # Get the Document record to get attachment info
-        if doc.link and frappe.db.exists("Document", doc.link):
-            doc_record = frappe.get_doc("Document", doc.link)
-            snapshot.append({
-                "link": doc.link,
-                "version": doc.version,
-                "type": doc.type,
-                "attachment": doc_record.get("attachment"),
-                "filename": doc_record.get("filename") or doc_record.get("attachment")
-            })
+        snapshots[doc.parent].append({
+            "link": doc.link,
+            "version": doc.version,
+            "type": doc.type,
+            "attachment": doc.attachment,
+            "filename": doc.filename or doc.attachment
+        })
+    
+    return snapshots
+
+
+def get_document_counts(item_codes):
+    """
+    Count the Item Drawing Links of several Items in one query.
     
-    return snapshot
+    Returns:
+        dict of item_code -> number of linked documents
+    """
+    counts = {item_code: 0 for item_code in item_codes}
+    if not counts:
+        return counts
+    
+    rows = frappe.db.sql("""
+        SELECT parent, COUNT(*)
+        FROM `tabItem Drawing Link`
+        WHERE parenttype = 'Item' AND parent IN %(item_codes)s
+        GROUP BY parent
+    """, {"item_codes": tuple(counts)})
+    counts.update({parent: count for parent, count in rows})
+    return counts
+
+
+def get_documents_size(documents):
+    """Total file size in bytes of the attachments in a document snapshot"""
+    return sum(get_file_sizes(doc.get("attachment") for doc in documents).values())
+
+
+def get_item_content_hash(item_data, document_snapshot):
+    """Content hash of an Item snapshot and its documents, ignoring publish date and user"""
+    return get_content_hash(item_data, document_snapshot, exclude_fields=ITEM_HASH_EXCLUDED_FIELDS)
+
+
+def get_file_sizes(file_urls):
+    """Get file size in bytes per file URL, in one query"""
+    file_urls = {url for url in file_urls if url}
+    if not file_urls:
+        return {}
+    
+    # The same file can have several File records; count each URL once
+    sizes = frappe.db.sql("""
+        SELECT file_url, MAX(file_size)
+        FROM `tabFile`
+        WHERE file_url IN %(file_urls)s
+        GROUP BY file_url
+    """, {"file_urls": tuple(file_urls)})
+    return {file_url: flt(size) for file_url, size in sizes}
+
+
+def backfill_document_counts(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Store document_count and document_size on Item Versions written before
+    these fields existed. Runs as a patch.
+    
+    Returns:
+        number of versions updated
+    """
+    def count_batch(versions):
+        updated = 0
+        snapshots = load_snapshots([v.document_snapshot for v in versions])
+        for v, documents in zip(versions, snapshots):
+            documents = documents if isinstance(documents, list) else []
+            if documents:
+                frappe.db.set_value("Item Version", v.name, {
+                    "document_count": len(documents),
+                    "document_size": get_documents_size(documents)
+                }, update_modified=False)
+                updated += 1
+        return updated
+    
+    return run_in_batches(
+        "Item Version", ["document_snapshot"], count_batch,
+        conditions="`document_count` = 0 AND `document_snapshot` IS NOT NULL AND `document_snapshot` != ''",
+        batch_size=batch_size
+    )
 
 
 def ensure_item_version_table():
@@ -117,8 +243,7 @@ def publish_item(item_code, notes=None, ecn=None):
         frappe.throw(_("ECN is required to publish an item"))
     
     # Ensure tables exist
-    ensure_item_version_table()
-    ensure_item_custom_fields()
+    ensure_plm_schema()
     
     item = frappe.get_doc("Item", item_code)
     
@@ -137,12 +262,16 @@ def publish_item(item_code, notes=None, ecn=None):
         new_version = current_version
     
     # Create version snapshot
-    item_data = item.as_dict()
-    for key in ['modified', 'creation', 'modified_by', 'owner', '_user_tags', '_comments', '_assign', '_liked_by']:
-        item_data.pop(key, None)
+    item_data = get_item_snapshot(item)
     
     # Capture document snapshot
     document_snapshot = get_document_snapshot(item_code)
+    document_size = get_documents_size(document_snapshot)
+    
+    content_hash = get_item_content_hash(item_data, document_snapshot)
+    
+    # Store the diff against the previous version for comparisons
+    previous_version_diff = dump_version_diff("Item Version", item_code, new_version, item_data)
     
     # Check if version record already exists (for Draft -> Publish case)
     version_name = f"{item_code}-v{new_version}"
@@ -152,8 +281,12 @@ def publish_item(item_code, notes=None, ecn=None):
             "status": "Published",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
+            "item_data": dump_snapshot(item_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
+            "document_snapshot": dump_snapshot(document_snapshot),
+            "document_count": len(document_snapshot),
+            "document_size": document_size,
             "notes": notes or frappe.db.get_value("Item Version", version_name, "notes"),
             "ecn": ecn
         })
@@ -166,13 +299,21 @@ def publish_item(item_code, notes=None, ecn=None):
             "status": "Published",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
+            "item_data": dump_snapshot(item_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
+            "document_snapshot": dump_snapshot(document_snapshot),
+            "document_count": len(document_snapshot),
+            "document_size": document_size,
             "notes": notes,
             "ecn": ecn
         })
         version_doc.insert(ignore_permissions=True)
     
+    # Index the snapshot's documents for where-used lookups
+    update_version_document_refs({version_name: (item_code, new_version, document_snapshot)})
+    log_version_statuses("Item Version", [version_name])
+    
     # Update Item
     frappe.db.set_value("Item", item_code, {
         "current_version": new_version,
@@ -202,8 +343,7 @@ def block_item(item_code, notes=None):
         frappe.throw(_("You don't have permission to block items"))
     
     # Ensure tables exist
-    ensure_item_version_table()
-    ensure_item_custom_fields()
+    ensure_plm_schema()
     
     item = frappe.get_doc("Item", item_code)
     
@@ -213,12 +353,16 @@ def block_item(item_code, notes=None):
     new_version = current_version if current_version > 0 else 1
     
     # Create version snapshot
-    item_data = item.as_dict()
-    for key in ['modified', 'creation', 'modified_by', 'owner', '_user_tags', '_comments', '_assign', '_liked_by']:
-        item_data.pop(key, None)
+    item_data = get_item_snapshot(item)
     
     # Capture document snapshot
     document_snapshot = get_document_snapshot(item_code)
+    document_size = get_documents_size(document_snapshot)
+    
+    content_hash = get_item_content_hash(item_data, document_snapshot)
+    
+    # Store the diff against the previous version for comparisons
+    previous_version_diff = dump_version_diff("Item Version", item_code, new_version, item_data)
     
     # Check if version record already exists
     version_name = f"{item_code}-v{new_version}"
@@ -228,8 +372,12 @@ def block_item(item_code, notes=None):
             "status": "Blocked",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
+            "item_data": dump_snapshot(item_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
+            "document_snapshot": dump_snapshot(document_snapshot),
+            "document_count": len(document_snapshot),
+            "document_size": document_size,
             "notes": notes or _("Item blocked")
         })
     else:
@@ -241,12 +389,20 @@ def block_item(item_code, notes=None):
             "status": "Blocked",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
+            "item_data": dump_snapshot(item_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
+            "document_snapshot": dump_snapshot(document_snapshot),
+            "document_count": len(document_snapshot),
+            "document_size": document_size,
             "notes": notes or _("Item blocked")
         })
         version_doc.insert(ignore_permissions=True)
     
+    # Index the snapshot's documents for where-used lookups
+    update_version_document_refs({version_name: (item_code, new_version, document_snapshot)})
+    log_version_statuses("Item Version", [version_name])
+    
     # Update Item - version stays the same, only status changes
     frappe.db.set_value("Item", item_code, {
         "current_version": new_version,
@@ -272,7 +428,7 @@ def unblock_item(item_code):
     if not has_publish_permission():
         frappe.throw(_("You don't have permission to unblock items"))
     
-    ensure_item_custom_fields()
+    ensure_plm_schema()
     
     item = frappe.get_doc("Item", item_code)
     current_version = item.get("current_version") or 1
@@ -282,6 +438,7 @@ def unblock_item(item_code):
         version_name = f"{item_code}-v{current_version}"
         if frappe.db.exists("Item Version", version_name):
             frappe.db.set_value("Item Version", version_name, "status", "Published")
+            log_version_statuses("Item Version", [version_name])
     
     # Update Item
     frappe.db.set_value("Item", item_code, "plm_status", "Published", update_modified=False)
@@ -302,7 +459,7 @@ def set_as_draft(item_code):
     if not has_publish_permission():
         frappe.throw(_("You don't have permission to change item status"))
     
-    ensure_item_custom_fields()
+    ensure_plm_schema()
     
     # Update Item status to Draft
     frappe.db.set_value("Item", item_code, "plm_status", "Draft", update_modified=False)
@@ -330,8 +487,7 @@ def save_as_draft(item_code, notes=None, ecn=None):
         frappe.throw(_("ECN is required to save as draft"))
     
     # Ensure tables exist
-    ensure_item_version_table()
-    ensure_item_custom_fields()
+    ensure_plm_schema()
     
     item = frappe.get_doc("Item", item_code)
     
@@ -347,41 +503,63 @@ def save_as_draft(item_code, notes=None, ecn=None):
         new_version = current_version if current_version > 0 else 1
     
     # Create version snapshot
-    item_data = item.as_dict()
-    for key in ['modified', 'creation', 'modified_by', 'owner', '_user_tags', '_comments', '_assign', '_liked_by']:
-        item_data.pop(key, None)
+    item_data = get_item_snapshot(item)
     
     # Capture document snapshot
     document_snapshot = get_document_snapshot(item_code)
+    content_hash = get_item_content_hash(item_data, document_snapshot)
     
     # Check if version record already exists (for Draft -> Draft case)
     version_name = f"{item_code}-v{new_version}"
-    if frappe.db.exists("Item Version", version_name):
-        # Update existing version record
+    existing = frappe.db.get_value("Item Version", version_name, ["notes", "content_hash"], as_dict=True)
+    
+    if existing and existing.content_hash == content_hash:
+        # Nothing changed since the last save: only update metadata
         frappe.db.set_value("Item Version", version_name, {
             "status": "Draft",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
-            "notes": notes or frappe.db.get_value("Item Version", version_name, "notes"),
+            "notes": notes or existing.notes,
             "ecn": ecn
         })
     else:
-        # Create new version record
-        version_doc = frappe.get_doc({
-            "doctype": "Item Version",
-            "item_code": item_code,
-            "version": new_version,
+        document_size = get_documents_size(document_snapshot)
+        
+        # Store the diff against the previous version for comparisons
+        previous_version_diff = dump_version_diff("Item Version", item_code, new_version, item_data)
+        
+        values = {
             "status": "Draft",
             "published_date": now_datetime(),
             "published_by": frappe.session.user,
-            "item_data": json.dumps(item_data, default=str),
-            "document_snapshot": json.dumps(document_snapshot, default=str),
-            "notes": notes or _("Saved as draft"),
+            "item_data": dump_snapshot(item_data),
+            "previous_version_diff": previous_version_diff,
+            "content_hash": content_hash,
+            "document_snapshot": dump_snapshot(document_snapshot),
+            "document_count": len(document_snapshot),
+            "document_size": document_size,
             "ecn": ecn
-        })
-        version_doc.insert(ignore_permissions=True)
+        }
+        
+        if existing:
+            # Update existing version record
+            values["notes"] = notes or existing.notes
+            frappe.db.set_value("Item Version", version_name, values)
+        else:
+            # Create new version record
+            values["notes"] = notes or _("Saved as draft")
+            version_doc = frappe.get_doc({
+                "doctype": "Item Version",
+                "item_code": item_code,
+                "version": new_version,
+                **values
+            })
+            version_doc.insert(ignore_permissions=True)
+        
+        # Index the snapshot's documents for where-used lookups
+        update_version_document_refs({version_name: (item_code, new_version, document_snapshot)})
+    
+    log_version_statuses("Item Version", [version_name])
     
     # Update Item
     frappe.db.set_value("Item", item_code, {
@@ -402,32 +580,344 @@ def save_as_draft(item_code, notes=None, ecn=None):
 
 
 @frappe.whitelist()
-def get_version_history(item_code):
+def bulk_publish_items(item_codes, ecn, notes=None, as_draft=0, chunk_size=None):
+    """
+    Publish (or save as draft) many Items under one ECN.
+    
+    Versions follow publish_item / save_as_draft. Items, child tables and
+    drawing links are loaded in bulk, new Item Version rows are written with
+    multi-row inserts and Items are updated with one statement per chunk.
+    Each chunk is committed on its own. Lists longer than
+    BULK_PUBLISH_BACKGROUND_THRESHOLD run as a background job, which
+    publishes its results to the user as "plm_bulk_publish_done".
+    
+    Args:
+        item_codes: list (or JSON list) of Item codes
+        ecn: ECN for all versions
+        notes: Optional version notes
+        as_draft: Save as draft instead of publishing
+        chunk_size: Items per commit, defaults to BULK_PUBLISH_CHUNK_SIZE
+    
+    Returns:
+        dict with per-item results, or queued=True for background jobs
+    """
+    if not has_publish_permission():
+        frappe.throw(_("You don't have permission to publish items"))
+    
+    if not ecn:
+        frappe.throw(_("ECN is required to publish an item"))
+    
+    # Versions are written without link validation, so check the ECN before queueing
+    if not frappe.db.exists("ECN", ecn):
+        frappe.throw(_("ECN {0} not found").format(ecn), frappe.DoesNotExistError)
+    
+    ensure_plm_schema()
+    
+    if isinstance(item_codes, str):
+        item_codes = json.loads(item_codes)
+    item_codes = list(dict.fromkeys(item_codes))
+    
+    kwargs = {
+        "item_codes": item_codes,
+        "ecn": ecn,
+        "notes": notes,
+        "as_draft": cint(as_draft),
+        "chunk_size": cint(chunk_size) or BULK_PUBLISH_CHUNK_SIZE
+    }
+    
+    if len(item_codes) > BULK_PUBLISH_BACKGROUND_THRESHOLD:
+        frappe.enqueue(
+            "plm_customizations.api.item_version.run_bulk_publish_items",
+            queue="long",
+            timeout=3600,
+            **kwargs
+        )
+        return {
+            "success": True,
+            "queued": True,
+            "message": _("Publishing {0} items in the background").format(len(item_codes))
+        }
+    
+    results = publish_items_in_chunks(**kwargs)
+    return {"success": all(r["success"] for r in results), "queued": False, "results": results}
+
+
+def run_bulk_publish_items(**kwargs):
+    """Background job for bulk_publish_items; notifies the user with the results"""
+    results = publish_items_in_chunks(**kwargs)
+    frappe.publish_realtime(
+        "plm_bulk_publish_done",
+        {"ecn": kwargs.get("ecn"), "results": results},
+        user=frappe.session.user
+    )
+    return results
+
+
+def publish_items_in_chunks(item_codes, ecn, notes=None, as_draft=0, chunk_size=BULK_PUBLISH_CHUNK_SIZE):
+    """
+    Publish Items chunk by chunk, committing after each one.
+    A failing chunk is rolled back and its Items reported as failed.
+    
+    Returns:
+        list of dicts with item_code, success, version and message
     """
-    Get all version history for an Item.
+    results = []
+    
+    for i in range(0, len(item_codes), chunk_size):
+        chunk = item_codes[i:i + chunk_size]
+        try:
+            results.extend(publish_items_chunk(chunk, ecn, notes, as_draft))
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title=_("Bulk publish failed"))
+            results.extend(
+                {"item_code": code, "success": False, "version": None, "message": _("Publishing failed")}
+                for code in chunk
+            )
+    
+    return results
+
+
+def publish_items_chunk(item_codes, ecn, notes=None, as_draft=0):
+    """Write the versions of one chunk of Items, without committing"""
+    status = "Draft" if as_draft else "Published"
+    items = get_item_snapshots(item_codes)
+    document_snapshots = get_document_snapshots(list(items))
+    file_sizes = get_file_sizes(
+        doc.get("attachment") for documents in document_snapshots.values() for doc in documents
+    )
+    
+    results = []
+    versions = {}
+    for item_code in item_codes:
+        item_data = items.get(item_code)
+        if not item_data:
+            results.append({"item_code": item_code, "success": False, "version": None,
+                            "message": _("Item {0} not found").format(item_code)})
+            continue
+        
+        current_version = cint(item_data.get("current_version"))
+        if (item_data.get("plm_status") or "Draft") == "Published":
+            new_version = current_version + 1
+        else:
+            new_version = current_version or 1
+        
+        versions[item_code] = new_version
+        results.append({"item_code": item_code, "success": True, "version": new_version,
+                        "message": _("{0} v{1}").format(_(status), new_version)})
+    
+    if not versions:
+        return results
+    
+    now = now_datetime()
+    user = frappe.session.user
+    version_names = {item_code: f"{item_code}-v{version}" for item_code, version in versions.items()}
+    existing = {
+        v.name: v.notes for v in frappe.get_all(
+            "Item Version",
+            filters={"name": ["in", list(version_names.values())]},
+            fields=["name", "notes"]
+        )
+    }
+    
+    item_manifests = dump_snapshots([items[code] for code in versions])
+    document_manifests = dump_snapshots([document_snapshots[code] for code in versions])
+    version_diffs = dump_version_diffs("Item Version", {code: (versions[code], items[code]) for code in versions})
+    
+    new_rows = []
+    updates = {}
+    for item_code, item_manifest, document_manifest in zip(versions, item_manifests, document_manifests):
+        documents = document_snapshots[item_code]
+        values = {
+            "status": status,
+            "published_date": now,
+            "published_by": user,
+            "item_data": item_manifest,
+            "document_snapshot": document_manifest,
+            "document_count": len(documents),
+            "document_size": sum(file_sizes.get(url, 0) for url in {d.get("attachment") for d in documents}),
+            "ecn": ecn,
+            "previous_version_diff": version_diffs[item_code],
+            "content_hash": get_item_content_hash(items[item_code], documents)
+        }
+        version_name = version_names[item_code]
+        
+        if version_name in existing:
+            values["notes"] = notes or existing[version_name]
+            updates[version_name] = values
+        else:
+            values["notes"] = notes or (_("Saved as draft") if as_draft else None)
+            new_rows.append((
+                version_name, now, now, user, user, 0, item_code, versions[item_code],
+                values["status"], values["published_date"], values["published_by"],
+                values["item_data"], values["document_snapshot"], values["document_count"],
+                values["document_size"], values["notes"], values["ecn"], values["previous_version_diff"],
+                values["content_hash"]
+            ))
+    
+    if new_rows:
+        frappe.db.bulk_insert("Item Version", BULK_VERSION_FIELDS, new_rows)
+    if updates:
+        bulk_set_values("Item Version", updates)
+    update_version_document_refs({
+        version_names[code]: (code, version, document_snapshots[code]) for code, version in versions.items()
+    })
+    log_version_statuses("Item Version", list(version_names.values()))
+    
+    bulk_set_values("Item", {
+        item_code: {
+            "current_version": version,
+            "plm_status": status,
+            "published_date": now,
+            "published_by": user,
+            "current_ecn": ecn
+        }
+        for item_code, version in versions.items()
+    }, update_modified=False)
+    
+    return results
+
+
+def get_item_snapshot(item):
+    """Snapshot data of an Item document as stored in item_data"""
+    item_data = item.as_dict()
+    for key in ITEM_SNAPSHOT_EXCLUDED_FIELDS:
+        item_data.pop(key, None)
+    return item_data
+
+
+def get_item_snapshots(item_codes):
+    """
+    Load Items with their child tables in bulk. Each is turned into a
+    document and snapshotted by get_item_snapshot, as publish_item does,
+    so bulk and single versions of an unchanged Item are identical.
+    
+    Returns:
+        dict of item_code -> item data; missing Items are left out
+    """
+    if not item_codes:
+        return {}
+    
+    items = {}
+    for item in frappe.get_all("Item", filters={"name": ["in", item_codes]}, fields=["*"]):
+        item["doctype"] = "Item"
+        items[item.name] = item
+    if not items:
+        return items
+    
+    for table_field in frappe.get_meta("Item").get_table_fields():
+        for item in items.values():
+            item[table_field.fieldname] = []
+        
+        rows = frappe.get_all(
+            table_field.options,
+            filters={"parenttype": "Item", "parentfield": table_field.fieldname,
+                     "parent": ["in", list(items)]},
+            fields=["*"],
+            order_by="idx asc"
+        )
+        for row in rows:
+            row["doctype"] = table_field.options
+            items[row.parent][table_field.fieldname].append(row)
+    
+    return {item_code: get_item_snapshot(frappe.get_doc(item)) for item_code, item in items.items()}
+
+
+def bulk_set_values(doctype, values_by_name, update_modified=True):
+    """
+    Set different values on many records with one UPDATE ... CASE statement.
+    
+    Args:
+        doctype: DocType to update
+        values_by_name: dict of record name -> dict of fieldname -> value;
+            every record must set the same fields
+        update_modified: Also set modified and modified_by
+    """
+    if not values_by_name:
+        return
+    
+    names = list(values_by_name)
+    fieldnames = list(values_by_name[names[0]])
+    assignments = []
+    values = []
+    
+    for fieldname in fieldnames:
+        assignments.append("`{0}` = CASE `name` {1} END".format(
+            fieldname, " ".join(["WHEN %s THEN %s"] * len(names))
+        ))
+        for name in names:
+            values.extend([name, values_by_name[name][fieldname]])
+    
+    if update_modified:
+        assignments.append("`modified` = %s")
+        assignments.append("`modified_by` = %s")
+        values.extend([now_datetime(), frappe.session.user])
+    
+    values.append(tuple(names))
+    frappe.db.sql("""
+        UPDATE `tab{doctype}`
+        SET {assignments}
+        WHERE `name` IN %s
+    """.format(doctype=doctype, assignments=", ".join(assignments)), values)
+
+
+@frappe.whitelist()
+def get_version_history(item_code, limit=None, offset=0):
+    """
+    Get version history for an Item, newest first.
     Includes ECN information.
+    
+    Args:
+        item_code: Item to get versions for
+        limit: Optional maximum number of versions to return
+        offset: Number of versions to skip, for paging with limit
     """
     if not frappe.db.exists("DocType", "Item Version"):
         return []
     
-    versions = frappe.get_all(
-        "Item Version",
-        filters={"item_code": item_code},
-        fields=["name", "version", "status", "published_date", "published_by", "notes", "ecn"],
-        order_by="version desc"
-    )
+    # ECN title comes from the same query (name is the ECN number in format ECNXXXXXX)
+    return frappe.db.sql("""
+        SELECT v.name, v.version, v.status, v.published_date, v.published_by, v.notes, v.ecn,
+            ecn.name AS ecn_number, ecn.title AS ecn_title
+        FROM `tabItem Version` v
+        LEFT JOIN `tabECN` ecn ON ecn.name = v.ecn
+        WHERE v.item_code = %(item_code)s
+        ORDER BY v.version DESC
+        {limit}
+    """.format(
+        limit="LIMIT {0} OFFSET {1}".format(cint(limit), cint(offset)) if cint(limit) else ""
+    ), {"item_code": item_code}, as_dict=True)
+
+
+@frappe.whitelist()
+def get_item_as_of(item_code, timestamp, include_drafts=0):
+    """
+    Get the Item version in effect at a point in time, with its snapshot.
     
-    # Get ECN info for display (name is the ECN number in format ECNXXXXXX)
-    for v in versions:
-        if v.ecn and frappe.db.exists("ECN", v.ecn):
-            ecn_doc = frappe.get_doc("ECN", v.ecn)
-            v["ecn_number"] = v.ecn  # name is the ECN number
-            v["ecn_title"] = ecn_doc.title
-        else:
-            v["ecn_number"] = None
-            v["ecn_title"] = None
+    Args:
+        item_code: Item to resolve
+        timestamp: Date or datetime
+        include_drafts: Also consider Draft versions
     
-    return versions
+    Returns:
+        dict with version_name, version, status, published_date, ecn and data,
+        or None if the Item had no version by then
+    """
+    return get_items_as_of([item_code], timestamp, include_drafts).get(item_code)
+
+
+@frappe.whitelist()
+def get_items_as_of(item_codes, timestamp, include_drafts=0):
+    """
+    Resolve the versions of many Items in effect at one point in time, in one query.
+    
+    Returns:
+        dict of item_code -> version as get_item_as_of; Items without a version by then are left out
+    """
+    if isinstance(item_codes, str):
+        item_codes = json.loads(item_codes)
+    return get_versions_as_of("Item Version", item_codes, timestamp, cint(include_drafts))
 
 
 @frappe.whitelist()
@@ -438,9 +928,9 @@ def get_version_data(version_name):
     if not frappe.db.exists("Item Version", version_name):
         return None
     
-    version_doc = frappe.get_doc("Item Version", version_name)
-    if version_doc.item_data:
-        return json.loads(version_doc.item_data)
+    item_data = frappe.db.get_value("Item Version", version_name, "item_data")
+    if item_data:
+        return load_snapshot(item_data)
     return None
 
 
@@ -453,8 +943,7 @@ def can_view_item(item_code):
     if has_publish_permission():
         return True
     
-    item = frappe.get_doc("Item", item_code)
-    status = item.get("plm_status") or "Draft"
+    status = frappe.db.get_value("Item", item_code, "plm_status") or "Draft"
     
     # Viewers can only see Published items
     return status == "Published"
@@ -466,19 +955,77 @@ def can_download_documents(item_code):
     Check if documents can be downloaded.
     Returns False if item is Blocked.
     """
-    item = frappe.get_doc("Item", item_code)
-    status = item.get("plm_status") or "Draft"
+    status = frappe.db.get_value("Item", item_code, "plm_status")
+    return get_download_eligibility(status, has_publish_permission())
+
+
+def get_download_eligibility(status, is_publisher, doctype="Item"):
+    """
+    Check if documents of an Item or BOM in the given PLM status can be downloaded.
+    
+    Args:
+        status: plm_status of the record, Draft if empty
+        is_publisher: Whether the user may publish, and so see unpublished records
+        doctype: Item or BOM, named in the reason
+    """
+    status = status or "Draft"
     
     if status == "Blocked":
-        return {"can_download": False, "reason": "Item is blocked"}
+        return {"can_download": False, "reason": f"{doctype} is blocked"}
     
-    # For viewers, only published items
-    if not has_publish_permission() and status != "Published":
-        return {"can_download": False, "reason": "Item is not published"}
+    # For viewers, only published records
+    if not is_publisher and status != "Published":
+        return {"can_download": False, "reason": f"{doctype} is not published"}
     
     return {"can_download": True}
 
 
+@frappe.whitelist()
+def get_plm_state_bulk(item_codes):
+    """
+    Get PLM state of many Items for list views and link fields.
+    
+    Reads the Items and their document counts in two queries instead of
+    calling can_view_item, can_download_documents and get_document_count
+    per Item.
+    
+    Args:
+        item_codes: list (or JSON list) of Item codes
+    
+    Returns:
+        dict of item_code -> plm_status, current_version, current_ecn,
+        can_view, can_download, reason and document_count; unknown Items are left out
+    """
+    if isinstance(item_codes, str):
+        item_codes = json.loads(item_codes)
+    if not item_codes:
+        return {}
+    
+    is_publisher = has_publish_permission()
+    items = frappe.get_all(
+        "Item",
+        filters={"name": ["in", list(set(item_codes))]},
+        fields=["name", "plm_status", "current_version", "current_ecn"]
+    )
+    document_counts = get_document_counts([item.name for item in items])
+    
+    states = {}
+    for item in items:
+        plm_status = item.plm_status or "Draft"
+        eligibility = get_download_eligibility(plm_status, is_publisher)
+        states[item.name] = {
+            "plm_status": plm_status,
+            "current_version": cint(item.current_version),
+            "current_ecn": item.current_ecn,
+            "can_view": is_publisher or plm_status == "Published",
+            "can_download": eligibility["can_download"],
+            "reason": eligibility.get("reason"),
+            "document_count": document_counts[item.name]
+        }
+    
+    return states
+
+
 @frappe.whitelist()
 def has_publish_permission():
     """
@@ -507,7 +1054,7 @@ def restore_version(item_code, version_name):
         if not version_doc.item_data:
             return {"success": False, "error": _("No data found in this version")}
         
-        old_data = json.loads(version_doc.item_data)
+        old_data = load_snapshot(version_doc.item_data)
         
         # Get current item
         item = frappe.get_doc("Item", item_code)
@@ -557,7 +1104,7 @@ def restore_version(item_code, version_name):
             }
         else:
             return {"success": True, "message": _("Restored from v{0}").format(version_doc.version)}
-            
+    
     except Exception as e:
         frappe.log_error(f"Error restoring version: {str(e)}")
         return {"success": False, "error": str(e)}
@@ -572,9 +1119,9 @@ def get_downloadable_versions(item_code):
     if not frappe.db.exists("Item", item_code):
         return {"versions": []}
     
-    item = frappe.get_doc("Item", item_code)
-    current_version = item.get("current_version") or 0
-    current_status = item.get("plm_status") or "Draft"
+    item = frappe.db.get_value("Item", item_code, ["current_version", "plm_status"], as_dict=True)
+    current_version = item.current_version or 0
+    current_status = item.plm_status or "Draft"
     
     versions = []
     
@@ -592,39 +1139,26 @@ def get_downloadable_versions(item_code):
     
     # Get historical versions with document snapshots
     if frappe.db.exists("DocType", "Item Version"):
+        # Only versions with documents in their snapshot; counts are stored when it is written
         historical = frappe.get_all(
             "Item Version",
-            filters={"item_code": item_code},
-            fields=["name", "version", "status", "published_date", "document_snapshot"],
+            filters={"item_code": item_code, "document_count": [">", 0], "version": ["!=", current_version]},
+            fields=["name", "version", "status", "published_date", "document_count", "document_size"],
             order_by="version desc"
         )
         
         for v in historical:
-            if v.version == current_version:
-                continue  # Skip current version as it's already added
-            
-            doc_count = 0
-            has_snapshot = False
-            if v.document_snapshot:
-                try:
-                    docs = json.loads(v.document_snapshot)
-                    doc_count = len(docs) if isinstance(docs, list) else 0
-                    has_snapshot = doc_count > 0
-                except:
-                    pass
-            
-            # Only include versions with snapshots
-            if has_snapshot:
-                versions.append({
-                    "version": v.version,
-                    "version_name": v.name,
-                    "label": f"v{v.version} - {v.status}",
-                    "status": v.status,
-                    "is_current": False,
-                    "document_count": doc_count,
-                    "has_snapshot": has_snapshot,
-                    "published_date": str(v.published_date) if v.published_date else None
-                })
+            versions.append({
+                "version": v.version,
+                "version_name": v.name,
+                "label": f"v{v.version} - {v.status}",
+                "status": v.status,
+                "is_current": False,
+                "document_count": v.document_count,
+                "document_size": v.document_size,
+                "has_snapshot": True,
+                "published_date": str(v.published_date) if v.published_date else None
+            })
     
     return {"versions": versions}
 
@@ -652,7 +1186,7 @@ def get_version_documents(item_code, version=None):
         return {"documents": [], "error": "No document snapshot for this version"}
     
     try:
-        documents = json.loads(version_doc.document_snapshot)
+        documents = load_snapshot(version_doc.document_snapshot)
         return {"documents": documents, "version": version}
     except:
         return {"documents": [], "error": "Failed to parse document snapshot"}
@@ -694,62 +1228,54 @@ def compare_versions(item_code, version1, version2):
     version1_name = f"{item_code}-v{version1}"
     version2_name = f"{item_code}-v{version2}"
     
-    if not frappe.db.exists("Item Version", version1_name):
-        return {"success": False, "error": _("Version {0} not found").format(version1)}
+    existing = frappe.get_all(
+        "Item Version",
+        filters={"name": ["in", [version1_name, version2_name]]},
+        pluck="name"
+    )
     
-    if not frappe.db.exists("Item Version", version2_name):
-        return {"success": False, "error": _("Version {0} not found").format(version2)}
+    for version, version_name in ((version1, version1_name), (version2, version2_name)):
+        if version_name not in existing:
+            return {"success": False, "error": _("Version {0} not found").format(version)}
     
-    data1 = get_version_data(version1_name)
-    data2 = get_version_data(version2_name)
+    patch = get_version_patch("Item Version", item_code, version1, version2)
     
-    if not data1 or not data2:
+    if patch is None:
         return {"success": False, "error": _("Could not load version data")}
     
-    differences = {
-        "fields": [],
-        "documents_added": [],
-        "documents_removed": [],
-        "documents_changed": []
-    }
-    
-    # Compare basic fields
-    exclude_fields = ['modified', 'creation', 'modified_by', 'owner', '_user_tags', 
-                      '_comments', '_assign', '_liked_by', 'custom_document_list',
-                      'uoms', 'barcodes', 'reorder_levels', 'attributes', 
-                      'supplier_items', 'customer_items', 'taxes', 'item_defaults']
-    
-    for key in set(list(data1.keys()) + list(data2.keys())):
-        if key in exclude_fields:
-            continue
-        val1 = data1.get(key)
-        val2 = data2.get(key)
-        if val1 != val2:
-            differences["fields"].append({
-                "field": key,
-                "version1": val1,
-                "version2": val2
-            })
-    
-    # Compare document list
-    docs1 = {doc.get("link"): doc for doc in data1.get("custom_document_list", []) if doc.get("link")}
-    docs2 = {doc.get("link"): doc for doc in data2.get("custom_document_list", []) if doc.get("link")}
-    
-    for doc_link in set(list(docs1.keys()) + list(docs2.keys())):
-        if doc_link in docs1 and doc_link not in docs2:
-            differences["documents_removed"].append(docs1[doc_link])
-        elif doc_link not in docs1 and doc_link in docs2:
-            differences["documents_added"].append(docs2[doc_link])
-        elif docs1.get(doc_link) != docs2.get(doc_link):
-            differences["documents_changed"].append({
-                "link": doc_link,
-                "version1": docs1.get(doc_link),
-                "version2": docs2.get(doc_link)
-            })
+    differences = get_item_differences(patch)
+    add_changed_row_versions(
+        "Item Version", item_code, version1, version2,
+        "custom_document_list", "link", differences["documents_changed"]
+    )
     
     return {
         "success": True,
         "differences": differences,
+        "patch": patch,
         "version1": version1,
         "version2": version2
     }
+
+
+def get_item_differences(patch):
+    """
+    Shape a version patch for the comparison dialog: field changes, the
+    document list split into added/removed/changed and other child tables.
+    """
+    tables = dict(patch.get("tables", {}))
+    documents = tables.pop("custom_document_list", {})
+    
+    return {
+        "fields": [
+            {"field": fieldname, "version1": values[0], "version2": values[1]}
+            for fieldname, values in patch.get("fields", {}).items()
+        ],
+        "documents_added": [entry["row"] for entry in documents.get("added", [])],
+        "documents_removed": [entry["row"] for entry in documents.get("removed", [])],
+        "documents_changed": [
+            {"link": entry["key"][0], "fields": entry["fields"]}
+            for entry in documents.get("changed", [])
+        ],
+        "tables": tables
+    }
@@ -0,0 +1,260 @@
+"""
+Precomputed Gantt schedule state for Purchase, Work and Sales Orders.
+
+The Order Schedule State table stores, per order, the Gantt task that
+gantt_data would compute (dates, progress, delay and status fields) along
+with the date it was computed on and the order's modified timestamp.
+Rows are refreshed when an order changes (doc_events) and by an hourly
+scheduler job that picks up new, changed, removed and out-of-date orders.
+Once every row has been computed for today, the Gantt endpoints and
+reports read the table with indexed queries instead of recomputing; only
+orders modified after their row was written are computed live.
+"""
+import json
+
+import frappe
+from frappe.utils import getdate, now_datetime, today
+
+from plm_customizations.api import gantt_data
+
+
+SCHEDULE_STATE_DOCTYPE = "Order Schedule State"
+
+# Cache key holding the date the table was last fully brought up to date
+SCHEDULE_STATE_READY_KEY = "plm_order_schedule_ready"
+
+# Orders recomputed and committed per batch by the scheduler job
+REFRESH_CHUNK_SIZE = 500
+
+# SQL condition on `o` for orders whose task the gantt_data builders compute
+# against today's date. The builders only go by progress and dates, not by
+# status, so a Closed or Stopped order that is not complete still moves.
+TODAY_DEPENDENT_CONDITIONS = {
+    # Delay while not fully received; start falls back to today
+    "Purchase Order": "IFNULL(`o`.`per_received`, 0) < 100 OR `o`.`transaction_date` IS NULL",
+    # Start delay while not started, end delay while not fully produced
+    "Work Order": "`o`.`actual_start_date` IS NULL OR IFNULL(`o`.`qty`, 0) <= 0 "
+                  "OR IFNULL(`o`.`produced_qty`, 0) < `o`.`qty`",
+    # Shipping delay while not shipped, delivery delay while not fully delivered
+    "Sales Order": "IFNULL(`o`.`per_delivered`, 0) < 100 OR `o`.`transaction_date` IS NULL "
+                   "OR (`o`.`estimated_shipping_date` IS NOT NULL AND `o`.`actual_shipping_date` IS NULL)"
+}
+
+# Columns written for each order, see refresh_order_schedule_state
+SCHEDULE_STATE_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "order_doctype", "order_name", "project", "status", "start_date", "end_date",
+    "progress", "status_color", "is_delayed", "delay_days", "computed_on",
+    "source_modified", "task_data"
+]
+
+
+def refresh_order_schedule_states():
+    """
+    Scheduler job: bring the Order Schedule State table up to date.
+    
+    Only orders without a row, modified since their row was computed,
+    cancelled/deleted, or whose task depends on today's date and was
+    computed on a previous day are processed, in committed batches.
+    Afterwards the table is marked ready for today.
+    """
+    changed = False
+    
+    for doctype in gantt_data.ORDER_TYPE_DOCTYPES.values():
+        names = get_stale_order_names(doctype)
+        for i in range(0, len(names), REFRESH_CHUNK_SIZE):
+            refresh_order_schedule_state(doctype, names[i:i + REFRESH_CHUNK_SIZE])
+            frappe.db.commit()
+        changed = changed or bool(names)
+    
+    frappe.cache().set_value(
+        SCHEDULE_STATE_READY_KEY, today(),
+        expires_in_sec=gantt_data.get_seconds_until_midnight()
+    )
+    
+    if changed:
+        gantt_data.clear_gantt_cache()
+
+
+def get_stale_order_names(doctype):
+    """
+    Get names of orders whose schedule state is missing, outdated or orphaned.
+    
+    A row computed on a previous day is only outdated if the order's task
+    depends on today's date, see TODAY_DEPENDENT_CONDITIONS; other orders
+    keep their row until they are modified again.
+    """
+    values = {"doctype": doctype, "today": today()}
+    
+    stale = frappe.db.sql_list(
+        """
+        SELECT `o`.`name`
+        FROM `tab{doctype}` `o`
+        LEFT JOIN `tabOrder Schedule State` `s`
+            ON `s`.`order_doctype` = %(doctype)s AND `s`.`order_name` = `o`.`name`
+        WHERE `o`.`docstatus` < 2
+            AND (`s`.`name` IS NULL
+                OR `s`.`source_modified` < `o`.`modified`
+                OR (`s`.`computed_on` < %(today)s AND ({today_condition})))
+        """.format(doctype=doctype, today_condition=TODAY_DEPENDENT_CONDITIONS[doctype]),
+        values
+    )
+    
+    orphaned = frappe.db.sql_list(
+        """
+        SELECT `s`.`order_name`
+        FROM `tabOrder Schedule State` `s`
+        LEFT JOIN `tab{doctype}` `o` ON `o`.`name` = `s`.`order_name`
+        WHERE `s`.`order_doctype` = %(doctype)s
+            AND (`o`.`name` IS NULL OR `o`.`docstatus` = 2)
+        """.format(doctype=doctype),
+        values
+    )
+    
+    return stale + orphaned
+
+
+def refresh_order_schedule_state(doctype, names):
+    """
+    Recompute the schedule state rows of the given orders.
+    
+    Orders that no longer exist or are cancelled lose their row.
+    
+    Args:
+        doctype: Purchase Order, Work Order or Sales Order
+        names: list of order names
+    """
+    if not names:
+        return
+    
+    order_type = next(t for t, dt in gantt_data.ORDER_TYPE_DOCTYPES.items() if dt == doctype)
+    orders = gantt_data.get_orders(
+        doctype,
+        fields=gantt_data.ORDER_FIELDS[doctype] + ["modified"],
+        names=names
+    )
+    tasks = gantt_data.get_task_builder(order_type)(orders)
+    
+    now = now_datetime()
+    computed_on = today()
+    user = frappe.session.user
+    rows = []
+    for order, task in zip(orders, tasks):
+        rows.append((
+            f"{doctype}-{order.name}", now, now, user, user, 0,
+            doctype, order.name, order.project, order.status,
+            getdate(task["start"][:10]), getdate(task["end"][:10]),
+            task["progress"], task["status_color"], 1 if task["is_delayed"] else 0,
+            task["delay_days"], computed_on, order.modified,
+            json.dumps(task, separators=(",", ":"), default=str)
+        ))
+    
+    frappe.db.delete(SCHEDULE_STATE_DOCTYPE, {"order_doctype": doctype, "order_name": ["in", names]})
+    if rows:
+        frappe.db.bulk_insert(SCHEDULE_STATE_DOCTYPE, SCHEDULE_STATE_FIELDS, rows)
+
+
+def update_order_schedule_state(doc, method=None):
+    """
+    Hook: Refresh the schedule state of a Purchase, Work or Sales Order.
+    Called via hooks.py doc_events.
+    """
+    if doc.doctype not in gantt_data.ORDER_TYPE_DOCTYPES.values():
+        return
+    
+    if method == "on_trash":
+        frappe.db.delete(SCHEDULE_STATE_DOCTYPE, {"order_doctype": doc.doctype, "order_name": doc.name})
+        return
+    
+    refresh_order_schedule_state(doc.doctype, [doc.name])
+
+
+def is_schedule_state_ready():
+    """Check if the scheduler job has brought every row up to date today"""
+    return frappe.cache().get_value(SCHEDULE_STATE_READY_KEY) == today()
+
+
+def get_schedule_states(doctype, project=None, from_date=None, to_date=None, after=None, limit=None):
+    """
+    Read stored schedule state rows overlapping the date window.
+    
+    Rows come back in (start date, order name) order with the same shape
+    get_orders uses for keyset pages: name, gantt_sort_date and task_data,
+    plus order_doctype and stale, set when the order was modified after its
+    row was computed, see make_state_tasks.
+    
+    Args:
+        after: Optional (sort date, name) keyset position; only rows after it are returned
+        limit: Optional maximum number of rows
+    """
+    conditions = ["`s`.`order_doctype` = %(doctype)s", "`o`.`docstatus` < 2"]
+    values = {"doctype": doctype}
+    
+    if project:
+        conditions.append("`s`.`project` = %(project)s")
+        values["project"] = project
+    
+    if from_date:
+        conditions.append("`s`.`end_date` >= %(from_date)s")
+        values["from_date"] = getdate(from_date)
+    
+    if to_date:
+        conditions.append("`s`.`start_date` <= %(to_date)s")
+        values["to_date"] = getdate(to_date)
+    
+    if after:
+        conditions.append(
+            "(`s`.`start_date` > %(after_date)s OR (`s`.`start_date` = %(after_date)s "
+            "AND `s`.`order_name` > %(after_name)s))"
+        )
+        values["after_date"] = getdate(after[0])
+        values["after_name"] = after[1]
+    
+    return frappe.db.sql(
+        """
+        SELECT `s`.`order_name` AS `name`, `s`.`start_date` AS `gantt_sort_date`, `s`.`task_data`,
+            `s`.`order_doctype`, `o`.`modified` > `s`.`source_modified` AS `stale`
+        FROM `tabOrder Schedule State` `s`
+        INNER JOIN `tab{doctype}` `o` ON `o`.`name` = `s`.`order_name`
+        WHERE {conditions}
+        ORDER BY `s`.`start_date`, `s`.`order_name`
+        {limit}
+        """.format(
+            doctype=doctype,
+            conditions=" AND ".join(conditions),
+            limit="LIMIT {0}".format(int(limit)) if limit else ""
+        ),
+        values,
+        as_dict=True
+    )
+
+
+def make_state_tasks(states):
+    """
+    Yield the Gantt tasks stored in schedule state rows.
+    
+    Progress written without doc_events (db_set, status updaters for
+    produced_qty, per_received, per_delivered) still bumps the order's
+    modified, so rows computed before that are stale: their orders are
+    computed live instead, until the scheduler job rewrites the rows.
+    """
+    live_tasks = get_live_tasks(states)
+    for state in states:
+        yield live_tasks.get((state.order_doctype, state.name)) or json.loads(state.task_data)
+
+
+def get_live_tasks(states):
+    """Compute the tasks of stale schedule state rows from their orders, one query per DocType"""
+    stale_names = {}
+    for state in states:
+        if state.stale:
+            stale_names.setdefault(state.order_doctype, []).append(state.name)
+    
+    tasks = {}
+    for doctype, names in stale_names.items():
+        order_type = next(t for t, dt in gantt_data.ORDER_TYPE_DOCTYPES.items() if dt == doctype)
+        orders = gantt_data.get_orders(doctype, fields=gantt_data.ORDER_FIELDS[doctype], names=names)
+        for order, task in zip(orders, gantt_data.get_task_builder(order_type)(orders)):
+            tasks[(doctype, order.name)] = task
+    
+    return tasks
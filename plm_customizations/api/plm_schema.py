@@ -0,0 +1,110 @@
+"""
+Schema readiness for PLM version control.
+
+The publish, block and draft endpoints need the version DocTypes and the
+PLM custom fields on Item, BOM and Work Order. SCHEMA_REQUIREMENTS lists
+them together with the functions that create them. verify_plm_schema runs
+those functions and checks the result at after_install/after_migrate, then
+records a fingerprint of the requirements as a site default.
+
+Endpoints call ensure_plm_schema, which compares the recorded fingerprint
+once per process and site and is a set lookup afterwards. If the
+requirements changed and the site has not been migrated yet, the first
+call verifies the schema inline.
+"""
+import hashlib
+import json
+
+import frappe
+
+
+# Site default holding the fingerprint of the last verified requirements
+SCHEMA_FINGERPRINT_KEY = "plm_schema_fingerprint"
+
+# name -> setup functions, DocTypes and Custom Fields they must provide
+SCHEMA_REQUIREMENTS = {
+    "Item": {
+        "setup": [
+            "plm_customizations.api.item_version.ensure_item_custom_fields",
+            "plm_customizations.api.item_version.ensure_item_version_table"
+        ],
+        "doctypes": ["Item Version"],
+        "custom_fields": ["Item-current_version", "Item-plm_status", "Item-published_date", "Item-published_by"]
+    },
+    "BOM": {
+        "setup": [
+            "plm_customizations.api.bom_version.ensure_bom_custom_fields",
+            "plm_customizations.api.bom_version.ensure_bom_version_table"
+        ],
+        "doctypes": ["BOM Version"],
+        "custom_fields": ["BOM-current_version", "BOM-plm_status", "BOM-bom_published_date", "BOM-bom_published_by"]
+    },
+    "Work Order": {
+        "setup": [
+            "plm_customizations.api.work_order_version.ensure_work_order_custom_fields"
+        ],
+        "doctypes": [],
+        "custom_fields": [
+            "Work Order-bom_version", "Work Order-bom_snapshot_data", "Work Order-bom_plm_status_at_creation"
+        ]
+    }
+}
+
+SCHEMA_FINGERPRINT = hashlib.sha256(
+    json.dumps(SCHEMA_REQUIREMENTS, sort_keys=True).encode("utf-8")
+).hexdigest()
+
+# Sites whose schema this process has seen verified
+_ready_sites = set()
+
+
+def ensure_plm_schema():
+    """
+    Make sure the PLM schema is in place before writing versions.
+    Costs a set lookup once the site's fingerprint has been seen.
+    """
+    site = frappe.local.site
+    if site in _ready_sites:
+        return
+    
+    if frappe.db.get_default(SCHEMA_FINGERPRINT_KEY) != SCHEMA_FINGERPRINT and verify_plm_schema():
+        # Still incomplete; check again on the next call instead of caching
+        return
+    
+    _ready_sites.add(site)
+
+
+def verify_plm_schema():
+    """
+    Run the setup functions of every requirement and check their result.
+    The fingerprint is only recorded when nothing is missing.
+    
+    Returns:
+        list of missing DocTypes and Custom Fields
+    """
+    for name, requirement in SCHEMA_REQUIREMENTS.items():
+        try:
+            for method in requirement["setup"]:
+                frappe.get_attr(method)()
+        except Exception as e:
+            frappe.logger().error(f"Error setting up {name} PLM fields: {str(e)}")
+    
+    missing = get_missing_schema()
+    if missing:
+        frappe.logger().error(f"PLM schema incomplete, missing: {', '.join(missing)}")
+        return missing
+    
+    frappe.db.set_default(SCHEMA_FINGERPRINT_KEY, SCHEMA_FINGERPRINT)
+    frappe.db.commit()
+    return missing
+
+
+def get_missing_schema():
+    """Get required DocTypes and Custom Fields that do not exist, in two queries"""
+    doctypes = [dt for r in SCHEMA_REQUIREMENTS.values() for dt in r["doctypes"]]
+    custom_fields = [cf for r in SCHEMA_REQUIREMENTS.values() for cf in r["custom_fields"]]
+    
+    existing = set(frappe.get_all("DocType", filters={"name": ["in", doctypes]}, pluck="name"))
+    existing.update(frappe.get_all("Custom Field", filters={"name": ["in", custom_fields]}, pluck="name"))
+    
+    return [name for name in doctypes + custom_fields if name not in existing]
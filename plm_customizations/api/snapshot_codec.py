@@ -0,0 +1,141 @@
+"""
+Compressed encoding for snapshot Long Text columns.
+
+Encoded values start with a versioned header naming the codec, followed
+by the codec's payload as text:
+
+    plmsnap:1:zlib:<base64 of zlib-compressed JSON>
+
+Values without the header are plain JSON written before the codec
+existed and are decoded unchanged, so old and new rows can be mixed.
+Codecs are registered in CODECS; DEFAULT_CODEC is used for new writes.
+Values that would not get smaller, such as single table rows, are kept as
+plain JSON by encode_compact.
+"""
+import base64
+import json
+import zlib
+
+import frappe
+from frappe import _
+
+from plm_customizations.api.batch_migration import DEFAULT_BATCH_SIZE, run_in_batches
+
+
+HEADER_PREFIX = "plmsnap"
+FORMAT_VERSION = 1
+
+# name -> (encode bytes to text, decode text to bytes)
+CODECS = {
+    "zlib": (
+        lambda data: base64.b64encode(zlib.compress(data, 6)).decode("ascii"),
+        lambda text: zlib.decompress(base64.b64decode(text))
+    ),
+    "json": (
+        lambda data: data.decode("utf-8"),
+        lambda text: text.encode("utf-8")
+    )
+}
+
+DEFAULT_CODEC = "zlib"
+
+# Columns holding encoded snapshots, recompressed by recompress_snapshots
+ENCODED_COLUMNS = {
+    "Item Version": ["item_data", "document_snapshot"],
+    "BOM Version": ["bom_data"],
+    "Work Order": ["bom_snapshot_data"],
+    "Version Snapshot Blob": ["data"]
+}
+
+
+def encode(text, codec=None):
+    """
+    Encode a JSON string for storage.
+    
+    Args:
+        text: JSON string
+        codec: Codec name from CODECS, defaults to DEFAULT_CODEC
+    
+    Returns:
+        header plus encoded payload
+    """
+    codec = codec or DEFAULT_CODEC
+    payload = CODECS[codec][0](text.encode("utf-8"))
+    return "{0}:{1}:{2}:{3}".format(HEADER_PREFIX, FORMAT_VERSION, codec, payload)
+
+
+def encode_compact(text, codec=None):
+    """
+    Encode a JSON string only if that makes it shorter.
+    
+    Compression plus base64 and the header cost more than they save on
+    short values, so those are returned as plain JSON, which decode reads
+    unchanged.
+    """
+    encoded = encode(text, codec)
+    return encoded if len(encoded) < len(text) else text
+
+
+def decode(value):
+    """Decode a stored value back to its JSON string; plain JSON is returned unchanged"""
+    if not value or not is_encoded(value):
+        return value
+    
+    _prefix, version, codec, payload = value.split(":", 3)
+    if int(version) > FORMAT_VERSION or codec not in CODECS:
+        frappe.throw(_("Unsupported snapshot encoding: {0}").format(value[:32]))
+    
+    return CODECS[codec][1](payload).decode("utf-8")
+
+
+def is_encoded(value):
+    """Check if a stored value carries the codec header"""
+    return value.startswith(HEADER_PREFIX + ":")
+
+
+def dumps(data, codec=None):
+    """Serialize data to JSON and encode it for storage"""
+    return encode(json.dumps(data, default=str), codec)
+
+
+def loads(value):
+    """Decode a stored value and parse its JSON; None for empty values"""
+    text = decode(value)
+    return json.loads(text) if text else None
+
+
+def recompress_snapshots(batch_size=DEFAULT_BATCH_SIZE, codec=None):
+    """
+    Re-encode plain JSON snapshot columns with the codec. Runs as a patch.
+    
+    Returns:
+        dict of doctype -> number of records re-encoded
+    """
+    def recompress(doctype, columns):
+        def process_batch(records):
+            recompressed = 0
+            for record in records:
+                values = {}
+                for column in columns:
+                    if record[column] and not is_encoded(record[column]):
+                        encoded = encode_compact(record[column], codec)
+                        if encoded != record[column]:
+                            values[column] = encoded
+                if values:
+                    frappe.db.set_value(doctype, record.name, values, update_modified=False)
+                    recompressed += 1
+            return recompressed
+        return process_batch
+    
+    return {
+        doctype: run_in_batches(
+            doctype, columns, recompress(doctype, columns),
+            conditions=" OR ".join(
+                "(`{0}` IS NOT NULL AND `{0}` != '' AND `{0}` NOT LIKE %(encoded)s)".format(column)
+                for column in columns
+            ),
+            values={"encoded": HEADER_PREFIX + ":%"},
+            batch_size=batch_size
+        )
+        for doctype, columns in ENCODED_COLUMNS.items()
+    }
@@ -0,0 +1,267 @@
+"""
+Content-addressed storage for Item and BOM version snapshots.
+
+A snapshot is split into blocks: the header (all non-table fields) and
+one block per child table row. Each block is serialized canonically,
+named by its SHA-256 hash and stored once in Version Snapshot Blob.
+The version record only keeps a small manifest of hashes, so versions
+that differ in a field or two share almost all of their storage.
+
+Row timestamps and owners change on every save of the parent and idx
+follows the row's position, so these are left out of row blocks. The
+manifest records which tables had idx, and only those get it back from
+the manifest order when a snapshot is loaded.
+
+Manifests and blocks are written through snapshot_codec.encode_compact,
+so they are stored compressed unless they are too small to benefit. Columns written before the store existed hold plain
+JSON and are read unchanged; migrate_snapshots converts them.
+"""
+import hashlib
+import json
+
+import frappe
+from frappe.utils import now_datetime
+
+from plm_customizations.api import snapshot_codec
+from plm_customizations.api.batch_migration import DEFAULT_BATCH_SIZE, run_in_batches
+
+
+BLOB_DOCTYPE = "Version Snapshot Blob"
+
+# Marks a stored value as a manifest rather than a plain JSON snapshot
+MANIFEST_KEY = "_snapshot_manifest"
+MANIFEST_VERSION = 1
+
+# Row fields that change without the row changing
+VOLATILE_ROW_FIELDS = ("idx", "creation", "modified", "modified_by", "owner")
+
+# Version columns holding snapshots, migrated by migrate_snapshots
+SNAPSHOT_COLUMNS = {
+    "Item Version": ["item_data", "document_snapshot"],
+    "BOM Version": ["bom_data"]
+}
+
+
+def dump_snapshot(data):
+    """
+    Store a snapshot's blocks and return the manifest to save in its column.
+    
+    Args:
+        data: dict snapshot (header fields plus child table lists), or a list of rows
+    
+    Returns:
+        encoded manifest
+    """
+    return dump_snapshots([data])[0]
+
+
+def dump_snapshots(snapshots):
+    """
+    Store the blocks of several snapshots at once, as dump_snapshot.
+    
+    Returns:
+        list of encoded manifests in the order of snapshots
+    """
+    blocks = {}
+    
+    def add_block(value):
+        blob = canonical_json(value)
+        key = hashlib.sha256(blob.encode("utf-8")).hexdigest()
+        blocks[key] = blob
+        return key
+    
+    def add_rows(rows):
+        return [add_block(strip_volatile_fields(row)) for row in rows]
+    
+    def has_idx(rows):
+        return bool(rows) and all("idx" in row for row in rows)
+    
+    manifests = []
+    for data in snapshots:
+        if isinstance(data, list):
+            manifest = {MANIFEST_KEY: MANIFEST_VERSION, "rows": add_rows(data), "idx": has_idx(data)}
+        else:
+            header = {k: v for k, v in data.items() if not is_table(v)}
+            tables = {k: add_rows(v) for k, v in data.items() if is_table(v)}
+            manifest = {
+                MANIFEST_KEY: MANIFEST_VERSION,
+                "header": add_block(header),
+                "tables": tables,
+                "idx": [k for k, v in data.items() if is_table(v) and has_idx(v)]
+            }
+        manifests.append(snapshot_codec.encode_compact(json.dumps(manifest, separators=(",", ":"))))
+    
+    store_blobs(blocks)
+    return manifests
+
+
+def get_content_hash(*snapshots, exclude_fields=()):
+    """
+    Canonical SHA-256 of snapshot content, without storing anything.
+    
+    Row fields that change on every save are ignored, as in stored blocks,
+    and so are the header fields in exclude_fields.
+    """
+    def normalize(data):
+        if isinstance(data, dict):
+            return {
+                k: [strip_volatile_fields(row) for row in v] if is_table(v) else v
+                for k, v in data.items() if k not in exclude_fields
+            }
+        if is_table(data):
+            return [strip_volatile_fields(row) for row in data]
+        return data
+    
+    blob = canonical_json([normalize(data) for data in snapshots])
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def load_snapshot(value):
+    """
+    Load a snapshot column, reassembling manifests from their blocks.
+    Plain JSON written before the store existed is returned as-is.
+    """
+    return load_snapshots([value])[0]
+
+
+def load_snapshots(values):
+    """
+    Load several snapshot columns, fetching all their blocks in one query.
+    
+    Returns:
+        list of snapshots in the order of values; None for empty values
+    """
+    parsed = [snapshot_codec.loads(value) for value in values]
+    
+    hashes = set()
+    for manifest in parsed:
+        if is_manifest(manifest):
+            hashes.update(iter_manifest_hashes(manifest))
+    blobs = get_blobs(hashes)
+    
+    def load_rows(keys, with_idx):
+        rows = []
+        for idx, key in enumerate(keys, 1):
+            row = json.loads(blobs[key])
+            if with_idx:
+                row["idx"] = idx
+            rows.append(row)
+        return rows
+    
+    # Manifests written before "idx" was recorded: child tables had idx,
+    # plain row lists (document snapshots) did not
+    snapshots = []
+    for manifest in parsed:
+        if not is_manifest(manifest):
+            snapshots.append(manifest)
+        elif "rows" in manifest:
+            snapshots.append(load_rows(manifest["rows"], manifest.get("idx", False)))
+        else:
+            snapshot = json.loads(blobs[manifest["header"]])
+            indexed = manifest.get("idx", manifest["tables"])
+            for fieldname, keys in manifest["tables"].items():
+                snapshot[fieldname] = load_rows(keys, fieldname in indexed)
+            snapshots.append(snapshot)
+    
+    return snapshots
+
+
+def is_manifest(value):
+    """Check if a parsed snapshot column is a manifest"""
+    return isinstance(value, dict) and MANIFEST_KEY in value
+
+
+def iter_manifest_hashes(manifest):
+    """Yield every block hash referenced by a manifest"""
+    if "rows" in manifest:
+        yield from manifest["rows"]
+        return
+    yield manifest["header"]
+    for keys in manifest["tables"].values():
+        yield from keys
+
+
+def is_table(value):
+    """Child tables are lists of row dicts"""
+    return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+def strip_volatile_fields(row):
+    """Row without the fields that change on every save of its parent"""
+    return {k: v for k, v in row.items() if k not in VOLATILE_ROW_FIELDS}
+
+
+def canonical_json(value):
+    """Serialize with sorted keys and no whitespace so equal content hashes equally"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def get_blobs(hashes):
+    """Get blob data by hash"""
+    if not hashes:
+        return {}
+    blobs = frappe.get_all(
+        BLOB_DOCTYPE,
+        filters={"name": ["in", list(hashes)]},
+        fields=["name", "data"],
+        as_list=True
+    )
+    return {name: snapshot_codec.decode(data) for name, data in blobs}
+
+
+def store_blobs(blocks):
+    """Insert the blocks that are not stored yet"""
+    if not blocks:
+        return
+    
+    existing = set(frappe.get_all(BLOB_DOCTYPE, filters={"name": ["in", list(blocks)]}, pluck="name"))
+    now = now_datetime()
+    user = frappe.session.user
+    rows = [
+        (key, now, now, user, user, len(blob.encode("utf-8")), snapshot_codec.encode_compact(blob))
+        for key, blob in blocks.items() if key not in existing
+    ]
+    
+    if rows:
+        # Another request may store the same block concurrently; the content is identical
+        frappe.db.bulk_insert(
+            BLOB_DOCTYPE,
+            ["name", "creation", "modified", "owner", "modified_by", "size", "data"],
+            rows,
+            ignore_duplicates=True
+        )
+
+
+def migrate_snapshots(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Convert plain JSON snapshot columns to manifests. Runs as a patch.
+    
+    Returns:
+        dict of doctype -> number of records converted
+    """
+    def convert(doctype, columns):
+        def process_batch(records):
+            converted = 0
+            for record in records:
+                values = {}
+                for column in columns:
+                    snapshot = snapshot_codec.loads(record[column])
+                    if snapshot is None or is_manifest(snapshot):
+                        continue
+                    values[column] = dump_snapshot(snapshot)
+                if values:
+                    frappe.db.set_value(doctype, record.name, values, update_modified=False)
+                    converted += 1
+            return converted
+        return process_batch
+    
+    return {
+        doctype: run_in_batches(
+            doctype, columns, convert(doctype, columns),
+            conditions=" OR ".join(
+                "(`{0}` IS NOT NULL AND `{0}` != '')".format(column) for column in columns
+            ),
+            batch_size=batch_size
+        )
+        for doctype, columns in SNAPSHOT_COLUMNS.items()
+    }
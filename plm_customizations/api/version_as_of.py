@@ -0,0 +1,173 @@
+"""
+Point-in-time resolution of Item and BOM versions.
+
+Version rows are rewritten in place: blocking, re-publishing or saving a
+draft overwrites their status, published date and snapshot. So every time
+a version gets a status, log_version_statuses appends a Version Status Log
+row with the time and the snapshot manifest the version had then, and
+those rows are never changed.
+
+The version in effect at a moment is the latest log row for the Item or
+BOM at or before it that published or blocked a version. Drafts are not
+in effect unless asked for. Lookups use the (version_doctype, version_of,
+changed_on) index of the log.
+"""
+import datetime
+
+import frappe
+from frappe.utils import get_datetime, getdate, now_datetime
+
+from plm_customizations.api.batch_migration import DEFAULT_BATCH_SIZE, run_in_batches
+from plm_customizations.api.snapshot_store import load_snapshots
+from plm_customizations.api.version_diff import VERSION_DOCTYPES
+
+
+STATUS_LOG_DOCTYPE = "Version Status Log"
+
+# Columns written for each status change
+STATUS_LOG_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "version_doctype", "version_name", "version_of", "version", "status", "changed_on", "ecn", "data"
+]
+
+
+def log_version_statuses(doctype, version_names):
+    """
+    Log the current status and snapshot of Item or BOM Versions.
+    Call after writing the versions.
+    
+    Args:
+        doctype: Item Version or BOM Version
+        version_names: list of version names
+    """
+    if not version_names:
+        return
+    
+    parent_field, data_field = VERSION_DOCTYPES[doctype]
+    versions = frappe.get_all(
+        doctype,
+        filters={"name": ["in", list(version_names)]},
+        fields=["name", parent_field, "version", "status", "ecn", data_field]
+    )
+    insert_status_log_rows(doctype, versions, now_datetime())
+
+
+def insert_status_log_rows(doctype, versions, changed_on=None):
+    """
+    Insert one log row per version row.
+    
+    Args:
+        changed_on: Time of the change; defaults to each version's published_date
+    """
+    parent_field, data_field = VERSION_DOCTYPES[doctype]
+    now = now_datetime()
+    user = frappe.session.user
+    
+    rows = [
+        (
+            frappe.generate_hash(length=10), now, now, user, user, 0,
+            doctype, v.name, v[parent_field], v.version, v.status,
+            changed_on or v.published_date, v.ecn, v[data_field]
+        )
+        for v in versions
+    ]
+    if rows:
+        frappe.db.bulk_insert(STATUS_LOG_DOCTYPE, STATUS_LOG_FIELDS, rows)
+
+
+def get_versions_as_of(doctype, parents, timestamp, include_drafts=False):
+    """
+    Get the versions of several Items or BOMs in effect at a timestamp, in one query.
+    
+    Args:
+        doctype: Item Version or BOM Version
+        parents: list of Item codes or BOM names
+        timestamp: Date or datetime; a date means the end of that day
+        include_drafts: Also consider Draft versions
+    
+    Returns:
+        dict of parent -> version_name, version, status, published_date, ecn
+        and data (the snapshot) as they were at the timestamp; published_date
+        is when the version got that status. Parents without a version by
+        then are left out
+    """
+    parents = list(set(parents or []))
+    if not parents:
+        return {}
+    
+    versions = frappe.db.sql("""
+        SELECT `parent`, `name`, `version`, `status`, `published_date`, `ecn`, `data`
+        FROM (
+            SELECT `version_of` AS `parent`, `version_name` AS `name`, `version`, `status`,
+                `changed_on` AS `published_date`, `ecn`, `data`,
+                ROW_NUMBER() OVER (
+                    PARTITION BY `version_of` ORDER BY `changed_on` DESC, `version` DESC
+                ) AS `position`
+            FROM `tabVersion Status Log`
+            WHERE `version_doctype` = %(doctype)s
+                AND `version_of` IN %(parents)s
+                AND `changed_on` <= %(timestamp)s
+                {status_condition}
+        ) `ranked`
+        WHERE `position` = 1
+    """.format(
+        status_condition="" if include_drafts else "AND `status` != 'Draft'"
+    ), {
+        "doctype": doctype,
+        "parents": tuple(parents),
+        "timestamp": get_as_of_datetime(timestamp)
+    }, as_dict=True)
+    
+    snapshots = load_snapshots([v.data for v in versions])
+    
+    return {
+        v.parent: {
+            "version_name": v.name,
+            "version": v.version,
+            "status": v.status,
+            "published_date": v.published_date,
+            "ecn": v.ecn,
+            "data": snapshot
+        }
+        for v, snapshot in zip(versions, snapshots)
+    }
+
+
+def get_as_of_datetime(timestamp):
+    """Datetime to resolve versions at; a date covers the whole day"""
+    if isinstance(timestamp, str) and len(timestamp.strip()) == 10:
+        timestamp = getdate(timestamp)
+    if isinstance(timestamp, datetime.date) and not isinstance(timestamp, datetime.datetime):
+        return datetime.datetime.combine(timestamp, datetime.time.max)
+    return get_datetime(timestamp)
+
+
+def backfill_version_status_log(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Log the current status of versions written before the log existed,
+    dated by their published date. Runs as a patch.
+    
+    Returns:
+        dict of doctype -> number of versions logged
+    """
+    def log_batch(doctype):
+        def process_batch(versions):
+            insert_status_log_rows(doctype, versions)
+            return len(versions)
+        return process_batch
+    
+    logged = {}
+    for doctype, (parent_field, data_field) in VERSION_DOCTYPES.items():
+        logged[doctype] = run_in_batches(
+            doctype,
+            [parent_field, "version", "status", "published_date", "ecn", data_field],
+            log_batch(doctype),
+            conditions="""`published_date` IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM `tabVersion Status Log` `log`
+                WHERE `log`.`version_doctype` = %(doctype)s
+                    AND `log`.`version_name` = `tab{0}`.`name`
+            )""".format(doctype),
+            values={"doctype": doctype},
+            batch_size=batch_size
+        )
+    return logged
@@ -0,0 +1,430 @@
+"""
+Structural diff of Item and BOM version snapshots.
+
+diff_snapshots compares two snapshot dicts: header fields by value, child
+tables row by row, matching rows on a natural key from TABLE_KEYS (e.g.
+uoms by uom, BOM items by item_code). Rows of tables without a configured
+key are matched on their name. Fields that change on every save are
+ignored. Each snapshot is walked once, so the cost is linear in its size
+whatever the distance between the versions.
+
+The result is a compact patch holding only what changed:
+
+    {
+        "fields": {fieldname: [old, new]},
+        "tables": {
+            table: {
+                "added": [{"key": [...], "row": {...}}],
+                "removed": [{"key": [...], "row": {...}}],
+                "changed": [{"key": [...], "fields": {fieldname: [old, new]}}]
+            }
+        }
+    }
+
+Rows sharing a key (a BOM may list an item twice) are told apart by an
+occurrence number appended to the key.
+
+When a version is written, its patch against the previous version is
+stored in previous_version_diff (dump_version_diff). get_version_patch
+answers a range comparison by composing the stored patches, and diffs
+the two snapshots directly when the range exceeds MAX_COMPOSED_DIFFS or
+a stored patch is missing.
+"""
+import json
+
+import frappe
+from frappe.utils import cint
+
+from plm_customizations.api import snapshot_codec
+from plm_customizations.api.snapshot_store import VOLATILE_ROW_FIELDS, is_table, load_snapshots
+
+
+# Header fields that change without the record changing
+IGNORED_FIELDS = (
+    "modified", "creation", "modified_by", "owner", "_user_tags", "_comments", "_assign", "_liked_by"
+)
+
+# Row fields that change without the row changing; rows are matched by key
+IGNORED_ROW_FIELDS = VOLATILE_ROW_FIELDS + ("name", "parent", "parenttype", "parentfield")
+
+# Version doctype -> (parent link field, snapshot column)
+VERSION_DOCTYPES = {
+    "Item Version": ("item_code", "item_data"),
+    "BOM Version": ("bom", "bom_data")
+}
+
+# Ranges spanning more versions than this are diffed directly
+MAX_COMPOSED_DIFFS = 50
+
+# Child table fieldname -> fields identifying a row across versions
+TABLE_KEYS = {
+    # Item
+    "uoms": ("uom",),
+    "barcodes": ("barcode",),
+    "item_defaults": ("company",),
+    "supplier_items": ("supplier",),
+    "customer_items": ("customer_name",),
+    "reorder_levels": ("warehouse", "material_request_type"),
+    "attributes": ("attribute",),
+    "taxes": ("item_tax_template", "tax_category"),
+    "custom_document_list": ("link",),
+    # BOM
+    "items": ("item_code",),
+    "operations": ("operation", "workstation"),
+    "scrap_items": ("item_code",),
+    "exploded_items": ("item_code",)
+}
+
+
+def diff_snapshots(old, new, table_keys=None):
+    """
+    Diff two snapshots into a compact patch.
+    
+    Args:
+        old: Older snapshot dict
+        new: Newer snapshot dict
+        table_keys: Optional dict overriding TABLE_KEYS entries
+    
+    Returns:
+        patch dict, see module docstring; empty sections are left out
+    """
+    old = old or {}
+    new = new or {}
+    keys = dict(TABLE_KEYS, **(table_keys or {}))
+    
+    patch = {}
+    fields = {}
+    tables = {}
+    
+    for fieldname in list(old) + [f for f in new if f not in old]:
+        if fieldname in IGNORED_FIELDS:
+            continue
+        old_value = old.get(fieldname)
+        new_value = new.get(fieldname)
+        
+        if (isinstance(old_value, list) or isinstance(new_value, list)) \
+                and is_table(old_value or []) and is_table(new_value or []):
+            table_patch = diff_rows(old_value or [], new_value or [], keys.get(fieldname))
+            if table_patch:
+                tables[fieldname] = table_patch
+        elif old_value != new_value:
+            fields[fieldname] = [old_value, new_value]
+    
+    if fields:
+        patch["fields"] = fields
+    if tables:
+        patch["tables"] = tables
+    return patch
+
+
+def diff_rows(old_rows, new_rows, key_fields=None):
+    """
+    Diff two lists of child rows matched by key.
+    
+    Returns:
+        dict with added, removed and changed lists; empty ones are left out
+    """
+    old_by_key = index_rows(old_rows, key_fields)
+    new_by_key = index_rows(new_rows, key_fields)
+    
+    added = []
+    removed = []
+    changed = []
+    
+    for key, old_row in old_by_key.items():
+        new_row = new_by_key.get(key)
+        if new_row is None:
+            removed.append({"key": list(key), "row": old_row})
+            continue
+        
+        fields = diff_row(old_row, new_row)
+        if fields:
+            changed.append({"key": list(key), "fields": fields})
+    
+    for key, new_row in new_by_key.items():
+        if key not in old_by_key:
+            added.append({"key": list(key), "row": new_row})
+    
+    table_patch = {}
+    if added:
+        table_patch["added"] = added
+    if removed:
+        table_patch["removed"] = removed
+    if changed:
+        table_patch["changed"] = changed
+    return table_patch
+
+
+def diff_row(old_row, new_row):
+    """Get fieldname -> [old, new] for the fields that differ between two rows"""
+    fields = {}
+    for fieldname in list(old_row) + [f for f in new_row if f not in old_row]:
+        if fieldname in IGNORED_ROW_FIELDS:
+            continue
+        if old_row.get(fieldname) != new_row.get(fieldname):
+            fields[fieldname] = [old_row.get(fieldname), new_row.get(fieldname)]
+    return fields
+
+
+def index_rows(rows, key_fields=None):
+    """
+    Map each row's key to the row without its ignored fields.
+    
+    The key is the key fields' values plus an occurrence number, so rows
+    sharing key values are matched in order. Without key fields, rows are
+    matched on their name, or their position if unnamed.
+    """
+    indexed = {}
+    seen = {}
+    
+    for position, row in enumerate(rows):
+        if key_fields:
+            values = tuple(row.get(fieldname) for fieldname in key_fields)
+        else:
+            values = (row.get("name") or position,)
+        
+        occurrence = seen.get(values, 0)
+        seen[values] = occurrence + 1
+        indexed[values + (occurrence,)] = {
+            k: v for k, v in row.items() if k not in IGNORED_ROW_FIELDS
+        }
+    
+    return indexed
+
+
+def compose_patches(patches):
+    """
+    Combine patches of consecutive versions (v1 -> v2, v2 -> v3, ...) into
+    the patch from the first to the last version.
+    """
+    fields = {}
+    tables = {}
+    
+    for patch in patches:
+        merge_fields(fields, patch.get("fields", {}))
+        for table, table_patch in patch.get("tables", {}).items():
+            compose_rows(tables.setdefault(table, {}), table_patch)
+    
+    composed = {}
+    if fields:
+        composed["fields"] = fields
+    
+    composed_tables = {}
+    for table, states in tables.items():
+        table_patch = {}
+        for key, (change, value) in states.items():
+            entry = {"key": list(key), "fields" if change == "changed" else "row": value}
+            table_patch.setdefault(change, []).append(entry)
+        if table_patch:
+            composed_tables[table] = table_patch
+    if composed_tables:
+        composed["tables"] = composed_tables
+    
+    return composed
+
+
+def merge_fields(fields, later):
+    """Apply later fieldname -> [old, new] changes on top of fields, dropping reverted ones"""
+    for fieldname, (old_value, new_value) in later.items():
+        if fieldname in fields:
+            old_value = fields[fieldname][0]
+        if old_value == new_value:
+            fields.pop(fieldname, None)
+        else:
+            fields[fieldname] = [old_value, new_value]
+
+
+def compose_rows(states, table_patch):
+    """
+    Apply a table patch on top of composed row states.
+    
+    Args:
+        states: dict of key -> (change, row or fields) built so far, updated in place
+        table_patch: dict with added, removed and changed entries
+    """
+    for entry in table_patch.get("added", []):
+        key = tuple(entry["key"])
+        previous = states.pop(key, None)
+        if previous and previous[0] == "removed":
+            fields = diff_row(previous[1], entry["row"])
+            if fields:
+                states[key] = ("changed", fields)
+        else:
+            states[key] = ("added", entry["row"])
+    
+    for entry in table_patch.get("removed", []):
+        key = tuple(entry["key"])
+        previous = states.pop(key, None)
+        if not previous:
+            states[key] = ("removed", entry["row"])
+        elif previous[0] == "changed":
+            # Report the row as it was before the earlier changes
+            row = dict(entry["row"])
+            row.update({fieldname: values[0] for fieldname, values in previous[1].items()})
+            states[key] = ("removed", row)
+    
+    for entry in table_patch.get("changed", []):
+        key = tuple(entry["key"])
+        previous = states.get(key)
+        if not previous:
+            states[key] = ("changed", dict(entry["fields"]))
+        elif previous[0] == "added":
+            row = dict(previous[1])
+            row.update({fieldname: values[1] for fieldname, values in entry["fields"].items()})
+            states[key] = ("added", row)
+        else:
+            fields = previous[1]
+            merge_fields(fields, entry["fields"])
+            if not fields:
+                del states[key]
+
+
+def invert_patch(patch):
+    """Turn the patch from version a to b into the patch from b to a"""
+    inverted = {}
+    
+    if patch.get("fields"):
+        inverted["fields"] = {f: [values[1], values[0]] for f, values in patch["fields"].items()}
+    
+    if patch.get("tables"):
+        inverted["tables"] = {}
+        for table, table_patch in patch["tables"].items():
+            inverted_table = {}
+            if table_patch.get("removed"):
+                inverted_table["added"] = table_patch["removed"]
+            if table_patch.get("added"):
+                inverted_table["removed"] = table_patch["added"]
+            if table_patch.get("changed"):
+                inverted_table["changed"] = [
+                    {"key": entry["key"], "fields": {f: [v[1], v[0]] for f, v in entry["fields"].items()}}
+                    for entry in table_patch["changed"]
+                ]
+            inverted["tables"][table] = inverted_table
+    
+    return inverted
+
+
+def dump_version_diff(doctype, parent, version, data):
+    """
+    Diff a version's snapshot against the previous version, encoded for
+    the previous_version_diff column.
+    
+    Returns:
+        encoded patch, or None for the first version or a missing previous version
+    """
+    return dump_version_diffs(doctype, {parent: (version, data)})[parent]
+
+
+def dump_version_diffs(doctype, snapshots):
+    """
+    Diff several versions against their previous versions, loading the
+    previous snapshots in one query.
+    
+    Args:
+        doctype: Item Version or BOM Version
+        snapshots: dict of parent -> (version, snapshot data)
+    
+    Returns:
+        dict of parent -> encoded patch or None
+    """
+    _parent_field, data_field = VERSION_DOCTYPES[doctype]
+    previous_names = {
+        parent: f"{parent}-v{cint(version) - 1}"
+        for parent, (version, _data) in snapshots.items() if cint(version) > 1
+    }
+    
+    previous_data = {}
+    if previous_names:
+        previous_data = dict(frappe.get_all(
+            doctype,
+            filters={"name": ["in", list(previous_names.values())]},
+            fields=["name", data_field],
+            as_list=True
+        ))
+    
+    found = [parent for parent, name in previous_names.items() if previous_data.get(name)]
+    previous_snapshots = dict(zip(found, load_snapshots([previous_data[previous_names[p]] for p in found])))
+    
+    diffs = {}
+    for parent, (_version, data) in snapshots.items():
+        previous = previous_snapshots.get(parent)
+        if not previous:
+            diffs[parent] = None
+            continue
+        # Compare in stored form, where dates and decimals are strings
+        data = json.loads(json.dumps(data, default=str))
+        diffs[parent] = snapshot_codec.dumps(diff_snapshots(previous, data))
+    return diffs
+
+
+def get_version_patch(doctype, parent, version1, version2):
+    """
+    Get the patch from one version of an Item or BOM to another.
+    
+    Ranges of up to MAX_COMPOSED_DIFFS versions are answered from the stored
+    previous_version_diff patches; longer ranges, or ranges with a missing
+    patch, are diffed directly from the two snapshots.
+    
+    Returns:
+        patch dict, or None if a snapshot could not be loaded
+    """
+    version1 = cint(version1)
+    version2 = cint(version2)
+    if version1 == version2:
+        return {}
+    
+    parent_field = VERSION_DOCTYPES[doctype][0]
+    low, high = sorted((version1, version2))
+    
+    if high - low <= MAX_COMPOSED_DIFFS:
+        diffs = frappe.get_all(
+            doctype,
+            filters={parent_field: parent, "version": ["between", [low + 1, high]]},
+            fields=["version", "previous_version_diff"],
+            order_by="version asc"
+        )
+        if len(diffs) == high - low and all(d.previous_version_diff for d in diffs):
+            patch = compose_patches(snapshot_codec.loads(d.previous_version_diff) for d in diffs)
+            return patch if version1 < version2 else invert_patch(patch)
+    
+    data1, data2 = load_version_snapshots(doctype, parent, version1, version2)
+    if not data1 or not data2:
+        return None
+    
+    return diff_snapshots(data1, data2)
+
+
+def load_version_snapshots(doctype, parent, version1, version2):
+    """Load the snapshots of two versions of an Item or BOM with one query"""
+    data_field = VERSION_DOCTYPES[doctype][1]
+    names = [f"{parent}-v{cint(version1)}", f"{parent}-v{cint(version2)}"]
+    snapshot_data = dict(frappe.get_all(
+        doctype,
+        filters={"name": ["in", names]},
+        fields=["name", data_field],
+        as_list=True
+    ))
+    return load_snapshots([snapshot_data.get(name) for name in names])
+
+
+def add_changed_row_versions(doctype, parent, version1, version2, table, key_field, entries):
+    """
+    Add the full rows of both versions to changed-row entries as version1
+    and version2, as the comparison endpoints returned them before entries
+    carried their field changes. Snapshots are only loaded if a row changed.
+    
+    Args:
+        table: Child table fieldname in the snapshots
+        key_field: Row field the entries are keyed by, e.g. link or item_code
+        entries: list of dicts with key_field, updated in place
+    """
+    if not entries:
+        return
+    
+    rows1, rows2 = (
+        {row.get(key_field): row for row in (data or {}).get(table) or []}
+        for data in load_version_snapshots(doctype, parent, version1, version2)
+    )
+    for entry in entries:
+        entry["version1"] = rows1.get(entry[key_field])
+        entry["version2"] = rows2.get(entry[key_field])
@@ -0,0 +1,97 @@
+"""
+Reverse index of the Documents referenced by Item Version snapshots.
+
+Version Document Ref holds one row per Item Version and Document in its
+document snapshot. The rows of a version are replaced whenever the
+version's snapshot is written (update_version_document_refs), so
+get_document_where_used can find every version that shipped a Document
+with one indexed select instead of parsing all snapshots. Versions
+written before the index existed are added by backfill_version_document_refs.
+"""
+import frappe
+from frappe.utils import cint, now_datetime
+
+from plm_customizations.api.batch_migration import DEFAULT_BATCH_SIZE, run_in_batches
+from plm_customizations.api.snapshot_store import load_snapshots
+
+
+REF_DOCTYPE = "Version Document Ref"
+
+# Columns written for each referenced Document
+REF_FIELDS = [
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "document", "document_version", "document_type", "item_version", "item_code", "version"
+]
+
+
+def update_version_document_refs(versions):
+    """
+    Replace the Document references of Item Versions.
+    
+    Args:
+        versions: dict of version name -> (item_code, version, document snapshot list)
+    """
+    if not versions:
+        return
+    
+    now = now_datetime()
+    user = frappe.session.user
+    rows = []
+    for version_name, (item_code, version, documents) in versions.items():
+        for doc in documents or []:
+            if doc.get("link"):
+                rows.append((
+                    frappe.generate_hash(length=10), now, now, user, user, 0,
+                    doc["link"], doc.get("version"), doc.get("type"), version_name, item_code, cint(version)
+                ))
+    
+    frappe.db.delete(REF_DOCTYPE, {"item_version": ["in", list(versions)]})
+    if rows:
+        frappe.db.bulk_insert(REF_DOCTYPE, REF_FIELDS, rows)
+
+
+@frappe.whitelist()
+def get_document_where_used(document, include_drafts=0):
+    """
+    Get every Item Version whose snapshot references a Document.
+    
+    Args:
+        document: Document name
+        include_drafts: Also list Draft versions
+    
+    Returns:
+        list of dicts with item_version, item_code, version, document_version,
+        status, published_date and ecn, by Item and version
+    """
+    return frappe.db.sql("""
+        SELECT ref.item_version, ref.item_code, ref.version, ref.document_version,
+            v.status, v.published_date, v.ecn
+        FROM `tabVersion Document Ref` ref
+        INNER JOIN `tabItem Version` v ON v.name = ref.item_version
+        WHERE ref.document = %(document)s {status_condition}
+        ORDER BY ref.item_code, ref.version
+    """.format(
+        status_condition="" if cint(include_drafts) else "AND v.status != 'Draft'"
+    ), {"document": document}, as_dict=True)
+
+
+def backfill_version_document_refs(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Index the document snapshots of all Item Versions. Runs as a patch, and
+    is safe to run again since each version's rows are replaced.
+    
+    Returns:
+        number of versions indexed
+    """
+    def index_batch(versions):
+        snapshots = load_snapshots([v.document_snapshot for v in versions])
+        update_version_document_refs({
+            v.name: (v.item_code, v.version, documents if isinstance(documents, list) else [])
+            for v, documents in zip(versions, snapshots)
+        })
+        return len(versions)
+    
+    return run_in_batches(
+        "Item Version", ["item_code", "version", "document_snapshot"], index_batch,
+        batch_size=batch_size
+    )
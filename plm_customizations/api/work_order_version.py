@@ -1,8 +1,10 @@
 import frappe
-import json
 from frappe import _
 from frappe.utils import now_datetime
 
+from plm_customizations.api import snapshot_codec
+from plm_customizations.api.snapshot_store import load_snapshot
+
 
 def ensure_work_order_custom_fields():
     """
@@ -67,9 +69,9 @@ def get_bom_version_snapshot(bom_name, version=None):
     if version:
         version_name = f"{bom_name}-v{version}"
         if frappe.db.exists("BOM Version", version_name):
-            version_doc = frappe.get_doc("BOM Version", version_name)
-            if version_doc.bom_data:
-                return json.loads(version_doc.bom_data)
+            bom_data = frappe.db.get_value("BOM Version", version_name, "bom_data")
+            if bom_data:
+                return load_snapshot(bom_data)
     
     # Get current BOM data as fallback
     bom = frappe.get_doc("BOM", bom_name)
@@ -135,7 +137,7 @@ def on_work_order_validate(doc, method):
         
         # Store version and snapshot
         doc.bom_version = bom_version
-        doc.bom_snapshot_data = json.dumps(bom_snapshot, default=str)
+        doc.bom_snapshot_data = snapshot_codec.dumps(bom_snapshot)
         doc.bom_plm_status_at_creation = "Published"
 
 
@@ -210,7 +212,7 @@ def get_work_order_bom_snapshot(work_order_name):
     snapshot_data = frappe.db.get_value("Work Order", work_order_name, "bom_snapshot_data")
     
     if snapshot_data:
-        return json.loads(snapshot_data)
+        return snapshot_codec.loads(snapshot_data)
     
     return None
 
@@ -242,7 +244,7 @@ def override_work_order_get_items(doc):
     """
     if doc.bom_snapshot_data:
         try:
-            snapshot = json.loads(doc.bom_snapshot_data)
+            snapshot = snapshot_codec.loads(doc.bom_snapshot_data)
             if "items" in snapshot:
                 return snapshot["items"]
         except:
@@ -25,9 +25,61 @@ doc_events = {
         "before_insert": "plm_customizations.api.item_naming.before_insert_item",
         "validate": "plm_customizations.api.item_naming.validate_item"
     },
+    "Purchase Order": {
+        "on_update": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_update_after_submit": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_cancel": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_trash": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ]
+    },
     "Work Order": {
         "validate": "plm_customizations.api.work_order_version.on_work_order_validate",
-        "before_submit": "plm_customizations.api.work_order_version.on_work_order_before_submit"
+        "before_submit": "plm_customizations.api.work_order_version.on_work_order_before_submit",
+        "on_update": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_update_after_submit": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_cancel": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_trash": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ]
+    },
+    "Sales Order": {
+        "on_update": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_update_after_submit": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_cancel": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ],
+        "on_trash": [
+            "plm_customizations.api.order_schedule.update_order_schedule_state",
+            "plm_customizations.api.gantt_data.clear_gantt_cache"
+        ]
     },
     "Job Card": {
         "validate": "plm_customizations.api.work_order_version.on_job_card_validate"
@@ -37,6 +89,15 @@ doc_events = {
     }
 }
 
+# Scheduled Tasks
+# ---------------
+
+scheduler_events = {
+    "hourly": [
+        "plm_customizations.api.order_schedule.refresh_order_schedule_states"
+    ]
+}
+
 # Fixtures
 # --------
 fixtures = [
@@ -60,6 +121,9 @@ fixtures = [
 # Includes in <head>
 # ------------------
 
+# include js, css files in header of desk.html
+app_include_js = ["/assets/plm_customizations/js/version_compare.js"]
+
 # include js, css files in header of web form
 # webform_include_js = {"doctype": "public/js/doctype.js"}
 # webform_include_css = {"doctype": "public/css/doctype.css"}
@@ -0,0 +1,6 @@
+from plm_customizations.api.item_version import backfill_document_counts
+
+
+def execute():
+    """Store document counts and sizes on older Item Versions"""
+    backfill_document_counts()
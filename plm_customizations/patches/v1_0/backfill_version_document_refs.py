@@ -0,0 +1,6 @@
+from plm_customizations.api.version_document_ref import backfill_version_document_refs
+
+
+def execute():
+    """Index the Documents of existing Item Versions for where-used lookups"""
+    backfill_version_document_refs()
@@ -0,0 +1,6 @@
+from plm_customizations.api.version_as_of import backfill_version_status_log
+
+
+def execute():
+    """Log the current status of existing Item and BOM Versions for point-in-time lookups"""
+    backfill_version_status_log()
@@ -0,0 +1,6 @@
+from plm_customizations.api.snapshot_store import migrate_snapshots
+
+
+def execute():
+    """Convert plain JSON version snapshots to content-addressed manifests"""
+    migrate_snapshots()
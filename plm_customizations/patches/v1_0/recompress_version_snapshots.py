@@ -0,0 +1,6 @@
+from plm_customizations.api.snapshot_codec import recompress_snapshots
+
+
+def execute():
+    """Compress snapshot columns written before the codec existed"""
+    recompress_snapshots()
@@ -0,0 +1,304 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+import datetime
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import item_version, version_as_of
+from plm_customizations.plm_customizations.testing import delete_items, insert_ecn, insert_item
+
+
+class TestItemVersion(FrappeTestCase):
+    def test_document_snapshots_loaded_in_one_query(self):
+        """Snapshots for many items should come from a single joined query."""
+        rows = [
+            frappe._dict({"parent": "ITEM-A", "link": "DOC-1", "version": "A", "type": "Drawing",
+                          "attachment": "/files/a.pdf", "filename": None}),
+            frappe._dict({"parent": "ITEM-B", "link": "DOC-2", "version": "B", "type": "Model",
+                          "attachment": "/files/b.step", "filename": "b.step"})
+        ]
+        
+        with patch.object(item_version.frappe.db, "sql", return_value=rows) as sql:
+            snapshots = item_version.get_document_snapshots(["ITEM-A", "ITEM-B", "ITEM-C"])
+        
+        sql.assert_called_once()
+        self.assertEqual(snapshots["ITEM-A"], [{
+            "link": "DOC-1", "version": "A", "type": "Drawing",
+            "attachment": "/files/a.pdf", "filename": "/files/a.pdf"
+        }])
+        self.assertEqual(snapshots["ITEM-B"][0]["filename"], "b.step")
+        self.assertEqual(snapshots["ITEM-C"], [])
+    
+    def test_version_history_reads_ecn_in_same_query(self):
+        """ECN titles should be joined into the history query, not loaded per version."""
+        rows = [frappe._dict({"name": f"ITEM-A-v{i}", "version": i, "ecn": "ECN000001",
+                              "ecn_number": "ECN000001", "ecn_title": "Change"}) for i in range(200, 0, -1)]
+        
+        with patch.object(item_version.frappe.db, "exists", return_value=True) as exists, \
+                patch.object(item_version.frappe.db, "sql", return_value=rows) as sql, \
+                patch.object(item_version.frappe, "get_doc") as get_doc:
+            versions = item_version.get_version_history("ITEM-A", limit=50, offset=100)
+        
+        self.assertEqual(exists.call_count + sql.call_count, 2)
+        get_doc.assert_not_called()
+        self.assertIn("LIMIT 50 OFFSET 100", sql.call_args[0][0])
+        self.assertEqual(versions[0]["ecn_title"], "Change")
+    
+    def test_downloadable_versions_use_stored_counts(self):
+        """Historical versions should be listed from stored counts, without reading snapshots."""
+        historical = [frappe._dict({"name": "ITEM-A-v1", "version": 1, "status": "Published",
+                                    "published_date": None, "document_count": 3, "document_size": 2048})]
+        
+        with patch.object(item_version.frappe.db, "exists", return_value=True), \
+                patch.object(item_version.frappe.db, "get_value",
+                             return_value=frappe._dict({"current_version": 2, "plm_status": "Draft"})), \
+                patch.object(item_version, "get_document_snapshot", return_value=[]), \
+                patch.object(item_version.frappe, "get_all", return_value=historical) as get_all:
+            result = item_version.get_downloadable_versions("ITEM-A")
+        
+        self.assertNotIn("document_snapshot", get_all.call_args[1]["fields"])
+        self.assertEqual([v["version"] for v in result["versions"]], [2, 1])
+        self.assertEqual(result["versions"][1]["document_count"], 3)
+    
+    def test_bulk_set_values_uses_one_case_update(self):
+        """Many records should be updated by a single UPDATE ... CASE statement."""
+        with patch.object(item_version.frappe.db, "sql") as sql:
+            item_version.bulk_set_values("Item", {
+                "ITEM-A": {"current_version": 2, "plm_status": "Published"},
+                "ITEM-B": {"current_version": 1, "plm_status": "Published"}
+            }, update_modified=False)
+        
+        sql.assert_called_once()
+        query, values = sql.call_args[0]
+        self.assertIn("`current_version` = CASE `name` WHEN %s THEN %s WHEN %s THEN %s END", query)
+        self.assertEqual(values[:4], ["ITEM-A", 2, "ITEM-B", 1])
+        self.assertEqual(values[-1], ("ITEM-A", "ITEM-B"))
+    
+    def test_bulk_publish_writes_versions_in_bulk(self):
+        """A chunk should insert new versions in one statement and report each item."""
+        items = {
+            "ITEM-A": frappe._dict({"name": "ITEM-A", "current_version": 1, "plm_status": "Published"}),
+            "ITEM-B": frappe._dict({"name": "ITEM-B", "current_version": 0, "plm_status": "Draft"})
+        }
+        
+        with patch.object(item_version, "has_publish_permission", return_value=True), \
+                patch.object(item_version.frappe.db, "exists", return_value=True), \
+                patch.object(item_version, "ensure_plm_schema"), \
+                patch.object(item_version, "get_item_snapshots", return_value=items), \
+                patch.object(item_version, "get_document_snapshots",
+                             return_value={"ITEM-A": [], "ITEM-B": []}), \
+                patch.object(item_version, "get_file_sizes", return_value={}), \
+                patch.object(item_version, "dump_snapshots", side_effect=lambda s: ["m"] * len(s)), \
+                patch.object(item_version.frappe, "get_all", return_value=[]), \
+                patch.object(item_version.frappe.db, "bulk_insert") as bulk_insert, \
+                patch.object(item_version, "bulk_set_values") as bulk_set_values, \
+                patch.object(item_version, "update_version_document_refs") as update_refs:
+            result = item_version.bulk_publish_items(["ITEM-A", "ITEM-B", "ITEM-X"], "ECN000001")
+        
+        bulk_insert.assert_called_once()
+        self.assertEqual([row[0] for row in bulk_insert.call_args[0][2]], ["ITEM-A-v2", "ITEM-B-v1"])
+        bulk_set_values.assert_called_once()
+        update_refs.assert_called_once()
+        self.assertEqual(
+            [(r["item_code"], r["success"], r["version"]) for r in result["results"]],
+            [("ITEM-A", True, 2), ("ITEM-B", True, 1), ("ITEM-X", False, None)]
+        )
+    
+    def test_bulk_publish_large_list_runs_in_background(self):
+        """Lists above the threshold should be queued instead of published inline."""
+        item_codes = [f"ITEM-{i}" for i in range(item_version.BULK_PUBLISH_BACKGROUND_THRESHOLD + 1)]
+        
+        with patch.object(item_version, "has_publish_permission", return_value=True), \
+                patch.object(item_version.frappe.db, "exists", return_value=True), \
+                patch.object(item_version, "ensure_plm_schema"), \
+                patch.object(item_version.frappe, "enqueue") as enqueue, \
+                patch.object(item_version, "publish_items_in_chunks") as publish:
+            result = item_version.bulk_publish_items(item_codes, "ECN000001", chunk_size=50)
+        
+        self.assertTrue(result["queued"])
+        publish.assert_not_called()
+        self.assertEqual(enqueue.call_args[1]["chunk_size"], 50)
+    
+    def test_plm_state_bulk_reads_items_in_two_queries(self):
+        """State for many items should come from one Item query and one count query."""
+        items = [
+            frappe._dict({"name": "ITEM-A", "plm_status": "Published", "current_version": 3, "current_ecn": "ECN000001"}),
+            frappe._dict({"name": "ITEM-B", "plm_status": "Blocked", "current_version": 1, "current_ecn": None}),
+            frappe._dict({"name": "ITEM-C", "plm_status": None, "current_version": 0, "current_ecn": None})
+        ]
+        
+        with patch.object(item_version, "has_publish_permission", return_value=False), \
+                patch.object(item_version.frappe, "get_all", return_value=items) as get_all, \
+                patch.object(item_version.frappe.db, "sql", return_value=[("ITEM-A", 4)]) as sql, \
+                patch.object(item_version.frappe, "get_doc") as get_doc:
+            states = item_version.get_plm_state_bulk('["ITEM-A", "ITEM-B", "ITEM-C", "ITEM-X"]')
+        
+        get_all.assert_called_once()
+        sql.assert_called_once()
+        get_doc.assert_not_called()
+        self.assertEqual(states["ITEM-A"]["document_count"], 4)
+        self.assertTrue(states["ITEM-A"]["can_download"])
+        self.assertEqual(states["ITEM-B"]["reason"], "Item is blocked")
+        self.assertEqual(states["ITEM-C"]["plm_status"], "Draft")
+        self.assertFalse(states["ITEM-C"]["can_view"])
+        self.assertNotIn("ITEM-X", states)
+    
+    def test_download_eligibility_names_the_doctype(self):
+        """BOM reasons should talk about the BOM, not its Item."""
+        self.assertEqual(item_version.get_download_eligibility("Blocked", True, "BOM")["reason"],
+                         "BOM is blocked")
+        self.assertEqual(item_version.get_download_eligibility("Draft", False, "BOM")["reason"],
+                         "BOM is not published")
+        self.assertTrue(item_version.get_download_eligibility("Draft", True, "BOM")["can_download"])
+    
+    def test_items_as_of_resolve_in_one_query(self):
+        """Many items should be resolved for one date with a single ranked query."""
+        rows = [
+            frappe._dict({"parent": "ITEM-A", "name": "ITEM-A-v2", "version": 2, "status": "Published",
+                          "published_date": "2024-03-01 10:00:00", "ecn": "ECN000002", "data": "a2"}),
+            frappe._dict({"parent": "ITEM-B", "name": "ITEM-B-v1", "version": 1, "status": "Blocked",
+                          "published_date": "2024-01-15 09:00:00", "ecn": None, "data": "b1"})
+        ]
+        
+        with patch.object(version_as_of.frappe.db, "sql", return_value=rows) as sql, \
+                patch.object(version_as_of, "load_snapshots",
+                             return_value=[{"item_name": "A"}, {"item_name": "B"}]) as load_snapshots:
+            versions = item_version.get_items_as_of('["ITEM-A", "ITEM-B", "ITEM-C"]', "2024-03-31")
+        
+        sql.assert_called_once()
+        load_snapshots.assert_called_once_with(["a2", "b1"])
+        self.assertIn("`status` != 'Draft'", sql.call_args[0][0])
+        self.assertIn("`tabVersion Status Log`", sql.call_args[0][0])
+        self.assertEqual(sql.call_args[0][1]["timestamp"], datetime.datetime(2024, 3, 31, 23, 59, 59, 999999))
+        self.assertEqual(versions["ITEM-A"]["version"], 2)
+        self.assertEqual(versions["ITEM-B"]["data"], {"item_name": "B"})
+        self.assertNotIn("ITEM-C", versions)
+    
+    def test_unchanged_draft_save_skips_snapshot_writes(self):
+        """Saving a draft without changes should only update the version's metadata."""
+        item = frappe._dict({"name": "ITEM-A", "item_name": "Bracket", "current_version": 2, "plm_status": "Draft"})
+        item.as_dict = lambda: dict(item)
+        content_hash = item_version.get_item_content_hash(dict(item), [])
+        existing = frappe._dict({"notes": "Review 1", "content_hash": content_hash})
+        
+        with patch.object(item_version, "has_publish_permission", return_value=True), \
+                patch.object(item_version, "ensure_plm_schema"), \
+                patch.object(item_version.frappe, "get_doc", return_value=item), \
+                patch.object(item_version, "get_document_snapshot", return_value=[]), \
+                patch.object(item_version.frappe.db, "get_value", return_value=existing), \
+                patch.object(item_version.frappe.db, "set_value") as set_value, \
+                patch.object(item_version, "dump_snapshot") as dump_snapshot, \
+                patch.object(item_version, "dump_version_diff") as dump_version_diff, \
+                patch.object(item_version, "log_version_statuses") as log_version_statuses:
+            result = item_version.save_as_draft("ITEM-A", ecn="ECN000001")
+        
+        self.assertEqual(result["version"], 2)
+        dump_snapshot.assert_not_called()
+        dump_version_diff.assert_not_called()
+        version_values = set_value.call_args_list[0][0][2]
+        self.assertNotIn("item_data", version_values)
+        self.assertEqual(version_values["notes"], "Review 1")
+        log_version_statuses.assert_called_once_with("Item Version", ["ITEM-A-v2"])
+    
+    def test_content_hash_covers_plm_state(self):
+        """A snapshot whose PLM status or version moved on must not count as unchanged."""
+        published = {"item_name": "Bracket", "plm_status": "Published", "current_version": 1,
+                     "published_date": "2024-01-01"}
+        draft = dict(published, plm_status="Draft", current_version=2)
+        resaved = dict(draft, published_date="2024-02-01")
+        
+        self.assertNotEqual(item_version.get_item_content_hash(published, []),
+                            item_version.get_item_content_hash(draft, []))
+        self.assertEqual(item_version.get_item_content_hash(draft, []),
+                         item_version.get_item_content_hash(resaved, []))
+
+
+class TestItemVersionQueries(FrappeTestCase):
+    """Version endpoints against Items, ECNs and versions stored in the database"""
+    
+    def setUp(self):
+        item_version.ensure_plm_schema()
+        self.item_codes = []
+        self.ecns = []
+    
+    def tearDown(self):
+        frappe.db.rollback()
+        delete_items(self.item_codes, self.ecns)
+    
+    def make_item(self, **values):
+        item_code = insert_item(**values)
+        self.item_codes.append(item_code)
+        return item_code
+    
+    def make_ecn(self, title):
+        ecn = insert_ecn(title)
+        self.ecns.append(ecn)
+        return ecn
+    
+    def test_version_history_returns_ecn_titles(self):
+        """Each version in the history should carry the number and title of its ECN."""
+        item_code = self.make_item()
+        first_ecn = self.make_ecn("Initial release")
+        second_ecn = self.make_ecn("Thicker bracket")
+        item_version.publish_item(item_code, ecn=first_ecn)
+        item_version.publish_item(item_code, ecn=second_ecn)
+        
+        history = item_version.get_version_history(item_code)
+        self.assertEqual(
+            [(v.version, v.status, v.ecn_number, v.ecn_title) for v in history],
+            [(2, "Published", second_ecn, "Thicker bracket"), (1, "Published", first_ecn, "Initial release")]
+        )
+        
+        page = item_version.get_version_history(item_code, limit=1, offset=1)
+        self.assertEqual([(v.version, v.ecn_title) for v in page], [(1, "Initial release")])
+    
+    def test_bulk_publish_writes_versions_and_items(self):
+        """Bulk publishing should write each Item's next version and move the Item onto it."""
+        published, new, draft = self.make_item(), self.make_item(), self.make_item()
+        first_ecn = self.make_ecn("Initial release")
+        bulk_ecn = self.make_ecn("Supplier change")
+        item_version.publish_item(published, ecn=first_ecn)
+        
+        result = item_version.bulk_publish_items([published, new, "_Test PLM Missing Item"], bulk_ecn, notes="Batch")
+        self.assertEqual(
+            [(r["item_code"], r["success"], r["version"]) for r in result["results"]],
+            [(published, True, 2), (new, True, 1), ("_Test PLM Missing Item", False, None)]
+        )
+        
+        for item_code, version in ((published, 2), (new, 1)):
+            version_name = f"{item_code}-v{version}"
+            self.assertEqual(
+                frappe.db.get_value("Item Version", version_name, ["status", "ecn", "notes"]),
+                ("Published", bulk_ecn, "Batch")
+            )
+            self.assertEqual(
+                frappe.db.get_value("Item", item_code, ["current_version", "plm_status", "current_ecn"]),
+                (version, "Published", bulk_ecn)
+            )
+            self.assertEqual(item_version.get_version_data(version_name)["item_code"], item_code)
+        
+        item_version.bulk_publish_items([draft], bulk_ecn, as_draft=1)
+        self.assertEqual(frappe.db.get_value("Item Version", f"{draft}-v1", "status"), "Draft")
+        self.assertEqual(frappe.db.get_value("Item", draft, "plm_status"), "Draft")
+    
+    def test_bulk_and_single_snapshots_match(self):
+        """An Item should snapshot the same whether it is published alone or in bulk."""
+        item_code = self.make_item(uoms=[{"uom": "Nos", "conversion_factor": 1}])
+        
+        single = item_version.get_item_snapshot(frappe.get_doc("Item", item_code))
+        bulk = item_version.get_item_snapshots([item_code])[item_code]
+        
+        self.assertEqual(bulk, single)
+        self.assertEqual([row["uom"] for row in bulk["uoms"]], ["Nos"])
+    
+    def test_bulk_publish_rejects_unknown_ecn(self):
+        """An ECN that does not exist should be refused before anything is written or queued."""
+        item_code = self.make_item()
+        
+        with self.assertRaises(frappe.DoesNotExistError):
+            item_version.bulk_publish_items([item_code], "_Test Missing ECN")
+        
+        self.assertFalse(frappe.db.exists("Item Version", {"item_code": item_code}))
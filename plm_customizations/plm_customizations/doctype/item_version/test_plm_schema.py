@@ -0,0 +1,60 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import plm_schema
+
+
+class TestPLMSchema(FrappeTestCase):
+    def setUp(self):
+        plm_schema._ready_sites.clear()
+    
+    def test_ensure_checks_fingerprint_once_per_process(self):
+        """After the first call, endpoints should not query the schema again."""
+        with patch.object(plm_schema.frappe.db, "get_default",
+                          return_value=plm_schema.SCHEMA_FINGERPRINT) as get_default, \
+                patch.object(plm_schema, "verify_plm_schema") as verify:
+            for _ in range(5):
+                plm_schema.ensure_plm_schema()
+        
+        get_default.assert_called_once()
+        verify.assert_not_called()
+    
+    def test_ensure_verifies_when_fingerprint_changed(self):
+        """A site not migrated since the requirements changed is verified inline."""
+        with patch.object(plm_schema.frappe.db, "get_default", return_value="outdated"), \
+                patch.object(plm_schema, "verify_plm_schema", return_value=[]) as verify:
+            plm_schema.ensure_plm_schema()
+            plm_schema.ensure_plm_schema()
+        
+        verify.assert_called_once()
+    
+    def test_ensure_retries_while_schema_incomplete(self):
+        """A site whose verification reports missing items must not be cached as ready."""
+        with patch.object(plm_schema.frappe.db, "get_default", return_value="outdated"), \
+                patch.object(plm_schema, "verify_plm_schema", return_value=["BOM Version"]) as verify:
+            plm_schema.ensure_plm_schema()
+            plm_schema.ensure_plm_schema()
+        
+        self.assertEqual(verify.call_count, 2)
+        self.assertFalse(plm_schema._ready_sites)
+    
+    def test_verify_records_fingerprint_only_when_complete(self):
+        """The fingerprint must not be recorded while something is missing."""
+        with patch.object(plm_schema.frappe, "get_attr"), \
+                patch.object(plm_schema, "get_missing_schema", return_value=["BOM Version"]), \
+                patch.object(plm_schema.frappe.db, "set_default") as set_default:
+            missing = plm_schema.verify_plm_schema()
+        
+        self.assertEqual(missing, ["BOM Version"])
+        set_default.assert_not_called()
+        
+        with patch.object(plm_schema.frappe, "get_attr"), \
+                patch.object(plm_schema, "get_missing_schema", return_value=[]), \
+                patch.object(plm_schema.frappe.db, "set_default") as set_default:
+            plm_schema.verify_plm_schema()
+        
+        set_default.assert_called_once_with(plm_schema.SCHEMA_FINGERPRINT_KEY, plm_schema.SCHEMA_FINGERPRINT)
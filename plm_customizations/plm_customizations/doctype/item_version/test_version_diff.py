@@ -0,0 +1,107 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import snapshot_codec, version_diff
+from plm_customizations.api.version_diff import compose_patches, diff_snapshots, invert_patch
+
+
+class TestVersionDiff(FrappeTestCase):
+    def test_header_and_keyed_table_changes(self):
+        """Rows are matched by natural key, so reordering and renaming rows is not a change."""
+        old = {
+            "item_name": "Bracket",
+            "modified": "2024-01-01",
+            "uoms": [
+                {"name": "a1", "idx": 1, "uom": "Nos", "conversion_factor": 1},
+                {"name": "a2", "idx": 2, "uom": "Box", "conversion_factor": 10}
+            ],
+            "barcodes": [{"name": "b1", "idx": 1, "barcode": "123"}]
+        }
+        new = {
+            "item_name": "Bracket L",
+            "modified": "2024-02-01",
+            "uoms": [
+                {"name": "c1", "idx": 1, "uom": "Box", "conversion_factor": 12},
+                {"name": "c2", "idx": 2, "uom": "Nos", "conversion_factor": 1}
+            ],
+            "barcodes": [{"name": "d1", "idx": 1, "barcode": "456"}]
+        }
+        
+        patch = diff_snapshots(old, new)
+        
+        self.assertEqual(patch["fields"], {"item_name": ["Bracket", "Bracket L"]})
+        self.assertEqual(patch["tables"]["uoms"], {
+            "changed": [{"key": ["Box", 0], "fields": {"conversion_factor": [10, 12]}}]
+        })
+        self.assertEqual(patch["tables"]["barcodes"]["added"], [{"key": ["456", 0], "row": {"barcode": "456"}}])
+        self.assertEqual(patch["tables"]["barcodes"]["removed"], [{"key": ["123", 0], "row": {"barcode": "123"}}])
+    
+    def test_duplicate_keys_and_identical_snapshots(self):
+        """Rows sharing a key are matched in order; equal snapshots give an empty patch."""
+        old = {"items": [{"item_code": "P-1", "qty": 1}, {"item_code": "P-1", "qty": 2}]}
+        new = {"items": [{"item_code": "P-1", "qty": 1}, {"item_code": "P-1", "qty": 3}]}
+        
+        patch = diff_snapshots(old, new)
+        
+        self.assertEqual(patch["tables"]["items"]["changed"], [{"key": ["P-1", 1], "fields": {"qty": [2, 3]}}])
+        self.assertEqual(diff_snapshots(new, dict(new)), {})
+    
+    def test_composed_patches_match_direct_diff(self):
+        """Composing adjacent patches should give the same result as diffing the ends."""
+        versions = [
+            {"item_name": "A", "uoms": [{"uom": "Nos", "conversion_factor": 1}]},
+            {"item_name": "B", "uoms": [{"uom": "Nos", "conversion_factor": 1}, {"uom": "Box", "conversion_factor": 10}]},
+            {"item_name": "A", "uoms": [{"uom": "Box", "conversion_factor": 12}]},
+            {"item_name": "A", "uoms": [{"uom": "Box", "conversion_factor": 12}, {"uom": "Nos", "conversion_factor": 2}]}
+        ]
+        adjacent = [diff_snapshots(a, b) for a, b in zip(versions, versions[1:])]
+        
+        self.assertEqual(compose_patches(adjacent), diff_snapshots(versions[0], versions[-1]))
+        self.assertEqual(invert_patch(compose_patches(adjacent)), diff_snapshots(versions[-1], versions[0]))
+    
+    def test_version_patch_composes_stored_diffs(self):
+        """Short ranges should be answered from stored patches without loading snapshots."""
+        stored = [
+            frappe._dict({"version": 2, "previous_version_diff": snapshot_codec.dumps({"fields": {"qty": [1, 2]}})}),
+            frappe._dict({"version": 3, "previous_version_diff": snapshot_codec.dumps({"fields": {"qty": [2, 3]}})})
+        ]
+        
+        with patch.object(version_diff.frappe, "get_all", return_value=stored) as get_all, \
+                patch.object(version_diff, "load_snapshots") as load_snapshots:
+            result = version_diff.get_version_patch("BOM Version", "BOM-001", 3, 1)
+        
+        get_all.assert_called_once()
+        load_snapshots.assert_not_called()
+        self.assertEqual(result, {"fields": {"qty": [3, 1]}})
+    
+    def test_version_patch_diffs_directly_beyond_cap(self):
+        """Ranges longer than the cap should skip stored patches and diff the snapshots."""
+        snapshots = [{"qty": 1}, {"qty": 9}]
+        
+        with patch.object(version_diff.frappe, "get_all", return_value=[["BOM-001-v1", "a"], ["BOM-001-v200", "b"]]) as get_all, \
+                patch.object(version_diff, "load_snapshots", return_value=snapshots):
+            result = version_diff.get_version_patch("BOM Version", "BOM-001", 1, 200)
+        
+        get_all.assert_called_once()
+        self.assertEqual(result, {"fields": {"qty": [1, 9]}})
+    
+    def test_changed_rows_keep_both_versions(self):
+        """Changed-row entries should still carry the full row of each version."""
+        snapshots = [
+            {"items": [{"item_code": "A", "qty": 1}, {"item_code": "B", "qty": 2}]},
+            {"items": [{"item_code": "A", "qty": 3}]}
+        ]
+        entries = [{"item_code": "A", "fields": {"qty": [1, 3]}}]
+        
+        with patch.object(version_diff, "load_version_snapshots", return_value=snapshots):
+            version_diff.add_changed_row_versions("BOM Version", "BOM-001", 1, 2, "items", "item_code", entries)
+        
+        self.assertEqual(entries, [{
+            "item_code": "A", "fields": {"qty": [1, 3]},
+            "version1": {"item_code": "A", "qty": 1}, "version2": {"item_code": "A", "qty": 3}
+        }])
@@ -0,0 +1,16 @@
+# Copyright (c) 2024, PLM Customizations and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class OrderScheduleState(Document):
+    pass
+
+
+def on_doctype_update():
+    """Indexes for the date window reads of the Order Gantt page"""
+    frappe.db.add_unique("Order Schedule State", ["order_doctype", "order_name"])
+    frappe.db.add_index("Order Schedule State", ["order_doctype", "start_date", "order_name"])
+    frappe.db.add_index("Order Schedule State", ["project", "order_doctype", "start_date"])
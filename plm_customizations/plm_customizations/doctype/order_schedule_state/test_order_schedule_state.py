@@ -0,0 +1,112 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import gantt_data, order_schedule
+from plm_customizations.plm_customizations.testing import make_orders
+
+
+class TestOrderSchedule(FrappeTestCase):
+    def test_refresh_stores_computed_tasks(self):
+        """Refreshing should replace the rows of the orders with their computed tasks."""
+        orders = make_orders("Work Order", 3)
+        for order in orders:
+            order.modified = "2024-01-01 10:00:00"
+        
+        with patch.object(gantt_data, "get_orders", return_value=orders), \
+                patch.object(gantt_data.frappe, "get_all", return_value=[]), \
+                patch.object(order_schedule.frappe.db, "delete") as delete, \
+                patch.object(order_schedule.frappe.db, "bulk_insert") as bulk_insert:
+            order_schedule.refresh_order_schedule_state("Work Order", [o.name for o in orders] + ["WO-GONE"])
+        
+        delete.assert_called_once()
+        self.assertIn("WO-GONE", delete.call_args[0][1]["order_name"][1])
+        
+        doctype, fields, rows = bulk_insert.call_args[0]
+        self.assertEqual(doctype, "Order Schedule State")
+        self.assertEqual(len(rows), 3)
+        
+        row = dict(zip(fields, rows[0]))
+        task = json.loads(row["task_data"])
+        self.assertEqual(row["name"], "Work Order-WO-TEST-00000")
+        self.assertEqual(task["id"], "WO-TEST-00000")
+        self.assertEqual(row["status_color"], task["status_color"])
+        self.assertEqual(str(row["end_date"]), "2024-01-10")
+    
+    def test_tasks_read_from_state_when_ready(self):
+        """Once the table is up to date, Gantt tasks should not be recomputed."""
+        state = frappe._dict({
+            "name": "SO-TEST-00000", "gantt_sort_date": "2024-01-01",
+            "task_data": json.dumps({
+                "id": "SO-TEST-00000", "type": "sales", "start": "2024-01-01", "end": "2024-01-05"
+            })
+        })
+        
+        with patch.object(order_schedule, "is_schedule_state_ready", return_value=True), \
+                patch.object(order_schedule, "get_schedule_states", return_value=[state]), \
+                patch.object(gantt_data, "get_orders") as get_orders:
+            result = gantt_data.get_gantt_data_page(order_types="sales")
+            get_orders.assert_not_called()
+        
+        self.assertEqual([t["id"] for t in result["tasks"]], ["SO-TEST-00000"])
+        self.assertEqual(result["tasks"][0]["start"], "2024-01-01")
+    
+    def test_stale_state_rows_computed_live(self):
+        """Orders modified after their row was written should be served from the order, not the row."""
+        states = [
+            frappe._dict({
+                "name": f"WO-TEST-0000{i}", "order_doctype": "Work Order", "gantt_sort_date": "2024-01-01",
+                "stale": i == 0, "task_data": json.dumps({"id": f"WO-TEST-0000{i}", "progress": 0})
+            })
+            for i in range(2)
+        ]
+        order = make_orders("Work Order", 1)[0]
+        order.produced_qty = 10
+        
+        with patch.object(gantt_data, "get_orders", return_value=[order]) as get_orders, \
+                patch.object(gantt_data.frappe, "get_all", return_value=[]):
+            tasks = list(order_schedule.make_state_tasks(states))
+        
+        self.assertEqual(get_orders.call_args[1]["names"], ["WO-TEST-00000"])
+        self.assertEqual([(t["id"], t["progress"]) for t in tasks], [("WO-TEST-00000", 100), ("WO-TEST-00001", 0)])
+        self.assertEqual(tasks[0]["status_color"], "completed")
+    
+    def test_page_tasks_carry_critical_path(self):
+        """Paged tasks should get critical path fields computed over the whole window."""
+        states = [
+            frappe._dict({
+                "name": "WO-TEST-00000", "gantt_sort_date": "2024-01-01",
+                "task_data": json.dumps({
+                    "id": "WO-TEST-00000", "type": "work", "start": "2024-01-01", "end": "2024-01-10",
+                    "dependencies": []
+                })
+            }),
+            frappe._dict({
+                "name": "WO-TEST-00001", "gantt_sort_date": "2024-01-10",
+                "task_data": json.dumps({
+                    "id": "WO-TEST-00001", "type": "work", "start": "2024-01-10", "end": "2024-01-20",
+                    "dependencies": []
+                })
+            })
+        ]
+        
+        def fake_get_schedule_states(doctype, *args, after=None, limit=None, **kwargs):
+            return states[:limit] if limit else states
+        
+        gantt_data.clear_gantt_cache()
+        with patch.object(order_schedule, "is_schedule_state_ready", return_value=True), \
+                patch.object(order_schedule, "get_schedule_states", side_effect=fake_get_schedule_states), \
+                patch.object(gantt_data.frappe, "get_all", return_value=[frappe._dict({
+                    "parenttype": "Work Order", "parent": "WO-TEST-00001", "order_name": "WO-TEST-00000"
+                })]):
+            result = gantt_data.get_gantt_data_page(order_types="work", page_size=1)
+        
+        self.assertTrue(result["has_more"])
+        self.assertEqual(len(result["tasks"]), 1)
+        self.assertTrue(result["tasks"][0]["critical"])
+        self.assertEqual(result["tasks"][0]["total_float"], 0)
@@ -0,0 +1,43 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import version_document_ref
+
+
+class TestVersionDocumentRef(FrappeTestCase):
+    def test_refs_replaced_per_version(self):
+        """A version's rows are deleted and rewritten from its document snapshot."""
+        documents = [
+            {"link": "DOC-1", "version": "A", "type": "Drawing"},
+            {"link": "DOC-2", "version": "C", "type": "Model"},
+            {"link": None, "version": None, "type": None}
+        ]
+        
+        with patch.object(version_document_ref.frappe.db, "delete") as delete, \
+                patch.object(version_document_ref.frappe.db, "bulk_insert") as bulk_insert:
+            version_document_ref.update_version_document_refs({
+                "ITEM-A-v2": ("ITEM-A", 2, documents),
+                "ITEM-B-v1": ("ITEM-B", 1, [])
+            })
+        
+        delete.assert_called_once_with(
+            version_document_ref.REF_DOCTYPE, {"item_version": ["in", ["ITEM-A-v2", "ITEM-B-v1"]]}
+        )
+        rows = bulk_insert.call_args[0][2]
+        self.assertEqual([row[6:] for row in rows], [
+            ("DOC-1", "A", "Drawing", "ITEM-A-v2", "ITEM-A", 2),
+            ("DOC-2", "C", "Model", "ITEM-A-v2", "ITEM-A", 2)
+        ])
+    
+    def test_where_used_is_one_select(self):
+        """Where-used reads the index with one query, excluding drafts by default."""
+        with patch.object(version_document_ref.frappe.db, "sql", return_value=[]) as sql:
+            version_document_ref.get_document_where_used("DOC-1")
+        
+        sql.assert_called_once()
+        self.assertIn("v.status != 'Draft'", sql.call_args[0][0])
+        self.assertEqual(sql.call_args[0][1], {"document": "DOC-1"})
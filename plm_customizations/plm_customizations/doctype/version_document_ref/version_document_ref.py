@@ -0,0 +1,15 @@
+# Copyright (c) 2024, PLM Customizations and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class VersionDocumentRef(Document):
+    pass
+
+
+def on_doctype_update():
+    """Indexes for where-used lookups and for replacing a version's rows"""
+    frappe.db.add_index("Version Document Ref", ["document", "item_code", "version"])
+    frappe.db.add_index("Version Document Ref", ["item_version"])
@@ -0,0 +1,44 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+import json
+
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import snapshot_codec
+
+
+class TestSnapshotCodec(FrappeTestCase):
+    def test_round_trip_compresses(self):
+        """Encoded snapshots should carry the header, decode back and be smaller."""
+        data = {"name": "BOM-0001", "items": [{"item_code": f"PART-{i:04d}", "qty": 1} for i in range(200)]}
+        
+        stored = snapshot_codec.dumps(data)
+        
+        self.assertTrue(stored.startswith("plmsnap:1:zlib:"))
+        self.assertEqual(snapshot_codec.loads(stored), data)
+        self.assertLess(len(stored) * 4, len(json.dumps(data)))
+    
+    def test_plain_json_read_unchanged(self):
+        """Rows written before the codec should decode as they are."""
+        plain = json.dumps({"name": "BOM-0001"})
+        
+        self.assertEqual(snapshot_codec.decode(plain), plain)
+        self.assertEqual(snapshot_codec.loads(plain), {"name": "BOM-0001"})
+        self.assertIsNone(snapshot_codec.loads(None))
+    
+    def test_codec_named_in_header(self):
+        """Values are decoded with the codec named in their header."""
+        stored = snapshot_codec.encode('{"a": 1}', codec="json")
+        
+        self.assertEqual(stored, 'plmsnap:1:json:{"a": 1}')
+        self.assertEqual(snapshot_codec.loads(stored), {"a": 1})
+    
+    def test_compact_keeps_small_values_plain(self):
+        """Values that compression would grow should be stored as plain JSON."""
+        row = '{"conversion_factor":1,"name":"row1","uom":"Nos"}'
+        large = json.dumps([{"item_code": f"PART-{i:04d}", "qty": 1} for i in range(200)])
+        
+        self.assertEqual(snapshot_codec.encode_compact(row), row)
+        self.assertTrue(snapshot_codec.encode_compact(large).startswith("plmsnap:1:zlib:"))
+        self.assertEqual(snapshot_codec.loads(snapshot_codec.encode_compact(row)), json.loads(row))
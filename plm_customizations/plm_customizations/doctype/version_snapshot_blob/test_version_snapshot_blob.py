@@ -0,0 +1,101 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+import json
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import snapshot_store
+
+
+class TestSnapshotStore(FrappeTestCase):
+    def setUp(self):
+        self.blobs = {}
+        
+        def fake_get_all(doctype, filters=None, fields=None, pluck=None, as_list=False):
+            names = [name for name in filters["name"][1] if name in self.blobs]
+            if pluck:
+                return names
+            return [(name, self.blobs[name]) for name in names]
+        
+        def fake_bulk_insert(doctype, fields, rows, ignore_duplicates=False):
+            for row in rows:
+                self.blobs[row[0]] = row[-1]
+        
+        patches = [
+            patch.object(snapshot_store.frappe, "get_all", side_effect=fake_get_all),
+            patch.object(snapshot_store.frappe.db, "bulk_insert", side_effect=fake_bulk_insert)
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+    
+    def make_item(self, description):
+        return {
+            "name": "ITEM-0001", "item_name": "Bracket", "description": description,
+            "uoms": [
+                {"name": "row1", "idx": 1, "uom": "Nos", "conversion_factor": 1, "modified": "2024-01-01"},
+                {"name": "row2", "idx": 2, "uom": "Box", "conversion_factor": 10, "modified": "2024-01-01"}
+            ]
+        }
+    
+    def test_round_trip(self):
+        """A stored snapshot should load back without its volatile row fields."""
+        manifest = snapshot_store.dump_snapshot(self.make_item("v1"))
+        loaded = snapshot_store.load_snapshot(manifest)
+        
+        self.assertEqual(loaded["description"], "v1")
+        self.assertEqual([row["uom"] for row in loaded["uoms"]], ["Nos", "Box"])
+        self.assertEqual([row["idx"] for row in loaded["uoms"]], [1, 2])
+        self.assertNotIn("modified", loaded["uoms"][0])
+    
+    def test_idx_restored_only_where_rows_had_it(self):
+        """Rows stored without idx, like document snapshots, should load without it."""
+        documents = [{"link": "DOC-1", "version": "A"}, {"link": "DOC-2", "version": "B"}]
+        item = dict(self.make_item("v1"), supplier_items=[{"supplier": "SUP-1"}])
+        
+        self.assertEqual(snapshot_store.load_snapshot(snapshot_store.dump_snapshot(documents)), documents)
+        
+        loaded = snapshot_store.load_snapshot(snapshot_store.dump_snapshot(item))
+        self.assertEqual([row["idx"] for row in loaded["uoms"]], [1, 2])
+        self.assertEqual(loaded["supplier_items"], [{"supplier": "SUP-1"}])
+    
+    def test_small_blocks_not_grown_by_encoding(self):
+        """Row blocks too small to compress should be stored as plain JSON."""
+        snapshot_store.dump_snapshot(self.make_item("v1"))
+        
+        for data in self.blobs.values():
+            self.assertLessEqual(len(data), len(snapshot_store.canonical_json(json.loads(
+                snapshot_store.snapshot_codec.decode(data)))))
+    
+    def test_unchanged_blocks_stored_once(self):
+        """A version differing in one header field should only add a header block."""
+        snapshot_store.dump_snapshot(self.make_item("v1"))
+        self.assertEqual(len(self.blobs), 3)
+        
+        second = self.make_item("v2")
+        for row in second["uoms"]:
+            row["modified"] = "2024-02-01"
+        snapshot_store.dump_snapshot(second)
+        self.assertEqual(len(self.blobs), 4)
+    
+    def test_plain_json_read_unchanged(self):
+        """Columns written before the store should be returned as they are."""
+        legacy = [{"link": "DOC-1", "version": "A"}]
+        self.assertEqual(snapshot_store.load_snapshot(json.dumps(legacy)), legacy)
+        self.assertIsNone(snapshot_store.load_snapshot(None))
+    
+    def test_content_hash_ignores_volatile_and_excluded_fields(self):
+        """Saves that only touch timestamps or excluded fields should hash equally."""
+        first = {"item_name": "Bracket", "published_date": "2024-01-01",
+                 "uoms": [{"uom": "Nos", "idx": 1, "modified": "2024-01-01"}]}
+        second = {"item_name": "Bracket", "published_date": "2024-02-01",
+                  "uoms": [{"uom": "Nos", "idx": 1, "modified": "2024-02-01"}]}
+        changed = dict(second, item_name="Bracket L")
+        
+        def content_hash(data):
+            return snapshot_store.get_content_hash(data, [], exclude_fields=("published_date",))
+        
+        self.assertEqual(content_hash(first), content_hash(second))
+        self.assertNotEqual(content_hash(first), content_hash(changed))
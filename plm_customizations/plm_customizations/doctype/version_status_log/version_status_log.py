@@ -0,0 +1,14 @@
+# Copyright (c) 2024, PLM Customizations and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class VersionStatusLog(Document):
+    pass
+
+
+def on_doctype_update():
+    """Index for resolving the version in effect at a point in time"""
+    frappe.db.add_index("Version Status Log", ["version_doctype", "version_of", "changed_on"])
@@ -0,0 +1,133 @@
+"""
+Benchmark for loading Order Gantt data sequentially vs. in threads.
+
+Development tool, not a test case: it inserts synthetic rows into the real
+order tables, so it refuses to run unless the site is in developer mode or
+allows tests. Run on a test site with:
+    bench --site <site> execute \
+        plm_customizations.plm_customizations.page.order_gantt.gantt_benchmark.benchmark_gantt_fetch \
+        --kwargs "{'orders_per_type': 20000}"
+"""
+import random
+import statistics
+import time
+
+import frappe
+from frappe import _
+from frappe.utils import add_days, now_datetime, nowdate
+
+from plm_customizations.api.gantt_data import (
+    get_live_order_tasks, get_order_tasks_in_threads, parse_order_types
+)
+
+
+# Name prefix of synthetic orders, used to remove them again
+BENCHMARK_PREFIX = "PLM-BENCH-"
+
+
+def benchmark_gantt_fetch(orders_per_type=0, runs=5, project=None, from_date=None, to_date=None,
+                          order_types=None):
+    """
+    Compare sequential and threaded loading of Gantt tasks.
+    
+    Caching and the schedule state table are bypassed, since the state table
+    holds no rows for synthetic orders, so every run computes tasks from the
+    order tables. If orders_per_type is set, that many synthetic Purchase,
+    Work and Sales Orders are inserted and committed first (threads only see
+    committed rows) and deleted afterwards.
+    
+    Returns:
+        dict with median sequential/parallel latency in ms and the speedup
+    """
+    if not (frappe.conf.developer_mode or frappe.conf.allow_tests or frappe.flags.in_test):
+        frappe.throw(_("The Gantt benchmark only runs on sites in developer mode or that allow tests"))
+    
+    types_list = parse_order_types(order_types)
+    
+    if orders_per_type:
+        insert_synthetic_orders(int(orders_per_type))
+    
+    try:
+        sequential = []
+        parallel = []
+        task_count = 0
+        
+        for _run in range(int(runs)):
+            start = time.perf_counter()
+            task_count = sum(
+                len(get_live_order_tasks(order_type, project, from_date, to_date))
+                for order_type in types_list
+            )
+            sequential.append((time.perf_counter() - start) * 1000)
+            
+            start = time.perf_counter()
+            get_order_tasks_in_threads(types_list, project, from_date, to_date, loader=get_live_order_tasks)
+            parallel.append((time.perf_counter() - start) * 1000)
+    finally:
+        if orders_per_type:
+            delete_synthetic_orders()
+    
+    result = {
+        "tasks": task_count,
+        "runs": int(runs),
+        "sequential_ms": round(statistics.median(sequential), 1),
+        "parallel_ms": round(statistics.median(parallel), 1)
+    }
+    result["speedup"] = round(result["sequential_ms"] / result["parallel_ms"], 2) if result["parallel_ms"] else None
+    return result
+
+
+def insert_synthetic_orders(count):
+    """Insert bare Purchase, Work and Sales Order rows for benchmarking"""
+    rng = random.Random(0)
+    now = now_datetime()
+    base = nowdate()
+    common = ["name", "docstatus", "creation", "modified", "owner", "modified_by", "status"]
+    
+    def day(offset):
+        return add_days(base, offset)
+    
+    purchase_orders = []
+    work_orders = []
+    sales_orders = []
+    for i in range(count):
+        start = rng.randint(-365, 60)
+        purchase_orders.append((
+            f"{BENCHMARK_PREFIX}PO-{i:06d}", 1, now, now, "Administrator", "Administrator", "To Receive",
+            "Benchmark Supplier", day(start), day(start + rng.randint(5, 30)),
+            day(start + rng.randint(5, 40)) if rng.random() < 0.5 else None, rng.choice([0, 50, 100])
+        ))
+        work_orders.append((
+            f"{BENCHMARK_PREFIX}WO-{i:06d}", 1, now, now, "Administrator", "Administrator", "In Process",
+            "Benchmark Item", day(start), day(start + rng.randint(1, 20)),
+            day(start + rng.randint(-2, 5)) if rng.random() < 0.7 else None, 10, rng.randint(0, 10)
+        ))
+        sales_orders.append((
+            f"{BENCHMARK_PREFIX}SO-{i:06d}", 1, now, now, "Administrator", "Administrator", "To Deliver",
+            "Benchmark Customer", day(start), day(start + rng.randint(10, 60)),
+            day(start + rng.randint(5, 50)), rng.choice([0, 100])
+        ))
+    
+    frappe.db.bulk_insert(
+        "Purchase Order",
+        common + ["supplier_name", "transaction_date", "schedule_date", "eta_date", "per_received"],
+        purchase_orders
+    )
+    frappe.db.bulk_insert(
+        "Work Order",
+        common + ["item_name", "planned_start_date", "planned_end_date", "actual_start_date", "qty", "produced_qty"],
+        work_orders
+    )
+    frappe.db.bulk_insert(
+        "Sales Order",
+        common + ["customer_name", "transaction_date", "delivery_date", "estimated_shipping_date", "per_delivered"],
+        sales_orders
+    )
+    frappe.db.commit()
+
+
+def delete_synthetic_orders():
+    """Remove rows inserted by insert_synthetic_orders"""
+    for doctype in ("Purchase Order", "Work Order", "Sales Order"):
+        frappe.db.delete(doctype, {"name": ["like", f"{BENCHMARK_PREFIX}%"]})
+    frappe.db.commit()
@@ -20,16 +20,21 @@ class OrderGantt {
         this.page = page;
         this.gantt = null;
         this.tasks = [];
+        this.page_size = 200;
+        this.sync_time = null;
+        this.poll_interval = 30000;
         this.filters = {
             project: null,
             from_date: null,
             to_date: null,
-            order_types: ['purchase', 'work', 'sales']
+            order_types: ['purchase', 'work', 'sales'],
+            granularity: 'order'
         };
         
         this.setup_page();
         this.setup_filters();
         this.render();
+        this.start_polling();
     }
     
     setup_page() {
@@ -90,7 +95,18 @@ class OrderGantt {
                         <input type="date" class="form-control filter-to-date">
                     </div>
                 </div>
-                <div class="col-md-5">
+                <div class="col-md-2">
+                    <div class="form-group">
+                        <label>${__('View')}</label>
+                        <select class="form-control filter-granularity">
+                            <option value="order">${__('Orders')}</option>
+                            <option value="project">${__('Projects')}</option>
+                            <option value="week">${__('Weeks')}</option>
+                            <option value="month">${__('Months')}</option>
+                        </select>
+                    </div>
+                </div>
+                <div class="col-md-3">
                     <div class="form-group">
                         <label>${__('Order Types')}</label>
                         <div class="order-type-checkboxes">
@@ -138,6 +154,11 @@ class OrderGantt {
             me.refresh();
         });
         
+        $filters.find('.filter-granularity').on('change', function() {
+            me.filters.granularity = $(this).val() || 'order';
+            me.refresh();
+        });
+        
         $filters.find('.filter-type').on('change', function() {
             me.filters.order_types = [];
             $filters.find('.filter-type:checked').each(function() {
@@ -154,23 +175,186 @@ class OrderGantt {
     load_data() {
         let me = this;
         
+        // Each load gets a token so pages from an outdated filter set are ignored
+        this.load_token = (this.load_token || 0) + 1;
+        this.tasks = [];
+        this.sync_time = null;
+        
+        if (this.filters.granularity !== 'order') {
+            this.load_rollups(this.load_token);
+            return;
+        }
+        
+        this.load_page(this.load_token, null);
+    }
+    
+    load_rollups(token) {
+        let me = this;
+        
+        // Zoomed-out views only need one summary bar per project, week or month
         frappe.call({
             method: 'plm_customizations.api.gantt_data.get_gantt_data',
             args: {
                 project: this.filters.project,
                 from_date: this.filters.from_date,
                 to_date: this.filters.to_date,
-                order_types: this.filters.order_types.join(',')
+                order_types: this.filters.order_types.join(','),
+                granularity: this.filters.granularity,
+                format: 'columnar'
             },
-            freeze: true,
-            freeze_message: __('Loading...'),
             callback: (r) => {
-                if (r.message && r.message.tasks) {
-                    me.tasks = r.message.tasks;
+                if (token !== me.load_token || !r.message) return;
+                
+                me.tasks = me.decode_tasks(r.message.tasks);
+                me.render_gantt();
+            }
+        });
+    }
+    
+    load_page(token, cursor) {
+        let me = this;
+        
+        frappe.call({
+            method: 'plm_customizations.api.gantt_data.get_gantt_data_page',
+            args: {
+                project: this.filters.project,
+                from_date: this.filters.from_date,
+                to_date: this.filters.to_date,
+                order_types: this.filters.order_types.join(','),
+                cursor: cursor,
+                page_size: this.page_size,
+                format: 'columnar'
+            },
+            callback: (r) => {
+                if (token !== me.load_token || !r.message) return;
+                
+                let is_first_page = !cursor;
+                let tasks = me.decode_tasks(r.message.tasks);
+                me.tasks = me.tasks.concat(tasks);
+                
+                if (is_first_page) {
+                    me.first_page_sync_time = r.message.sync_time;
                     me.render_gantt();
+                } else {
+                    me.append_rows(tasks);
+                }
+                
+                // Keep fetching in the background so the first screen shows immediately
+                if (r.message.has_more) {
+                    me.load_page(token, r.message.cursor);
+                    return;
+                }
+                
+                // Polling starts once every page is in, from the time of the first page,
+                // so changes merged mid-load cannot be appended again by a later page
+                me.sync_time = me.first_page_sync_time;
+            }
+        });
+    }
+    
+    decode_tasks(payload) {
+        // Tasks requested with format=columnar come as one array per field
+        if (!payload) return [];
+        if (Array.isArray(payload)) return payload;
+        
+        let date_fields = new Set([
+            'start', 'end', 'required_date', 'planned_start', 'planned_end', 'actual_start',
+            'actual_end', 'estimated_shipping', 'actual_shipping', 'customer_required_date',
+            'actual_delivery'
+        ]);
+        let epoch = Date.parse(payload.epoch + 'T00:00:00Z');
+        let dates = {};
+        let to_date = (offset) => {
+            if (offset === null || offset === undefined) return null;
+            if (!(offset in dates)) {
+                dates[offset] = new Date(epoch + offset * 86400000).toISOString().slice(0, 10);
+            }
+            return dates[offset];
+        };
+        
+        let fields = Object.keys(payload.columns);
+        let tasks = new Array(payload.length);
+        for (let i = 0; i < payload.length; i++) {
+            tasks[i] = {};
+        }
+        
+        fields.forEach(field => {
+            let column = payload.columns[field];
+            let dictionary = payload.dictionaries[field];
+            for (let i = 0; i < payload.length; i++) {
+                let value = column[i];
+                if (dictionary) {
+                    value = dictionary[value];
+                } else if (date_fields.has(field)) {
+                    value = to_date(value);
                 }
+                tasks[i][field] = value;
             }
         });
+        
+        return tasks;
+    }
+    
+    start_polling() {
+        // Poll for orders changed since the last sync and merge them into the task list
+        setInterval(() => {
+            if (document.hidden || !this.sync_time) return;
+            this.load_changes();
+        }, this.poll_interval);
+    }
+    
+    load_changes() {
+        let me = this;
+        let token = this.load_token;
+        
+        frappe.call({
+            method: 'plm_customizations.api.gantt_data.get_gantt_data',
+            args: {
+                project: this.filters.project,
+                from_date: this.filters.from_date,
+                to_date: this.filters.to_date,
+                order_types: this.filters.order_types.join(','),
+                since: this.sync_time,
+                format: 'columnar'
+            },
+            callback: (r) => {
+                if (token !== me.load_token || !r.message) return;
+                
+                if (r.message.reload) {
+                    // Delay fields depend on today's date; recompute everything on a new day
+                    me.load_data();
+                    return;
+                }
+                
+                me.sync_time = r.message.sync_time;
+                me.merge_changes(me.decode_tasks(r.message.tasks), r.message.removed || []);
+            }
+        });
+    }
+    
+    merge_changes(changed, removed) {
+        if (!changed.length && !removed.length) return;
+        
+        let key = (task) => task.type + ':' + task.id;
+        let changed_by_key = {};
+        changed.forEach(task => { changed_by_key[key(task)] = task; });
+        let removed_keys = new Set(removed.map(key));
+        
+        let tasks = [];
+        this.tasks.forEach(task => {
+            let k = key(task);
+            if (removed_keys.has(k)) return;
+            if (changed_by_key[k]) {
+                tasks.push(changed_by_key[k]);
+                delete changed_by_key[k];
+            } else {
+                tasks.push(task);
+            }
+        });
+        
+        // Orders that entered the window since the last sync
+        this.tasks = tasks.concat(Object.values(changed_by_key));
+        this.render_gantt();
     }
     
     render_gantt() {
@@ -186,10 +370,20 @@ class OrderGantt {
         $wrapper.show();
         $noData.hide();
         
+        if (this.filters.granularity !== 'order') {
+            this.render_rollup_table();
+            return;
+        }
+        
         // Use table view for better detail display
         this.render_table_fallback();
     }
     
+    append_rows(tasks) {
+        let $tbody = this.page.main.find('.order-gantt-table tbody');
+        $tbody.append(tasks.map(task => this.get_row_html(task)).join(''));
+    }
+    
     render_table_fallback() {
         let $wrapper = this.page.main.find('.gantt-chart-wrapper');
         
@@ -212,122 +406,180 @@ class OrderGantt {
                 <tbody>
         `;
         
-        this.tasks.forEach(task => {
-            let row_class = '';
-            if (task.status_color === 'delayed' || task.status_color === 'completed_late') {
-                row_class = 'table-danger';
-            } else if (task.status_color === 'at_risk') {
-                row_class = 'table-warning';
-            } else if (task.status_color === 'completed') {
-                row_class = 'table-success';
-            }
-            
-            let doctype_route = task.type === 'purchase' ? 'purchase-order' : 
-                               task.type === 'work' ? 'work-order' : 'sales-order';
-            
-            let col1 = '-', col2 = '-', col3 = '-', col4 = '-';
-            let delay1_html = '-', delay2_html = '-';
-            
-            if (task.type === 'work') {
-                // Work Order: Planned Start/End vs Actual Start/End
-                col1 = task.planned_start || '-';
-                col2 = task.actual_start || '-';
-                col3 = task.planned_end || '-';
-                col4 = task.actual_end || '-';
-                
-                // Start delay
-                if (task.start_delay_days !== undefined) {
-                    if (task.start_delayed) {
-                        delay1_html = `<span class="text-danger">+${task.start_delay_days}d</span>`;
-                    } else if (task.start_delay_days < 0) {
-                        delay1_html = `<span class="text-success">${task.start_delay_days}d</span>`;
-                    } else if (task.actual_start) {
-                        delay1_html = `<span class="text-success">On time</span>`;
-                    }
-                }
-                
-                // End delay
-                if (task.end_delay_days !== undefined) {
-                    if (task.end_delayed) {
-                        delay2_html = `<span class="text-danger">+${task.end_delay_days}d</span>`;
-                    } else if (task.end_delay_days < 0) {
-                        delay2_html = `<span class="text-success">${task.end_delay_days}d</span>`;
-                    } else if (task.progress >= 100) {
-                        delay2_html = `<span class="text-success">On time</span>`;
-                    }
-                }
-            } else if (task.type === 'sales') {
-                // Sales Order: Est. Shipping vs Actual Shipping, Required vs Actual Delivery
-                col1 = task.estimated_shipping || '-';
-                col2 = task.actual_shipping || '-';
-                col3 = task.customer_required_date || '-';
-                col4 = task.actual_delivery || '-';
-                
-                // Shipping delay
-                if (task.shipping_delay_days !== undefined) {
-                    if (task.shipping_delayed) {
-                        delay1_html = `<span class="text-danger">+${task.shipping_delay_days}d</span>`;
-                    } else if (task.shipping_delay_days < 0) {
-                        delay1_html = `<span class="text-success">${task.shipping_delay_days}d</span>`;
-                    } else if (task.actual_shipping) {
-                        delay1_html = `<span class="text-success">On time</span>`;
-                    }
-                }
-                
-                // Delivery delay
-                if (task.delivery_delay_days !== undefined) {
-                    if (task.delivery_delayed) {
-                        delay2_html = `<span class="text-danger">+${task.delivery_delay_days}d</span>`;
-                    } else if (task.delivery_delay_days < 0) {
-                        delay2_html = `<span class="text-success">${task.delivery_delay_days}d</span>`;
-                    } else if (task.progress >= 100) {
-                        delay2_html = `<span class="text-success">On time</span>`;
-                    }
-                }
-            } else if (task.type === 'purchase') {
-                // Purchase Order: Order Date, ETA, Required By, Received
-                col1 = task.start || '-';  // Order date
-                col2 = task.end || '-';    // ETA or Schedule date
-                col3 = task.required_date || '-';  // Required By
-                col4 = task.progress >= 100 ? 'Received' : '-';
-                
-                // Arrival delay
-                if (task.is_delayed) {
-                    delay2_html = `<span class="text-danger">+${task.delay_days}d</span>`;
-                } else if (task.delay_risk) {
-                    delay2_html = `<span class="text-warning">ETA +${task.delay_days}d</span>`;
-                } else if (task.progress >= 100) {
-                    delay2_html = `<span class="text-success">On time</span>`;
-                }
-            }
+        html += this.tasks.map(task => this.get_row_html(task)).join('');
+        
+        html += '</tbody></table>';
+        
+        $wrapper.html(html);
+    }
+    
+    render_rollup_table() {
+        let $wrapper = this.page.main.find('.gantt-chart-wrapper');
+        
+        let rows = this.tasks.map(bar => {
+            let row_class = bar.status_color === 'delayed' ? 'table-danger' :
+                            bar.status_color === 'at_risk' ? 'table-warning' :
+                            bar.status_color === 'completed' ? 'table-success' : '';
             
-            html += `
+            return `
                 <tr class="${row_class}">
-                    <td><a href="/app/${doctype_route}/${task.id}">${task.name}</a></td>
-                    <td><span class="badge badge-${task.type === 'purchase' ? 'info' : task.type === 'work' ? 'primary' : 'secondary'}">${task.type}</span></td>
-                    <td>${this.format_date(col1)}</td>
-                    <td>${this.format_date(col2)}</td>
-                    <td>${this.format_date(col3)}</td>
-                    <td>${this.format_date(col4)}</td>
+                    <td>${bar.name}</td>
+                    <td>${this.format_date(bar.start)}</td>
+                    <td>${this.format_date(bar.end)}</td>
                     <td>
                         <div class="progress" style="height: 20px; min-width: 60px;">
-                            <div class="progress-bar ${task.progress >= 100 ? 'bg-success' : ''}" 
+                            <div class="progress-bar ${bar.progress >= 100 ? 'bg-success' : ''}" 
                                  role="progressbar" 
-                                 style="width: ${task.progress}%">
-                                ${task.progress.toFixed(0)}%
+                                 style="width: ${bar.progress}%">
+                                ${bar.progress.toFixed(0)}%
                             </div>
                         </div>
                     </td>
-                    <td>${task.status}</td>
-                    <td>${delay1_html}</td>
-                    <td>${delay2_html}</td>
+                    <td>${bar.order_count}</td>
+                    <td>${bar.delayed_count ? `<span class="text-danger">${bar.delayed_count}</span>` : '-'}</td>
+                    <td>${bar.at_risk_count ? `<span class="text-warning">${bar.at_risk_count}</span>` : '-'}</td>
                 </tr>
             `;
         });
         
-        html += '</tbody></table>';
+        $wrapper.html(`
+            <table class="table table-bordered order-gantt-table">
+                <thead>
+                    <tr>
+                        <th>${__('Group')}</th>
+                        <th>${__('Start')}</th>
+                        <th>${__('End')}</th>
+                        <th>${__('Progress')}</th>
+                        <th>${__('Orders')}</th>
+                        <th>${__('Delayed')}</th>
+                        <th>${__('At Risk')}</th>
+                    </tr>
+                </thead>
+                <tbody>${rows.join('')}</tbody>
+            </table>
+        `);
+    }
+    
+    get_row_html(task) {
+        let row_class = '';
+        if (task.status_color === 'delayed' || task.status_color === 'completed_late') {
+            row_class = 'table-danger';
+        } else if (task.status_color === 'at_risk') {
+            row_class = 'table-warning';
+        } else if (task.status_color === 'completed') {
+            row_class = 'table-success';
+        }
         
-        $wrapper.html(html);
+        let doctype_route = task.type === 'purchase' ? 'purchase-order' : 
+                           task.type === 'work' ? 'work-order' : 'sales-order';
+        
+        let col1 = '-', col2 = '-', col3 = '-', col4 = '-';
+        let delay1_html = '-', delay2_html = '-';
+        
+        if (task.type === 'work') {
+            // Work Order: Planned Start/End vs Actual Start/End
+            col1 = task.planned_start || '-';
+            col2 = task.actual_start || '-';
+            col3 = task.planned_end || '-';
+            col4 = task.actual_end || '-';
+            
+            // Start delay
+            if (task.start_delay_days !== undefined) {
+                if (task.start_delayed) {
+                    delay1_html = `<span class="text-danger">+${task.start_delay_days}d</span>`;
+                } else if (task.start_delay_days < 0) {
+                    delay1_html = `<span class="text-success">${task.start_delay_days}d</span>`;
+                } else if (task.actual_start) {
+                    delay1_html = `<span class="text-success">On time</span>`;
+                }
+            }
+            
+            // End delay
+            if (task.end_delay_days !== undefined) {
+                if (task.end_delayed) {
+                    delay2_html = `<span class="text-danger">+${task.end_delay_days}d</span>`;
+                } else if (task.end_delay_days < 0) {
+                    delay2_html = `<span class="text-success">${task.end_delay_days}d</span>`;
+                } else if (task.progress >= 100) {
+                    delay2_html = `<span class="text-success">On time</span>`;
+                }
+            }
+        } else if (task.type === 'sales') {
+            // Sales Order: Est. Shipping vs Actual Shipping, Required vs Actual Delivery
+            col1 = task.estimated_shipping || '-';
+            col2 = task.actual_shipping || '-';
+            col3 = task.customer_required_date || '-';
+            col4 = task.actual_delivery || '-';
+            
+            // Shipping delay
+            if (task.shipping_delay_days !== undefined) {
+                if (task.shipping_delayed) {
+                    delay1_html = `<span class="text-danger">+${task.shipping_delay_days}d</span>`;
+                } else if (task.shipping_delay_days < 0) {
+                    delay1_html = `<span class="text-success">${task.shipping_delay_days}d</span>`;
+                } else if (task.actual_shipping) {
+                    delay1_html = `<span class="text-success">On time</span>`;
+                }
+            }
+            
+            // Delivery delay
+            if (task.delivery_delay_days !== undefined) {
+                if (task.delivery_delayed) {
+                    delay2_html = `<span class="text-danger">+${task.delivery_delay_days}d</span>`;
+                } else if (task.delivery_delay_days < 0) {
+                    delay2_html = `<span class="text-success">${task.delivery_delay_days}d</span>`;
+                } else if (task.progress >= 100) {
+                    delay2_html = `<span class="text-success">On time</span>`;
+                }
+            }
+        } else if (task.type === 'purchase') {
+            // Purchase Order: Order Date, ETA, Required By, Received
+            col1 = task.start || '-';  // Order date
+            col2 = task.end || '-';    // ETA or Schedule date
+            col3 = task.required_date || '-';  // Required By
+            col4 = task.progress >= 100 ? 'Received' : '-';
+            
+            // Arrival delay
+            if (task.is_delayed) {
+                delay2_html = `<span class="text-danger">+${task.delay_days}d</span>`;
+            } else if (task.delay_risk) {
+                delay2_html = `<span class="text-warning">ETA +${task.delay_days}d</span>`;
+            } else if (task.progress >= 100) {
+                delay2_html = `<span class="text-success">On time</span>`;
+            }
+        }
+        
+        // Critical path fields are computed over the whole window, see apply_cached_critical_path
+        let critical_html = '';
+        if (task.critical) {
+            critical_html = ` <span class="badge badge-danger">${__('Critical')}</span>`;
+        }
+        if (task.propagated_delay_days > (task.is_delayed ? task.delay_days : 0)) {
+            critical_html += ` <span class="text-danger small">${__('Pushed +{0}d', [task.propagated_delay_days])}</span>`;
+        }
+        
+        return `
+            <tr class="${row_class}">
+                <td><a href="/app/${doctype_route}/${task.id}">${task.name}</a>${critical_html}</td>
+                <td><span class="badge badge-${task.type === 'purchase' ? 'info' : task.type === 'work' ? 'primary' : 'secondary'}">${task.type}</span></td>
+                <td>${this.format_date(col1)}</td>
+                <td>${this.format_date(col2)}</td>
+                <td>${this.format_date(col3)}</td>
+                <td>${this.format_date(col4)}</td>
+                <td>
+                    <div class="progress" style="height: 20px; min-width: 60px;">
+                        <div class="progress-bar ${task.progress >= 100 ? 'bg-success' : ''}" 
+                             role="progressbar" 
+                             style="width: ${task.progress}%">
+                            ${task.progress.toFixed(0)}%
+                        </div>
+                    </div>
+                </td>
+                <td>${task.status}</td>
+                <td>${delay1_html}</td>
+                <td>${delay2_html}</td>
+            </tr>
+        `;
     }
     
     format_date(dateStr) {
@@ -0,0 +1,55 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api.critical_path import apply_critical_path
+
+
+def make_task(task_id, start, end, dependencies=None, delay_days=0, progress=0):
+    return {
+        "id": task_id,
+        "start": start,
+        "end": end,
+        "dependencies": dependencies or [],
+        "is_delayed": delay_days > 0,
+        "delay_days": delay_days,
+        "progress": progress
+    }
+
+
+class TestCriticalPath(FrappeTestCase):
+    def test_late_purchase_order_pushes_downstream_orders(self):
+        """A late PO should push its Work Order and Sales Order and make the chain critical."""
+        tasks = [
+            make_task("PO-1", "2024-01-01", "2024-01-05", delay_days=3),
+            make_task("WO-1", "2024-01-06", "2024-01-10", ["PO-1"]),
+            make_task("PO-2", "2024-01-01", "2024-01-02"),
+            make_task("SO-1", "2024-01-11", "2024-01-15", ["WO-1", "PO-2"])
+        ]
+        
+        cycles = apply_critical_path(tasks)
+        by_id = {t["id"]: t for t in tasks}
+        
+        self.assertEqual(cycles, [])
+        self.assertEqual(by_id["PO-1"]["propagated_delay_days"], 3)
+        self.assertEqual(by_id["WO-1"]["propagated_delay_days"], 2)
+        self.assertEqual(by_id["SO-1"]["propagated_delay_days"], 1)
+        self.assertTrue(all(by_id[t]["critical"] for t in ("PO-1", "WO-1", "SO-1")))
+        self.assertFalse(by_id["PO-2"]["critical"])
+        self.assertEqual(by_id["PO-2"]["total_float"], 10)
+    
+    def test_cycle_is_reported(self):
+        """Orders on a dependency cycle should be reported instead of scheduled."""
+        tasks = [
+            make_task("WO-1", "2024-01-01", "2024-01-05", ["WO-2"]),
+            make_task("WO-2", "2024-01-01", "2024-01-05", ["WO-1"]),
+            make_task("WO-3", "2024-01-01", "2024-01-05")
+        ]
+        
+        cycles = apply_critical_path(tasks)
+        
+        self.assertEqual(sorted(cycles), ["WO-1", "WO-2"])
+        self.assertIsNone(tasks[0]["total_float"])
+        self.assertEqual(tasks[2]["total_float"], 0)
+        self.assertFalse(tasks[2]["critical"])
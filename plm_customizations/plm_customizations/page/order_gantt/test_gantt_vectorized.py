@@ -0,0 +1,83 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+import datetime
+import random
+import unittest
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import gantt_data, gantt_vectorized
+
+
+TODAY = datetime.date(2024, 6, 15)
+
+
+def random_date(rng, allow_none=True, with_time=False):
+    """Random date around TODAY, sometimes missing"""
+    if allow_none and rng.random() < 0.3:
+        return None
+    value = TODAY + datetime.timedelta(days=rng.randint(-40, 40))
+    if with_time:
+        return datetime.datetime.combine(value, datetime.time(rng.randint(0, 23), rng.randint(0, 59)))
+    return value
+
+
+def random_percent(rng):
+    return rng.choice([0, 0, 35.5, 99.99, 100, 100, 120])
+
+
+def make_random_orders(rng, count):
+    purchase, work, sales = [], [], []
+    for i in range(count):
+        purchase.append(frappe._dict({
+            "name": f"PO-{i:05d}", "supplier_name": rng.choice([None, "Supplier"]),
+            "transaction_date": random_date(rng), "schedule_date": random_date(rng),
+            "eta_date": random_date(rng), "per_received": random_percent(rng),
+            "status": "To Receive", "project": None
+        }))
+        qty = rng.choice([0, 3, 10])
+        work.append(frappe._dict({
+            "name": f"WO-{i:05d}", "production_item": "ITEM", "item_name": rng.choice([None, "Item"]),
+            "planned_start_date": random_date(rng, with_time=True),
+            "planned_end_date": random_date(rng, with_time=True),
+            "expected_delivery_date": random_date(rng),
+            "actual_start_date": random_date(rng, with_time=True),
+            "actual_end_date": random_date(rng, with_time=True),
+            "qty": qty, "produced_qty": rng.choice([0, 1, qty, qty + 1]),
+            "status": "In Process", "project": None
+        }))
+        sales.append(frappe._dict({
+            "name": f"SO-{i:05d}", "customer_name": rng.choice([None, "Customer"]),
+            "transaction_date": random_date(rng), "delivery_date": random_date(rng),
+            "estimated_shipping_date": random_date(rng), "actual_shipping_date": random_date(rng),
+            "actual_delivery_date": random_date(rng), "per_delivered": random_percent(rng),
+            "status": "To Deliver", "delivery_status": "Not Delivered", "project": None
+        }))
+    return purchase, work, sales
+
+
+@unittest.skipIf(gantt_vectorized.np is None, "NumPy is not installed")
+class TestGanttVectorized(FrappeTestCase):
+    def test_vectorized_matches_row_builders(self):
+        """Vectorized builders should produce exactly the same tasks as the row builders."""
+        rng = random.Random(42)
+        purchase, work, sales = make_random_orders(rng, 2000)
+        dependency_map = {("Work Order", "WO-00001"): ["PO-00001"], ("Sales Order", "SO-00002"): ["WO-00002"]}
+        
+        pairs = [
+            (gantt_data.build_purchase_order_tasks, gantt_vectorized.build_purchase_order_tasks, purchase),
+            (gantt_data.build_work_order_tasks, gantt_vectorized.build_work_order_tasks, work),
+            (gantt_data.build_sales_order_tasks, gantt_vectorized.build_sales_order_tasks, sales)
+        ]
+        
+        for row_builder, vectorized_builder, orders in pairs:
+            expected = list(row_builder(orders, TODAY, dependency_map))
+            actual = list(vectorized_builder(orders, TODAY, dependency_map))
+            
+            self.assertEqual(len(expected), len(actual))
+            for row_task, vectorized_task in zip(expected, actual):
+                self.assertEqual(row_task, vectorized_task)
+                for key, value in row_task.items():
+                    self.assertIs(type(value), type(vectorized_task[key]), key)
@@ -0,0 +1,226 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+from datetime import date
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from plm_customizations.api import gantt_data, order_schedule
+from plm_customizations.plm_customizations.testing import insert_order, make_orders
+
+
+class TestGanttData(FrappeTestCase):
+    def count_queries(self, order_count):
+        """Run get_gantt_data against synthetic orders and count queries per doctype."""
+        calls = {}
+        orders = {
+            "Work Order": make_orders("Work Order", order_count),
+            "Sales Order": make_orders("Sales Order", order_count)
+        }
+        
+        def fake_get_orders(doctype, *args, **kwargs):
+            calls[doctype] = calls.get(doctype, 0) + 1
+            return orders.get(doctype, [])
+        
+        def fake_get_all(doctype, *args, **kwargs):
+            calls[doctype] = calls.get(doctype, 0) + 1
+            return [
+                frappe._dict({"parenttype": "Sales Order", "parent": o.name, "order_name": "WO-TEST-00000"})
+                for o in orders["Sales Order"]
+            ]
+        
+        gantt_data.clear_gantt_cache()
+        
+        with patch.object(order_schedule, "is_schedule_state_ready", return_value=False), \
+                patch.object(gantt_data, "get_orders", side_effect=fake_get_orders), \
+                patch.object(gantt_data.frappe, "get_all", side_effect=fake_get_all):
+            result = gantt_data.get_gantt_data(order_types="work,sales")
+        
+        return calls, result
+    
+    def test_dependency_query_count_is_constant(self):
+        """Dependency loading should not issue one query per order."""
+        small_calls, _ = self.count_queries(5)
+        large_calls, result = self.count_queries(500)
+        
+        self.assertEqual(small_calls, large_calls)
+        self.assertEqual(large_calls["Order Dependency"], 1)
+        self.assertEqual(len(result["tasks"]), 1000)
+    
+    def test_dependencies_grouped_by_parent(self):
+        """Dependencies should be attached to the order that owns them."""
+        _, result = self.count_queries(3)
+        
+        for task in result["tasks"]:
+            if task["type"] == "sales":
+                self.assertEqual(task["dependencies"], ["WO-TEST-00000"])
+            else:
+                self.assertEqual(task["dependencies"], [])
+    
+    def test_cached_tasks_reused_until_cleared(self):
+        """A second load should be served from cache until an order changes."""
+        self.count_queries(3)
+        
+        with patch.object(gantt_data, "get_orders") as get_orders:
+            result = gantt_data.get_gantt_data(order_types="work,sales")
+            get_orders.assert_not_called()
+        
+        self.assertEqual(len(result["tasks"]), 6)
+        
+        gantt_data.clear_gantt_cache(frappe._dict({"doctype": "Work Order", "project": None,
+                                                   "get_doc_before_save": lambda: None}))
+        with patch.object(order_schedule, "is_schedule_state_ready", return_value=False), \
+                patch.object(gantt_data, "get_orders", return_value=[]) as get_orders:
+            gantt_data.get_gantt_data(order_types="work,sales")
+            get_orders.assert_called_once()
+    
+    def test_rollups_merge_order_types_per_bucket(self):
+        """Per-type GROUP BY rows for the same bucket should merge into one bar."""
+        rows = {
+            "Work Order": [frappe._dict({
+                "bucket": "PROJ-0001", "start": "2024-01-05", "end": "2024-01-10",
+                "weighted_progress": 300, "weight": 6, "order_count": 2,
+                "delayed_count": 0, "at_risk_count": 1
+            })],
+            "Sales Order": [frappe._dict({
+                "bucket": "PROJ-0001", "start": "2024-01-01", "end": "2024-01-20",
+                "weighted_progress": 0, "weight": 20, "order_count": 3,
+                "delayed_count": 1, "at_risk_count": 0
+            })]
+        }
+        
+        with patch.object(gantt_data, "get_order_rollups",
+                          side_effect=lambda doctype, *args: rows[doctype]), \
+                patch.object(gantt_data.frappe, "get_all", return_value=[("PROJ-0001", "Test Project")]):
+            result = gantt_data.get_gantt_data(order_types="work,sales", granularity="project")
+        
+        self.assertEqual(len(result["tasks"]), 1)
+        bar = result["tasks"][0]
+        self.assertEqual(bar["name"], "Test Project")
+        self.assertEqual((bar["start"], bar["end"]), ("2024-01-01", "2024-01-20"))
+        self.assertEqual(bar["progress"], round(300 / 26, 2))
+        self.assertEqual((bar["order_count"], bar["delayed_count"], bar["at_risk_count"]), (5, 1, 1))
+        self.assertEqual(bar["status_color"], "delayed")
+    
+    def test_columnar_format_encodes_fields_once(self):
+        """Columnar tasks should carry one array per field with encoded dates and statuses."""
+        tasks = list(gantt_data.build_work_order_tasks(make_orders("Work Order", 3), frappe.utils.getdate("2024-01-05")))
+        
+        encoded = gantt_data.encode_columnar_tasks(tasks)
+        
+        self.assertEqual(encoded["length"], 3)
+        self.assertEqual(encoded["epoch"], "2024-01-01")
+        self.assertEqual(set(encoded["columns"]), set(tasks[0]))
+        self.assertEqual(encoded["columns"]["start"], [0, 0, 0])
+        self.assertEqual(encoded["columns"]["end"], [9, 9, 9])
+        self.assertEqual(encoded["columns"]["actual_start"], [None, None, None])
+        self.assertEqual(encoded["dictionaries"]["type"], ["work"])
+        self.assertEqual(encoded["columns"]["type"], [0, 0, 0])
+        self.assertEqual(
+            encoded["dictionaries"]["status_color"][encoded["columns"]["status_color"][0]],
+            tasks[0]["status_color"]
+        )
+    
+    def test_order_details_projected_and_cached_by_modified(self):
+        """Requested fields should be read without loading the document, and cached per modified."""
+        meta = frappe._dict({
+            "fields": [frappe._dict({"fieldname": "status", "fieldtype": "Select"}),
+                       frappe._dict({"fieldname": "items", "fieldtype": "Table", "options": "Work Order Item"})],
+            "get_field": lambda fieldname: None
+        })
+        header = frappe._dict({"name": "WO-TEST-00000", "status": "In Process"})
+        
+        def fake_get_value(doctype, name, fieldname, as_dict=False):
+            return header if as_dict else "2024-01-01 10:00:00"
+        
+        with patch.object(gantt_data.frappe.db, "get_value", side_effect=fake_get_value) as get_value, \
+                patch.object(gantt_data.frappe, "get_meta", return_value=meta), \
+                patch.object(gantt_data.frappe, "get_doc") as get_doc:
+            first = gantt_data.get_order_details("WO-TEST-00000", "work", fields="name,status,items,bogus")
+            second = gantt_data.get_order_details("WO-TEST-00000", "work", fields="name,status,items,bogus")
+            get_doc.assert_not_called()
+        
+        self.assertEqual(first, header)
+        self.assertEqual(second, header)
+        # modified lookup twice, header fields once; unknown and table fields are dropped
+        self.assertEqual(get_value.call_count, 3)
+        self.assertEqual(get_value.call_args_list[1][0][2], ["name", "status"])
+
+
+class TestGanttDataQueries(FrappeTestCase):
+    """Gantt endpoints against orders stored in the database"""
+    
+    def setUp(self):
+        self.project = "_Test Gantt Project " + frappe.generate_hash(length=6)
+        self.work_orders = [
+            insert_order("Work Order", self.project, planned_start_date="2024-01-01",
+                         planned_end_date="2024-01-10", qty=10, produced_qty=10, status="Completed"),
+            insert_order("Work Order", self.project, planned_start_date="2024-02-01",
+                         planned_end_date="2024-02-10", qty=10, produced_qty=5, status="In Process"),
+            insert_order("Work Order", self.project, planned_start_date="2024-03-01",
+                         planned_end_date="2024-03-10", qty=10, produced_qty=0, status="Not Started")
+        ]
+        self.sales_orders = [
+            insert_order("Sales Order", self.project, transaction_date="2024-02-05", delivery_date="2024-02-20",
+                         per_delivered=0, status="To Deliver", customer_name="_Test Customer")
+        ]
+        
+        # Tasks are read from the schedule state table once it is ready, so keep it in step
+        order_schedule.refresh_order_schedule_state("Work Order", self.work_orders)
+        order_schedule.refresh_order_schedule_state("Sales Order", self.sales_orders)
+        gantt_data.clear_gantt_cache()
+    
+    def tearDown(self):
+        frappe.db.rollback()
+        gantt_data.clear_gantt_cache()
+    
+    def get_tasks(self, **kwargs):
+        return gantt_data.get_gantt_data(project=self.project, **kwargs)["tasks"]
+    
+    def test_date_window_keeps_overlapping_orders(self):
+        """Only orders whose period overlaps the window should be returned, for the requested types."""
+        tasks = self.get_tasks(from_date="2024-02-01", to_date="2024-02-28", order_types="work")
+        self.assertEqual([t["id"] for t in tasks], [self.work_orders[1]])
+        
+        tasks = self.get_tasks(from_date="2024-02-01", to_date="2024-02-28", order_types="work,sales")
+        self.assertEqual({t["id"] for t in tasks}, {self.work_orders[1], self.sales_orders[0]})
+        
+        # An order ending on from_date or starting on to_date still overlaps
+        tasks = self.get_tasks(from_date="2024-01-10", to_date="2024-03-01", order_types="work")
+        self.assertEqual({t["id"] for t in tasks}, set(self.work_orders))
+    
+    def test_rollups_aggregate_stored_orders(self):
+        """Rollup bars should count and weight the orders of each bucket."""
+        bars = self.get_tasks(order_types="work", granularity="month")
+        self.assertEqual([b["id"] for b in bars], ["2024-01-01", "2024-02-01", "2024-03-01"])
+        self.assertEqual([b["order_count"] for b in bars], [1, 1, 1])
+        self.assertEqual([b["progress"] for b in bars], [100, 50, 0])
+        self.assertEqual(bars[0]["status_color"], "completed")
+        
+        bars = self.get_tasks(order_types="work,sales", granularity="project")
+        self.assertEqual(len(bars), 1)
+        self.assertEqual(bars[0]["name"], self.project)
+        self.assertEqual((bars[0]["start"], bars[0]["end"]), ("2024-01-01", "2024-03-10"))
+        self.assertEqual(bars[0]["order_counts"], {"work": 3, "sales": 1})
+        # 10 days at 100% and 10 days at 50% over 46 order days
+        self.assertEqual(bars[0]["progress"], frappe.utils.flt(1500 / 46, 2))
+    
+    def test_columnar_payload_decodes_to_row_tasks(self):
+        """Decoding the columnar payload should give back the row tasks, with dates to the day."""
+        rows = self.get_tasks(order_types="work,sales")
+        payload = self.get_tasks(order_types="work,sales", format="columnar")
+        epoch = frappe.utils.getdate(payload["epoch"]).toordinal()
+        
+        self.assertEqual(payload["length"], len(rows))
+        for i, task in enumerate(rows):
+            for field, value in task.items():
+                encoded = payload["columns"][field][i]
+                if field in gantt_data.COLUMNAR_DATE_FIELDS:
+                    decoded = str(date.fromordinal(epoch + encoded)) if encoded is not None else None
+                    self.assertEqual(decoded, str(value)[:10] if value else None)
+                elif field in gantt_data.COLUMNAR_DICTIONARY_FIELDS:
+                    self.assertEqual(payload["dictionaries"][field][encoded], value)
+                else:
+                    self.assertEqual(encoded, value)
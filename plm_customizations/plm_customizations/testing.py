@@ -0,0 +1,80 @@
+# Copyright (c) 2024, PLM Customizations and Contributors
+# See license.txt
+
+"""
+Records shared by the PLM test cases.
+
+make_orders builds order rows in memory for tests that patch the queries.
+The insert_* helpers write rows straight to the database, without ERPNext
+validation or the item naming hooks, for tests that check what the
+endpoints return from stored data.
+"""
+import frappe
+
+
+def make_orders(doctype, count):
+    """Build synthetic order rows as returned by frappe.get_all"""
+    orders = []
+    for i in range(count):
+        if doctype == "Work Order":
+            orders.append(frappe._dict({
+                "name": f"WO-TEST-{i:05d}", "production_item": "TEST-ITEM", "item_name": "Test Item",
+                "planned_start_date": "2024-01-01", "planned_end_date": "2024-01-10",
+                "expected_delivery_date": None, "actual_start_date": None, "actual_end_date": None,
+                "qty": 10, "produced_qty": 5, "status": "In Process", "project": None
+            }))
+        else:
+            orders.append(frappe._dict({
+                "name": f"SO-TEST-{i:05d}", "customer_name": "Test Customer",
+                "transaction_date": "2024-01-01", "delivery_date": "2024-01-20",
+                "estimated_shipping_date": None, "actual_shipping_date": None,
+                "actual_delivery_date": None, "per_delivered": 0, "status": "To Deliver",
+                "delivery_status": "Not Delivered", "project": None
+            }))
+    return orders
+
+
+def insert_record(doctype, **values):
+    """Write a record and its child rows as given, returning its name"""
+    doc = frappe.get_doc(dict(values, doctype=doctype))
+    doc.db_insert()
+    for child in doc.get_all_children():
+        child.db_insert()
+    return doc.name
+
+
+def insert_order(doctype, project, **values):
+    """Write a submitted Purchase, Work or Sales Order of a project"""
+    name = "_T-{0}-{1}".format(doctype[0], frappe.generate_hash(length=8))
+    return insert_record(doctype, name=name, project=project, docstatus=1, **values)
+
+
+def insert_item(**values):
+    """Write a Draft Item that has never been published, returning its code"""
+    item_code = "_Test PLM Item " + frappe.generate_hash(length=8)
+    return insert_record(
+        "Item", **dict({
+            "name": item_code, "item_code": item_code, "item_name": item_code,
+            "item_group": "All Item Groups", "stock_uom": "Nos", "plm_status": "Draft", "current_version": 0
+        }, **values)
+    )
+
+
+def insert_ecn(title):
+    """Create an ECN, returning its number"""
+    return frappe.get_doc({"doctype": "ECN", "title": title, "change_reason": "Test"}).insert().name
+
+
+def delete_items(item_codes, ecns=None):
+    """
+    Delete test Items with their versions, status log and document refs,
+    and the given ECNs. Publishing commits, so these are not rolled back.
+    """
+    if item_codes:
+        frappe.db.delete("Version Status Log", {"version_of": ["in", item_codes]})
+        frappe.db.delete("Version Document Ref", {"item_code": ["in", item_codes]})
+        frappe.db.delete("Item Version", {"item_code": ["in", item_codes]})
+        frappe.db.delete("Item", {"name": ["in", item_codes]})
+    if ecns:
+        frappe.db.delete("ECN", {"name": ["in", ecns]})
+    frappe.db.commit()
@@ -645,9 +645,16 @@ function compare_bom_versions(frm, version1, version2) {
                 html += '</ul>';
             }
             
+            let changes_html = plm_customizations.version_compare.render_changed_rows(
+                __('Items Changed'), diff.items_changed, 'item_code', version1, version2
+            );
+            changes_html += plm_customizations.version_compare.render_table_changes(diff.tables, version1, version2);
+            html += changes_html;
+            
             if ((!diff.fields || !diff.fields.length) && 
                 (!diff.items_added || !diff.items_added.length) && 
-                (!diff.items_removed || !diff.items_removed.length)) {
+                (!diff.items_removed || !diff.items_removed.length) &&
+                !changes_html) {
                 html += '<p class="text-muted">' + __('No differences found') + '</p>';
             }
             
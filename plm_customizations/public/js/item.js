@@ -880,9 +880,16 @@ function compare_versions(frm, version1, version2) {
                 html += '</ul>';
             }
             
+            let changes_html = plm_customizations.version_compare.render_changed_rows(
+                __('Documents Changed'), diff.documents_changed, 'link', version1, version2
+            );
+            changes_html += plm_customizations.version_compare.render_table_changes(diff.tables, version1, version2);
+            html += changes_html;
+            
             if ((!diff.fields || !diff.fields.length) && 
                 (!diff.documents_added || !diff.documents_added.length) && 
-                (!diff.documents_removed || !diff.documents_removed.length)) {
+                (!diff.documents_removed || !diff.documents_removed.length) &&
+                !changes_html) {
                 html += '<p class="text-muted">' + __('No differences found') + '</p>';
             }
             
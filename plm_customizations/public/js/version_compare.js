@@ -0,0 +1,65 @@
+// Shared rendering of Item and BOM version comparisons
+frappe.provide('plm_customizations.version_compare');
+
+plm_customizations.version_compare.escape = function(value) {
+    // Snapshot values and row keys are user data; never insert them as HTML
+    return frappe.utils.escape_html(value === null || value === undefined ? '' : String(value));
+};
+
+plm_customizations.version_compare.render_changed_fields = function(fields) {
+    // fields: {fieldname: [value in version 1, value in version 2]}
+    let escape = plm_customizations.version_compare.escape;
+    return Object.keys(fields || {}).map(function(fieldname) {
+        let values = fields[fieldname];
+        return escape(fieldname) + ': ' + escape(values[0] || '-') + ' &rarr; ' + escape(values[1] || '-');
+    }).join('<br>');
+};
+
+plm_customizations.version_compare.render_changed_rows = function(title, entries, key_field, version1, version2) {
+    // Rows present in both versions with changed fields, e.g. documents_changed or items_changed
+    if (!entries || !entries.length) return '';
+    
+    let escape = plm_customizations.version_compare.escape;
+    let html = '<h5 class="text-warning">' + escape(title) + '</h5>';
+    html += '<table class="table table-bordered table-sm">';
+    html += '<tr><th>' + __('Row') + '</th><th>v' + escape(version1) + ' &rarr; v' + escape(version2) + '</th></tr>';
+    entries.forEach(function(entry) {
+        html += '<tr><td>' + escape(entry[key_field] || '-') + '</td><td>' +
+            plm_customizations.version_compare.render_changed_fields(entry.fields) + '</td></tr>';
+    });
+    html += '</table>';
+    
+    return html;
+};
+
+plm_customizations.version_compare.render_table_changes = function(tables, version1, version2) {
+    // Child table changes keyed by the row's natural key (e.g. UOM, item code)
+    let escape = plm_customizations.version_compare.escape;
+    let html = '';
+    
+    Object.keys(tables || {}).forEach(function(table) {
+        let changes = tables[table];
+        let rows = [];
+        
+        (changes.added || []).forEach(function(entry) {
+            rows.push('<tr class="text-success"><td>' + __('Added') + '</td><td>' + escape(entry.key[0]) + '</td><td>-</td></tr>');
+        });
+        (changes.removed || []).forEach(function(entry) {
+            rows.push('<tr class="text-danger"><td>' + __('Removed') + '</td><td>' + escape(entry.key[0]) + '</td><td>-</td></tr>');
+        });
+        (changes.changed || []).forEach(function(entry) {
+            rows.push('<tr><td>' + __('Changed') + '</td><td>' + escape(entry.key[0]) + '</td><td>' +
+                plm_customizations.version_compare.render_changed_fields(entry.fields) + '</td></tr>');
+        });
+        
+        if (rows.length) {
+            html += '<h5>' + escape(frappe.unscrub(table)) + '</h5>';
+            html += '<table class="table table-bordered table-sm">';
+            html += '<tr><th>' + __('Change') + '</th><th>' + __('Row') + '</th><th>v' + escape(version1) + ' &rarr; v' + escape(version2) + '</th></tr>';
+            html += rows.join('');
+            html += '</table>';
+        }
+    });
+    
+    return html;
+};
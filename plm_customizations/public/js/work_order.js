@@ -155,9 +155,24 @@ function show_bom_snapshot_dialog(frm) {
         return;
     }
     
+    // The snapshot is stored compressed, so let the server decode it
+    frappe.call({
+        method: 'plm_customizations.api.work_order_version.get_work_order_bom_snapshot',
+        args: {
+            work_order_name: frm.doc.name
+        },
+        callback: function(r) {
+            if (!r.message) {
+                frappe.msgprint(__('No BOM snapshot data available'));
+                return;
+            }
+            render_bom_snapshot_dialog(frm, r.message);
+        }
+    });
+}
+
+function render_bom_snapshot_dialog(frm, snapshot) {
     try {
-        let snapshot = JSON.parse(frm.doc.bom_snapshot_data);
-        
         let html = '<div style="max-height: 500px; overflow-y: auto;">';
         
         // Basic info
@@ -12,21 +12,9 @@ def after_install():
 
 
 def setup_plm_custom_fields():
-    """Setup all PLM custom fields on various DocTypes"""
-    try:
-        # Setup BOM PLM fields
-        from plm_customizations.api.bom_version import ensure_bom_custom_fields, ensure_bom_version_table
-        ensure_bom_custom_fields()
-        ensure_bom_version_table()
-    except Exception as e:
-        frappe.logger().error(f"Error setting up BOM PLM fields: {str(e)}")
-    
-    try:
-        # Setup Work Order PLM fields
-        from plm_customizations.api.work_order_version import ensure_work_order_custom_fields
-        ensure_work_order_custom_fields()
-    except Exception as e:
-        frappe.logger().error(f"Error setting up Work Order PLM fields: {str(e)}")
+    """Setup all PLM custom fields and version DocTypes, recording the schema fingerprint"""
+    from plm_customizations.api.plm_schema import verify_plm_schema
+    verify_plm_schema()
 
 
 @frappe.whitelist()